@@ -0,0 +1,76 @@
+import json
+import os
+import pytest
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('haem_kinetics benchmarks')
+    group.addoption('--cost-threshold', type=float, default=0.1,
+                    help='Relative increase of nfev, njev or nlu over the baseline that fails a benchmark')
+    group.addoption('--memory-threshold', type=float, default=0.25,
+                    help='Relative increase of peak memory over the baseline that fails a benchmark')
+    group.addoption('--update-baseline', action='store_true',
+                    help='Record the cost of each benchmark as the new baseline instead of comparing against it')
+
+
+class Baseline:
+    """
+    Integration cost (nfev, njev, nlu and peak memory) of each benchmark when the baseline was last recorded. Unlike
+    wall time the solver counts are reproducible across machines, so they are checked on every run. Peak memory
+    varies a little between runs and gets a looser threshold.
+    """
+    def __init__(self, path: str, threshold: float, memory_threshold: float, update: bool):
+        """
+        :param path: Path of the baseline json file
+        :param threshold: Relative increase of the solver counts over the baseline that counts as a regression
+        :param memory_threshold: Relative increase of peak memory over the baseline that counts as a regression
+        :param update: If True, the recorded costs replace the baseline
+        """
+        self.path = path
+        self.threshold = threshold
+        self.memory_threshold = memory_threshold
+        self.update = update
+        self.costs = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.costs = json.load(f)
+
+    def check(self, name: str, cost: dict):
+        """
+        Compares the cost of a benchmark to its baseline
+
+        :param name: Name of the benchmark
+        :param cost: Cost of the benchmark, e.g. {'nfev': 120, 'njev': 3, 'nlu': 10, 'peak_memory': 81920}
+        :return:
+        """
+        if self.update:
+            self.costs[name] = cost
+            return
+        if name not in self.costs:
+            pytest.skip(f'No baseline for {name}, record one with --update-baseline')
+
+        regressions = []
+        for metric, value in cost.items():
+            reference = self.costs[name].get(metric)
+            threshold = self.memory_threshold if metric == 'peak_memory' else self.threshold
+            if reference is not None and value > reference * (1 + threshold):
+                regressions.append(f'{metric} {reference} -> {value} (threshold {threshold:.0%})')
+        if regressions:
+            pytest.fail(f'{name} regressed: {", ".join(regressions)}')
+
+    def save(self):
+        with open(self.path, 'w') as f:
+            json.dump(self.costs, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+
+@pytest.fixture(scope='session')
+def baseline(request):
+    baseline = Baseline(path=BASELINE_FILE, threshold=request.config.getoption('--cost-threshold'),
+                        memory_threshold=request.config.getoption('--memory-threshold'),
+                        update=request.config.getoption('--update-baseline'))
+    yield baseline
+    if baseline.update:
+        baseline.save()
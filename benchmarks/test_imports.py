@@ -0,0 +1,50 @@
+"""
+Benchmarks of the import time of the entry points used by worker processes and the command line. Run with
+
+    pytest benchmarks/test_imports.py
+
+Each import runs in a fresh interpreter under python -X importtime. pytest-benchmark times the whole process (as a
+worker or a CLI job pays it), and the cumulative import time of the module and the number of modules loaded are
+stored in benchmark.extra_info. The number of modules is compared against benchmarks/baseline.json (see conftest.py),
+and the modules that are meant to be loaded lazily (see haem_kinetics.lazy) must not be imported at all.
+"""
+import subprocess
+import sys
+import pytest
+
+MODULES = ['haem_kinetics.models.model3', 'haem_kinetics.sweep', 'haem_kinetics.cli']
+
+# Only loaded when plots, DataFrames, the JIT backend or a sink of their format are used
+LAZY_MODULES = ['matplotlib', 'pandas', 'numba', 'pyarrow', 'h5py', 'scipy.stats']
+
+
+def import_time(module: str) -> dict:
+    """
+    :param module: Module to import
+    :return: Cumulative import time of the module (in us) and the names of all modules that were imported
+    """
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True,
+                             text=True, check=True)
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return {'import_time': times[module], 'modules': list(times)}
+
+
+@pytest.mark.parametrize('module', MODULES)
+def test_import(benchmark, baseline, module):
+    """
+    Benchmark a cold import of each entry point
+    :return:
+    """
+    result = benchmark.pedantic(import_time, args=(module,), rounds=5, iterations=1)
+
+    loaded = [name for name in LAZY_MODULES if name in result['modules']]
+    assert not loaded, f'{module} imports {loaded}, which should only be imported when used'
+
+    cost = {'n_modules': len(result['modules'])}
+    benchmark.extra_info.update(cost, import_time_us=result['import_time'])
+    baseline.check(f'import-{module}', cost)
@@ -0,0 +1,69 @@
+"""
+Benchmarks of the integration cost of each model over the time span of examples/run.py. Run with
+
+    pytest benchmarks
+
+Wall time is measured by pytest-benchmark. Save a run with --benchmark-autosave and fail on slower runs with e.g.
+--benchmark-compare --benchmark-compare-fail=min:20%. The number of rhs evaluations (nfev), Jacobian evaluations
+(njev), LU decompositions (nlu) and the peak memory of a run are stored in benchmark.extra_info and compared against
+benchmarks/baseline.json (see conftest.py), failing when they grow by more than --cost-threshold (solver counts) or
+--memory-threshold (peak memory). Record a new baseline with --update-baseline.
+
+Explicit methods are skipped for models that are stiff over this span (RK45 needs ~7e5 rhs evaluations there, which is
+what the automatic method selection avoids).
+"""
+import gc
+import tracemalloc
+import pytest
+
+from haem_kinetics.models.degradation import Degradation
+from haem_kinetics.models.model1 import Model1
+from haem_kinetics.models.model2 import Model2
+from haem_kinetics.models.model3 import Model3
+from haem_kinetics.models.model4 import Model4
+
+# Same as examples/run.py
+T_START = 0   # min
+T_END = 1700  # min
+T_STEP = 20   # min
+INIT = [0.018, 0.0, 0.0, 0.0]
+
+MODELS = [Model1, Model2, Model3, Model4, Degradation]
+METHODS = ['auto', 'RK45', 'LSODA', 'BDF', 'Radau']
+
+
+@pytest.mark.parametrize('method', METHODS)
+@pytest.mark.parametrize('model_class', MODELS, ids=lambda model_class: model_class.__name__)
+def test_run(benchmark, baseline, model_class, method):
+    """
+    Benchmark run with each solver method
+    :return:
+    """
+    model = model_class()
+    kwargs = dict(t=[T_START, T_END], init=INIT[:len(model.initial_values)], t_eval=range(T_START, T_END, T_STEP),
+                  method=method)
+    if method == 'RK45':
+        selected, _ = model._select_method(t=kwargs['t'], init=kwargs['init'],
+                                           params=model._pack_params(const=model.const))
+        if selected != method:
+            pytest.skip(f'{model_class.__name__} is stiff')
+    result = benchmark(model.run, **kwargs)
+    assert result.solution.success
+
+    # Peak memory is measured on separate runs so that tracing does not slow down the timed runs. The smallest peak
+    # of a few runs is kept since garbage left from earlier runs adds to the peak.
+    peaks = []
+    for _ in range(3):
+        gc.collect()
+        tracemalloc.start()
+        model.run(**kwargs)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    peak_memory = min(peaks)
+
+    cost = {'nfev': result.solver_info['nfev'],
+            'njev': result.solver_info['njev'],
+            'nlu': result.solver_info['nlu'],
+            'peak_memory': peak_memory}
+    benchmark.extra_info.update(cost, method=result.solver_info['method'])
+    baseline.check(f'{model_class.__name__}-{method}', cost)
@@ -24,3 +24,8 @@ model.run(t=[t_start, t_end], init=init[:4], t_eval=range(t_start, t_end, t_step
 # print(model.time)
 print(model.concentrations)
 # model.concentrations.to_csv('concentrations.tsv', sep='\t')
+
+# Long or finely sampled runs can be written to disk as they are solved instead (see haem_kinetics.sinks)
+# from haem_kinetics.sinks import ParquetSink
+# with ParquetSink('concentrations.parquet') as sink:
+#     model.stream(t=[t_start, t_end], sink=sink, t_eval=range(t_start, t_end), init=init[:4])
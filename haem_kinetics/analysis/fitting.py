@@ -0,0 +1,229 @@
+import copy
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from scipy.optimize import least_squares
+from typing import Dict, Optional, Tuple
+
+from haem_kinetics.components.experimental_data import ExperimentalData
+from haem_kinetics.components.result import ModelResult
+from haem_kinetics.lazy import lazy_import
+from haem_kinetics.models import jit
+from haem_kinetics.models.base import KineticsModel
+
+# scipy.stats takes longer to import than the rest of the package and is only used by the starts of multi-start fits
+qmc = lazy_import('scipy.stats.qmc')
+
+# Experimental measurements and the haem species of the models they are compared to
+DEFAULT_SPECIES_MAP = {'Hb': 'conc_hb_dv',
+                       'Hm': 'conc_fe3pp',
+                       'Hz': 'conc_hz'}
+
+
+def _fit_start(fitter, x0: np.ndarray, kwargs: dict):
+    """
+    Runs one start of a multi-start fit in a worker process
+    """
+    return fitter.fit_single(x0, **kwargs)
+
+
+class ModelFit:
+    """
+    Fits constants of a model to experimental data by minimising the SEM weighted residuals between the predicted and
+    measured Hb, free haem and Hz with scipy.optimize.least_squares.
+
+    The Jacobian of the residuals comes from the forward sensitivities of the model, which are integrated in the same
+    solve as the concentrations. Every evaluation integrates the model, so the residuals and their Jacobian are stored
+    in an LRU cache keyed by the values of the constants. Repeated points (e.g. the Jacobian that least_squares
+    requests after each accepted step, or a restart from a previous optimum) are then not integrated again.
+    """
+    # Residual given to every measurement when the model could not be integrated
+    failed_residual = 1e6
+
+    def __init__(self, model: KineticsModel, bounds: Dict[str, Tuple[float, float]], init,
+                 exp_data: Optional[ExperimentalData] = None,
+                 species_map: Optional[Dict[str, str]] = None, cache_size: int = 1024, **kwargs):
+        """
+        :param model: Model to be fitted. Its constants are used for anything that is not fitted.
+        :param bounds: Lower and upper bound of each constant to be fitted, named as in Constants.set_value, e.g.
+                       {'fudge': (0.1, 10), 'K_partition': (100, 1000)}. Use -np.inf/np.inf for no bound.
+        :param init: Initial concentrations of haem species (in M)
+        :param exp_data: [Optional] Experimental data to fit. Defaults to the experimental data of the model.
+        :param species_map: [Optional] Experimental measurement for each haem species, defaults to
+                            DEFAULT_SPECIES_MAP. Measurements of species that are not in the model are ignored.
+        :param cache_size: Number of evaluations of the residuals that are cached
+        :param kwargs: Additional arguments passed to run (e.g. method, rtol, atol)
+        """
+        self.model = model
+        self.param_names = list(bounds)
+        self.lower, self.upper = np.array(list(bounds.values()), dtype=float).reshape(-1, 2).T
+        self.init = list(init)
+        self.kwargs = kwargs
+        self.cache_size = cache_size
+
+        # Experimental data at the time points of the measurements
+        exp_data = model.exp_data if exp_data is None else exp_data
+        species_map = DEFAULT_SPECIES_MAP if species_map is None else species_map
+        species = list(model.initial_values)
+        columns = [col for col, sp in species_map.items() if sp in species and col in exp_data.data]
+        self.species = [species_map[col] for col in columns]
+        self.columns = columns
+        self.observed = exp_data.data[columns].values.T
+        self.sem = self._weights(exp_data.data[[f'{col}:SEM' for col in columns]].values.T)
+
+        # Model time is in minutes from the start of the simulation (16 hrs into the life cycle)
+        self.t_eval = (exp_data.data.index.values.astype(float) - 16) * 60
+        self.t = [0, self.t_eval.max()]
+
+        self._evaluate_cached = lru_cache(maxsize=cache_size)(self._evaluate)
+        self.results = []
+
+    def __getstate__(self):
+        # The cache can not be pickled (e.g. when sent to a worker process), each process builds its own
+        state = self.__dict__.copy()
+        del state['_evaluate_cached']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._evaluate_cached = lru_cache(maxsize=self.cache_size)(self._evaluate)
+
+    @staticmethod
+    def _weights(sem: np.ndarray) -> np.ndarray:
+        """
+        Some measurements are reported with an SEM of 0. These are weighted by the smallest non-zero SEM of the same
+        measurement instead so that they do not dominate the fit.
+
+        :param sem: SEM of each measurement with shape (n_measurements, n_times)
+        :return: SEM to be used as weights
+        """
+        sem = sem.astype(float).copy()
+        for row in sem:
+            positive = row[row > 0]
+            row[row <= 0] = positive.min() if len(positive) else 1.0
+        return sem
+
+    def _solve(self, x) -> Optional[ModelResult]:
+        """
+        Solves the model with the constants in x and the sensitivities to them. The model is copied so that the
+        constants (and results) of the fitted model are left untouched.
+
+        :param x: Values of the fitted constants (in the order of bounds)
+        :return: Results of the run, or None if the model could not be integrated
+        """
+        model = copy.copy(self.model)
+        model.const = copy.deepcopy(self.model.const)
+        self.apply(x, model=model)
+        result = model.run(t=self.t, init=self.init, t_eval=self.t_eval, sensitivities=self.param_names,
+                           **self.kwargs)
+        if result.solution.status < 0:
+            return None
+        return result
+
+    def predict(self, x) -> np.ndarray:
+        """
+        Solves the model with the constants in x
+
+        :param x: Values of the fitted constants (in the order of bounds)
+        :return: Predicted concentrations (in fg/cell) of the compared species with shape (n_measurements, n_times)
+        """
+        result = self._solve(x)
+        return None if result is None else result.concentrations.array(self.species)
+
+    def _evaluate(self, x: tuple):
+        result = self._solve(x)
+        if result is None:
+            return np.full(self.observed.size, self.failed_residual), np.zeros((self.observed.size, len(x)))
+
+        residuals = (result.concentrations.array(self.species) - self.observed) / self.sem
+        jac = [(result.sensitivities[name][self.species].values.T / self.sem).ravel() for name in self.param_names]
+        return residuals.ravel(), np.stack(jac, axis=1)
+
+    def residuals(self, x) -> np.ndarray:
+        """
+        SEM weighted residuals between predicted and measured concentrations. Evaluations are cached.
+
+        :param x: Values of the fitted constants (in the order of bounds)
+        :return: Flat array of residuals
+        """
+        return self._evaluate_cached(tuple(float(v) for v in x))[0].copy()
+
+    def jacobian(self, x) -> np.ndarray:
+        """
+        Jacobian of the residuals with respect to the fitted constants, from the forward sensitivities of the model.
+        Evaluations are cached (and shared with residuals).
+
+        :param x: Values of the fitted constants (in the order of bounds)
+        :return: Jacobian with shape (n_residuals, n_params)
+        """
+        return self._evaluate_cached(tuple(float(v) for v in x))[1].copy()
+
+    def starting_points(self, n_starts: int, x0=None, seed: Optional[int] = None) -> np.ndarray:
+        """
+        Starting points for a multi-start fit. The first is x0 (defaults to the current constants of the model, clipped
+        to the bounds) and the rest are a latin hypercube sample within the bounds.
+
+        :param n_starts: Number of starting points
+        :param x0: [Optional] First starting point
+        :param seed: [Optional] Seed of the random number generator
+        :return: Starting points with shape (n_starts, n_params)
+        """
+        if x0 is None:
+            x0 = [self.model.const.get_value(name) for name in self.param_names]
+        x0 = np.clip(np.asarray(x0, dtype=float), self.lower, self.upper)
+        if n_starts == 1:
+            return x0[np.newaxis]
+
+        if not (np.all(np.isfinite(self.lower)) and np.all(np.isfinite(self.upper))):
+            raise ValueError('Finite bounds are needed to sample starting points')
+        sample = qmc.LatinHypercube(d=len(x0), seed=seed).random(n=n_starts - 1)
+        return np.vstack([x0, qmc.scale(sample, self.lower, self.upper)])
+
+    def fit_single(self, x0, **kwargs):
+        """
+        Fits the constants from one starting point
+
+        :param x0: Starting values of the fitted constants
+        :param kwargs: Additional arguments passed to least_squares
+        :return: OptimizeResult from least_squares
+        """
+        kwargs.setdefault('jac', self.jacobian)
+        kwargs.setdefault('x_scale', 'jac')
+        return least_squares(self.residuals, x0, bounds=(self.lower, self.upper), **kwargs)
+
+    def fit(self, n_starts: int = 1, x0=None, n_workers: Optional[int] = None, seed: Optional[int] = None,
+            **kwargs):
+        """
+        Fits the constants, optionally from several starting points in parallel. The results of all starts are kept
+        in self.results (best first).
+
+        :param n_starts: Number of starting points (see starting_points)
+        :param x0: [Optional] First starting point, defaults to the current constants of the model
+        :param n_workers: [Optional] Number of worker processes for a multi-start fit. Defaults to the number of CPUs.
+        :param seed: [Optional] Seed used to sample the starting points
+        :param kwargs: Additional arguments passed to least_squares
+        :return: OptimizeResult of the best fit
+        """
+        starts = self.starting_points(n_starts=n_starts, x0=x0, seed=seed)
+        if n_starts == 1:
+            results = [self.fit_single(starts[0], **kwargs)]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers, mp_context=jit.worker_context()) as executor:
+                futures = [executor.submit(_fit_start, self, x, kwargs) for x in starts]
+                results = [future.result() for future in futures]
+
+        self.results = sorted(results, key=lambda result: result.cost)
+        return self.results[0]
+
+    def apply(self, x, model: Optional[KineticsModel] = None):
+        """
+        Sets the fitted constants on a model
+
+        :param x: Values of the fitted constants
+        :param model: [Optional] Model to update, defaults to the fitted model
+        :return:
+        """
+        model = self.model if model is None else model
+        for name, value in zip(self.param_names, x):
+            model.const.set_value(name, value)
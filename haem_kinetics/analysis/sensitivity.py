@@ -0,0 +1,284 @@
+import os
+import warnings
+import numpy as np
+
+from typing import Dict, Optional, Tuple, Type
+
+from haem_kinetics.lazy import lazy_import
+from haem_kinetics.models.base import KineticsModel
+from haem_kinetics.models.model3 import Model3
+from haem_kinetics.sweep import Sweep
+
+pd = lazy_import('pandas')
+# scipy.stats takes longer to import than the rest of the package and is only used to sample the constants
+qmc = lazy_import('scipy.stats.qmc')
+
+
+class GlobalSensitivity:
+    """
+    Global sensitivity analysis of a model to its constants by Morris screening and Sobol indices. The outputs are
+    the Hz concentration at 44 hrs and the peak free haem (Fe(III)PP) concentration up to that time, both in fg/cell.
+
+    The samples are solved in batches with Sweep (run_ensemble on a pool of worker processes). When a checkpoint file
+    is given, the outputs are saved each time a batch completes and a killed analysis picks up from the saved outputs
+    when it is run again with the same settings.
+    """
+    outputs = ['hz_44h', 'peak_fe3pp']
+
+    def __init__(self, bounds: Dict[str, Tuple[float, float]], model_class: Type[KineticsModel] = Model3,
+                 init=None, hz_time: float = 44.0, t_step: float = 10.0, **kwargs):
+        """
+        :param bounds: Lower and upper bound of each constant, named as in Constants.set_value, e.g.
+                       {'fudge': (1, 4), 'K_partition': (200, 600), 'k_enzymes.hap.kcat': (0.1, 1)}
+        :param model_class: Model to be solved, defaults to Model3
+        :param init: [Optional] Initial concentrations of haem species (in M), defaults to those of the model
+        :param hz_time: Time (in hrs of the life cycle) at which Hz is reported and up to which the model is solved
+        :param t_step: Time step (in min) at which the peak free haem is searched for
+        :param kwargs: Additional arguments passed to run_ensemble (e.g. method, rtol, atol)
+        """
+        model = model_class()
+        species = list(model.initial_values)
+
+        self.model_class = model_class
+        self.param_names = list(bounds)
+        self.lower, self.upper = np.array(list(bounds.values()), dtype=float).reshape(-1, 2).T
+        self.init = list(model.initial_values.values()) if init is None else list(init)
+        self.kwargs = kwargs
+
+        # Model time is in minutes from the start of the simulation (16 hrs into the life cycle)
+        t_end = (hz_time - 16) * 60
+        self.t = [0, t_end]
+        self.t_eval = np.linspace(0, t_end, int(round(t_end / t_step)) + 1)
+        self._hz = species.index('conc_hz')
+        self._fe3pp = species.index('conc_fe3pp')
+
+        # Rows of the latest evaluated design whose runs failed
+        self.failed = np.empty(0, dtype=int)
+
+    def _outputs(self, concentrations: np.ndarray) -> np.ndarray:
+        """
+        :param concentrations: Concentrations (in fg/cell) with shape (n_runs, n_species, n_times)
+        :return: Outputs with shape (n_runs, n_outputs)
+        """
+        return np.stack([concentrations[:, self._hz, -1], concentrations[:, self._fe3pp].max(axis=1)], axis=1)
+
+    @staticmethod
+    def _load_checkpoint(checkpoint: str, design: np.ndarray) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        :param checkpoint: Path of the checkpoint file
+        :param design: Design that is being evaluated
+        :return: Tuple of (saved outputs, mask of the runs that were solved), or None if there is no checkpoint
+        """
+        if not os.path.exists(checkpoint):
+            return None
+        with np.load(checkpoint) as saved:
+            if saved['design'].shape != design.shape or not np.allclose(saved['design'], design):
+                raise ValueError(f'{checkpoint} was written for a different design (check the bounds, sample size '
+                                 f'and seed)')
+            outputs = saved['outputs']
+            # Checkpoints written before the mask was saved only hold the outputs of solved runs
+            done = saved['done'] if 'done' in saved else ~np.isnan(outputs).any(axis=1)
+            return outputs, done
+
+    @staticmethod
+    def _save_checkpoint(checkpoint: str, design: np.ndarray, outputs: np.ndarray, done: np.ndarray):
+        """
+        Saves the outputs. The file is replaced in one step so that a killed job never leaves a partial checkpoint.
+
+        :param checkpoint: Path of the checkpoint file
+        :param design: Design that is being evaluated
+        :param outputs: Outputs solved so far (NaN for the rest and for failed runs)
+        :param done: Mask of the runs that were solved, including those that failed
+        :return:
+        """
+        tmp_file = f'{checkpoint}.tmp'
+        with open(tmp_file, 'wb') as f:
+            np.savez(f, design=design, outputs=outputs, done=done)
+        os.replace(tmp_file, checkpoint)
+
+    def evaluate(self, design: np.ndarray, checkpoint: Optional[str] = None, n_workers: Optional[int] = None,
+                 chunk_size: int = 256) -> np.ndarray:
+        """
+        Solves the model for each row of the design. Runs that fail (see KineticsModel.run_ensemble) have NaN
+        outputs, their rows are stored in self.failed and a warning is issued.
+
+        :param design: Values of the constants with shape (n_runs, n_params)
+        :param checkpoint: [Optional] Path of a file in which the outputs are saved as batches complete. Runs saved
+                           in an existing checkpoint (including failed runs) are not solved again.
+        :param n_workers: [Optional] Number of worker processes. Defaults to the number of CPUs.
+        :param chunk_size: Number of runs solved together by each task
+        :return: Outputs with shape (n_runs, n_outputs)
+        """
+        saved = None if checkpoint is None else self._load_checkpoint(checkpoint=checkpoint, design=design)
+        if saved is None:
+            outputs = np.full((len(design), len(self.outputs)), np.nan)
+            done = np.zeros(len(design), dtype=bool)
+        else:
+            outputs, done = saved
+        pending = np.flatnonzero(~done)
+
+        if len(pending):
+            sweep = Sweep(self.model_class, param_names=self.param_names, design=design, t=self.t, init=self.init,
+                          t_eval=self.t_eval, **self.kwargs)
+            for indices, concentrations in sweep.run(n_workers=n_workers, chunk_size=chunk_size, indices=pending):
+                outputs[indices] = self._outputs(concentrations)
+                done[indices] = True
+                if checkpoint is not None:
+                    self._save_checkpoint(checkpoint=checkpoint, design=design, outputs=outputs, done=done)
+
+        self.failed = np.flatnonzero(np.isnan(outputs).any(axis=1))
+        if len(self.failed):
+            warnings.warn(f'{len(self.failed)} of {len(design)} runs failed and have NaN outputs (rows in '
+                          f'self.failed)')
+        return outputs
+
+    def _scale(self, sample: np.ndarray) -> np.ndarray:
+        return qmc.scale(sample, self.lower, self.upper)
+
+    @staticmethod
+    def _morris_sample(n_params: int, n_trajectories: int, n_levels: int, seed: Optional[int] = None):
+        """
+        One-at-a-time trajectories on a grid of n_levels in the unit hypercube. Each trajectory starts at a random
+        grid point and moves each constant (in random order) once by delta = n_levels / (2 * (n_levels - 1)).
+
+        :return: Tuple of (sample with shape (n_trajectories * (n_params + 1), n_params),
+                 index of the constant moved at each step with shape (n_trajectories, n_params),
+                 signed size of each step with shape (n_trajectories, n_params))
+        """
+        if n_levels < 2 or n_levels % 2:
+            raise ValueError('n_levels must be even (and at least 2) so that every step of delta stays on the grid')
+        rng = np.random.default_rng(seed)
+        delta = n_levels / (2 * (n_levels - 1))
+        starts = rng.integers(0, n_levels, size=(n_trajectories, n_params)) / (n_levels - 1)
+
+        sample = np.empty((n_trajectories, n_params + 1, n_params))
+        moved = np.empty((n_trajectories, n_params), dtype=int)
+        steps = np.empty((n_trajectories, n_params))
+        for r in range(n_trajectories):
+            x = starts[r].copy()
+            sample[r, 0] = x
+            for j, i in enumerate(rng.permutation(n_params)):
+                steps[r, j] = delta if x[i] + delta <= 1 else -delta
+                moved[r, j] = i
+                x[i] += steps[r, j]
+                sample[r, j + 1] = x
+        return sample.reshape(-1, n_params), moved, steps
+
+    def morris(self, n_trajectories: int = 20, n_levels: int = 4, seed: Optional[int] = None,
+               checkpoint: Optional[str] = None, n_workers: Optional[int] = None,
+               chunk_size: int = 256) -> Dict[str, 'pd.DataFrame']:
+        """
+        Morris screening. Elementary effects are the change in an output per change of a constant by its full range.
+
+        :param n_trajectories: Number of trajectories (each needs n_params + 1 runs)
+        :param n_levels: Number of grid levels of each constant, must be even
+        :param seed: [Optional] Seed of the random number generator
+        :param checkpoint: [Optional] Path of a checkpoint file (see evaluate)
+        :param n_workers: [Optional] Number of worker processes. Defaults to the number of CPUs.
+        :param chunk_size: Number of runs solved together by each task
+        :return: Dataframe per output with the mean (mu), mean absolute (mu_star) and standard deviation (sigma) of
+                 the elementary effects of each constant. Trajectories with a failed run (see evaluate) are left out,
+                 attrs holds the failed rows of the sample and the number of trajectories used.
+        """
+        n_params = len(self.param_names)
+        sample, moved, steps = self._morris_sample(n_params=n_params, n_trajectories=n_trajectories, n_levels=n_levels,
+                                            seed=seed)
+        outputs = self.evaluate(self._scale(sample), checkpoint=checkpoint, n_workers=n_workers,
+                                chunk_size=chunk_size)
+        outputs = outputs.reshape(n_trajectories, n_params + 1, -1)
+
+        # Trajectories with a failed run are left out
+        valid = np.flatnonzero(~np.isnan(outputs).any(axis=(1, 2)))
+        results = {}
+        for k, output in enumerate(self.outputs):
+            effects = np.empty((len(valid), n_params))
+            for row, r in enumerate(valid):
+                effects[row, moved[r]] = np.diff(outputs[r, :, k]) / steps[r]
+            results[output] = pd.DataFrame({'mu': effects.mean(axis=0),
+                                            'mu_star': np.abs(effects).mean(axis=0),
+                                            'sigma': effects.std(axis=0, ddof=1)},
+                                           index=self.param_names)
+            results[output].attrs['failed'] = self.failed
+            results[output].attrs['n_trajectories'] = len(valid)
+        return results
+
+    @staticmethod
+    def _saltelli_sample(n_params: int, n_samples: int, seed: Optional[int] = None) -> np.ndarray:
+        """
+        Saltelli sample from a scrambled Sobol sequence of dimension 2 * n_params. The first and last n_params
+        columns are the matrices A and B, and AB_i is A with column i taken from B.
+
+        :return: Sample in the unit hypercube with shape (n_samples * (n_params + 2), n_params), ordered as
+                 [A, B, AB_0, ..., AB_{n_params-1}]
+        """
+        if n_samples < 2 or n_samples & (n_samples - 1):
+            raise ValueError('n_samples must be a power of 2 to keep the balance of the Sobol sequence')
+        base = qmc.Sobol(d=2 * n_params, seed=seed).random(n=n_samples)
+        a, b = base[:, :n_params], base[:, n_params:]
+
+        blocks = [a, b]
+        for i in range(n_params):
+            ab = a.copy()
+            ab[:, i] = b[:, i]
+            blocks.append(ab)
+        return np.vstack(blocks)
+
+    @staticmethod
+    def _sobol_indices(f_a: np.ndarray, f_b: np.ndarray, f_ab: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        First order (Saltelli 2010) and total (Jansen) Sobol indices
+
+        :param f_a: Output for A with shape (n_samples,)
+        :param f_b: Output for B with shape (n_samples,)
+        :param f_ab: Output for each AB_i with shape (n_params, n_samples)
+        :return: Tuple of (first order indices, total indices)
+        """
+        var = np.var(np.concatenate([f_a, f_b]))
+        first = np.mean(f_b * (f_ab - f_a), axis=1) / var
+        total = 0.5 * np.mean((f_a - f_ab) ** 2, axis=1) / var
+        return first, total
+
+    def sobol(self, n_samples: int = 1024, seed: Optional[int] = None, n_bootstrap: int = 100,
+              checkpoint: Optional[str] = None, n_workers: Optional[int] = None,
+              chunk_size: int = 256) -> Dict[str, 'pd.DataFrame']:
+        """
+        Sobol indices estimated from a Saltelli sample
+
+        :param n_samples: Base sample size, a power of 2. The model is solved n_samples * (n_params + 2) times.
+        :param seed: [Optional] Seed of the Sobol sequence scrambling and the bootstrap
+        :param n_bootstrap: Number of bootstrap resamples used for the confidence intervals
+        :param checkpoint: [Optional] Path of a checkpoint file (see evaluate)
+        :param n_workers: [Optional] Number of worker processes. Defaults to the number of CPUs.
+        :param chunk_size: Number of runs solved together by each task
+        :return: Dataframe per output with the first order (S1) and total (ST) indices of each constant and the
+                 half width of their 95% bootstrap confidence intervals (S1_conf, ST_conf). Base samples with a failed
+                 run (see evaluate) are left out, attrs holds the failed rows of the sample and the number of base
+                 samples used.
+        """
+        n_params = len(self.param_names)
+        sample = self._saltelli_sample(n_params=n_params, n_samples=n_samples, seed=seed)
+        outputs = self.evaluate(self._scale(sample), checkpoint=checkpoint, n_workers=n_workers,
+                                chunk_size=chunk_size)
+        outputs = outputs.reshape(n_params + 2, n_samples, -1)
+
+        # Samples with a failed run in A, B or any AB_i are left out
+        outputs = outputs[:, ~np.isnan(outputs).any(axis=(0, 2))]
+        n_valid = outputs.shape[1]
+
+        rng = np.random.default_rng(seed)
+        resamples = rng.integers(0, n_valid, size=(n_bootstrap, n_valid))
+
+        results = {}
+        for k, output in enumerate(self.outputs):
+            f_a, f_b, f_ab = outputs[0, :, k], outputs[1, :, k], outputs[2:, :, k]
+            first, total = self._sobol_indices(f_a=f_a, f_b=f_b, f_ab=f_ab)
+            boot = [self._sobol_indices(f_a=f_a[idx], f_b=f_b[idx], f_ab=f_ab[:, idx]) for idx in resamples]
+            boot_first, boot_total = np.array(boot).transpose(1, 0, 2)
+            results[output] = pd.DataFrame({'S1': first,
+                                            'S1_conf': 1.96 * boot_first.std(axis=0, ddof=1),
+                                            'ST': total,
+                                            'ST_conf': 1.96 * boot_total.std(axis=0, ddof=1)},
+                                           index=self.param_names)
+            results[output].attrs['failed'] = self.failed
+            results[output].attrs['n_samples'] = n_valid
+        return results
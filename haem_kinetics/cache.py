@@ -0,0 +1,227 @@
+import copy
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+import numpy as np
+
+from collections import OrderedDict
+from scipy.optimize import OptimizeResult
+from typing import Optional, Tuple
+
+
+def _jsonable(obj):
+    """
+    Converts numpy arrays, numpy scalars and ranges for json.dumps. Anything else (e.g. event functions or solver
+    classes) can not be hashed stably and raises a TypeError.
+    """
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, range):
+        return list(obj)
+    raise TypeError(f'{type(obj).__name__} can not be used in a cache key')
+
+
+def _code(obj):
+    """
+    Converts the functions (profiles, rates) and reactions of a network for json.dumps. Functions are represented by
+    their bytecode and constants, leaving out nested code objects, whose repr contains their address.
+    """
+    function = getattr(obj, '__func__', obj)
+    code = getattr(function, '__code__', None)
+    if code is not None:
+        return [code.co_code.hex(), repr([c for c in code.co_consts if not hasattr(c, 'co_code')])]
+    if hasattr(obj, '__dict__'):
+        return [type(obj).__name__, vars(obj)]
+    raise TypeError(f'{type(obj).__name__} can not be used in a cache key')
+
+
+def _definition(model) -> str:
+    """
+    Hash of the equations of a model: the generated source and the reactions (including how their parameters are
+    packed from the constants) of its network, or the rhs if it does not define a network. Runs of a model whose
+    reactions were edited get new keys.
+    """
+    network = model.network
+    if network is None:
+        content = _code(model._rhs)
+    else:
+        content = [network.source, network.reactions]
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=_code).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Cache of solved models. Results are addressed by a hash of the model class and its equations (see _definition),
+    its constants, the initial values, the time range and the options passed to run, so identical runs (e.g. across
+    notebooks or pipeline stages) are only integrated once.
+
+    Results are kept in an in-memory LRU and, when a directory is given, in .npz files that are shared between
+    processes and sessions. Files that have not been used for max_age seconds are removed, and the least recently
+    used files are removed when the directory grows beyond max_size bytes.
+    """
+    def __init__(self, directory: Optional[str] = None, max_entries: int = 128, max_size: int = 2 ** 30,
+                 max_age: Optional[float] = None):
+        """
+        :param directory: [Optional] Directory of the on-disk cache. If None, results are only cached in memory.
+        :param max_entries: Number of results kept in memory
+        :param max_size: Maximum total size (in bytes) of the on-disk cache
+        :param max_age: [Optional] Time (in s) after which unused results are removed from the on-disk cache
+        """
+        self.directory = None if directory is None else os.path.expanduser(directory)
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.max_age = max_age
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()  # Models may share a cache across threads
+
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def __getstate__(self):
+        # The lock can not be pickled (e.g. when a model is sent to a worker process), each process gets its own
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model, t, init, **options) -> Optional[str]:
+        """
+        Content address of a run
+
+        :param model: Model that is run (its class, equations and constants are hashed)
+        :param t: Time range (in min) that will be integrated over
+        :param init: Initial concentrations of haem species (in M)
+        :param options: Remaining arguments of run (e.g. t_eval, method, rtol, sensitivities)
+        :return: Hex digest, or None if the run can not be cached (dense output or options that can not be hashed)
+        """
+        if options.get('dense_output'):
+            return None
+        content = {'model': f'{type(model).__module__}.{type(model).__qualname__}',
+                   'definition': _definition(model),
+                   'const': vars(model.const),
+                   't': t,
+                   'init': init,
+                   'options': options}
+        try:
+            serialised = json.dumps(content, sort_keys=True, default=_jsonable)
+        except TypeError:
+            return None
+        return hashlib.sha256(serialised.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.npz')
+
+    def get(self, key: str) -> Optional[Tuple[OptimizeResult, dict]]:
+        """
+        :param key: Content address from key
+        :return: Tuple of (solution, solver_info), or None if the result is not cached
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return copy.deepcopy(self._memory[key])
+        if self.directory is None or not os.path.exists(self._path(key)):
+            return None
+
+        path = self._path(key)
+        if self.max_age is not None and time.time() - os.path.getmtime(path) > self.max_age:
+            self._remove(path)
+            return None
+        with np.load(path) as saved:
+            info = json.loads(str(saved['info']))
+            t_events = [saved[f't_events_{k}'] for k in range(info.pop('n_events'))] or None
+            solution = OptimizeResult(t=saved['t'], y=saved['y'], sol=None, t_events=t_events, y_events=None,
+                                      status=info['status'], message=info.pop('message'),
+                                      success=info['status'] >= 0, nfev=info['nfev'], njev=info['njev'],
+                                      nlu=info['nlu'])
+        os.utime(path)  # Mark as recently used
+        self._remember(key, (solution, info))
+        return copy.deepcopy((solution, info))
+
+    def put(self, key: str, solution: OptimizeResult, solver_info: dict):
+        """
+        Stores a result and evicts old results
+
+        :param key: Content address from key
+        :param solution: Solution returned by solve_ivp
+        :param solver_info: Solver info recorded by the model
+        :return:
+        """
+        # Crossing times of events (see Threshold) are kept, dense output is not cached
+        t_events = None if solution.t_events is None else [np.array(t) for t in solution.t_events]
+        solution = OptimizeResult(t=np.array(solution.t), y=np.array(solution.y), sol=None, t_events=t_events,
+                                  y_events=None, status=solution.status, message=solution.message,
+                                  success=solution.success, nfev=solution.nfev, njev=solution.njev, nlu=solution.nlu)
+        self._remember(key, (solution, copy.deepcopy(solver_info)))
+        if self.directory is None:
+            return
+
+        # Write to a temporary file first so that other processes never read a partial result
+        info = dict(solver_info, message=solution.message, n_events=len(t_events or []))
+        events = {f't_events_{k}': t for k, t in enumerate(t_events or [])}
+        tmp_file = f'{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_file, 'wb') as f:
+            np.savez(f, t=solution.t, y=solution.y, info=np.array(json.dumps(info)), **events)
+        os.replace(tmp_file, self._path(key))
+        self.evict()
+
+    def _remember(self, key: str, result: tuple):
+        with self._lock:
+            self._memory[key] = result
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def evict(self):
+        """
+        Removes results from the on-disk cache that are older than max_age, then the least recently used results
+        until the cache is smaller than max_size
+        :return:
+        """
+        if self.directory is None:
+            return
+        now = time.time()
+        files = []
+        for path in glob.glob(os.path.join(self.directory, '*.npz')):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:  # Removed by another process
+                continue
+            if self.max_age is not None and now - stat.st_mtime > self.max_age:
+                self._remove(path)
+            else:
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_size:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:  # Removed by another process
+            pass
+
+    def clear(self):
+        """
+        Removes all cached results
+        :return:
+        """
+        with self._lock:
+            self._memory.clear()
+        if self.directory is not None:
+            for path in glob.glob(os.path.join(self.directory, '*.npz')):
+                self._remove(path)
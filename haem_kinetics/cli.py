@@ -0,0 +1,301 @@
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import sys
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from loguru import logger
+from typing import List, Optional
+
+from haem_kinetics.models import jit
+from haem_kinetics.sinks import ArrowSink, BinarySink, HDF5Sink, ParquetSink
+from haem_kinetics.store import ResultStore
+from haem_kinetics.sweep import Sweep
+
+try:
+    import yaml
+except ImportError:  # Optional dependency, install with pip install haem_kinetics[cli]
+    yaml = None
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11, install with pip install haem_kinetics[cli]
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+# Models that can be selected by class name in a job file. Any other model is selected by its full path, e.g.
+# 'my_package.my_module.MyModel'.
+MODELS = {'Model1': 'haem_kinetics.models.model1',
+          'Model2': 'haem_kinetics.models.model2',
+          'Model3': 'haem_kinetics.models.model3',
+          'Model4': 'haem_kinetics.models.model4',
+          'Degradation': 'haem_kinetics.models.degradation'}
+
+# Output formats and the file extensions they are inferred from. A path without a known extension is a ResultStore.
+SINKS = {'parquet': ParquetSink, 'arrow': ArrowSink, 'hdf5': HDF5Sink, 'binary': BinarySink}
+EXTENSIONS = {'.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow', '.h5': 'hdf5', '.hdf5': 'hdf5',
+              '.bin': 'binary'}
+
+JOB_KEYS = {'name', 'model', 'constants', 'init', 't', 't_eval', 'solver', 'sweep', 'output'}
+
+EXAMPLE = """
+example job file (YAML, the same keys are used in TOML):
+
+  model: Model3                      # Class name (see MODELS) or full path of a KineticsModel
+  constants: {fudge: 2.0, k_enzymes.hap.kcat: 0.2}
+  init: [0.018, 0.0, 0.0, 0.0]       # In M, or one list per run for an ensemble
+  t: [0, 1700]                       # In min
+  t_eval: {start: 0, stop: 1700, step: 20}
+  solver: {method: LSODA, rtol: 1.0e-6}
+  sweep:                             # Optional, grid or latin_hypercube
+    grid: {k_hz: [0.1, 0.15, 0.2]}
+    chunk_size: 32
+  output: {path: results/model3, dtype: float32}
+
+Several jobs can be given in one file as a list under 'jobs'.
+"""
+
+
+def load_jobs(path: str) -> List[dict]:
+    """
+    Reads the jobs of a YAML (.yaml, .yml) or TOML (.toml) job file
+
+    :param path: Path of the job file
+    :return: Jobs, one dictionary per job. Jobs without a name are named after the file (and their position in it).
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.yaml', '.yml'):
+        if yaml is None:
+            raise ImportError('pyyaml is required to read YAML job files (pip install haem_kinetics[cli])')
+        with open(path) as f:
+            config = yaml.safe_load(f)
+    elif extension == '.toml':
+        if tomllib is None:
+            raise ImportError('tomli is required to read TOML job files (pip install haem_kinetics[cli])')
+        with open(path, 'rb') as f:
+            config = tomllib.load(f)
+    else:
+        raise ValueError(f'Unknown job file {path}, must be .yaml, .yml or .toml')
+
+    jobs = config['jobs'] if 'jobs' in config else [config]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    for k, job in enumerate(jobs):
+        unknown = set(job) - JOB_KEYS
+        if unknown:
+            raise ValueError(f'Unknown keys {sorted(unknown)} in {path}, must be any of {sorted(JOB_KEYS)}')
+        for key in ('model', 't', 'output'):
+            if key not in job:
+                raise ValueError(f'Job {k} of {path} has no {key}')
+        job.setdefault('name', stem if len(jobs) == 1 else f'{stem}[{k}]')
+    return jobs
+
+
+def model_class(name: str):
+    """
+    :param name: Class name of one of MODELS, or the full path of a model class
+    :return: Model class
+    """
+    module, _, class_name = (MODELS[name], '.', name) if name in MODELS else name.rpartition('.')
+    if not module:
+        raise ValueError(f'Unknown model {name}, must be one of {list(MODELS)} or the full path of a model class')
+    return getattr(importlib.import_module(module), class_name)
+
+
+def _t_eval(t_eval) -> Optional[np.ndarray]:
+    # Either a list of time points or a range {start, stop, step} (stop excluded, as in range)
+    if t_eval is None or isinstance(t_eval, list):
+        return None if t_eval is None else np.asarray(t_eval, dtype=float)
+    return np.arange(t_eval.get('start', 0), t_eval['stop'], t_eval['step'], dtype=float)
+
+
+def _output_format(output: dict) -> str:
+    output_format = output.get('format') or EXTENSIONS.get(os.path.splitext(output['path'])[1].lower(), 'store')
+    if output_format not in list(SINKS) + ['store']:
+        raise ValueError(f'Unknown output format {output_format}, must be one of {list(SINKS) + ["store"]}')
+    return output_format
+
+
+def _is_single(job: dict) -> bool:
+    # One set of initial values and no sweep, streamed to a sink as it is solved
+    return 'sweep' not in job and np.ndim(job.get('init', [])) < 2 and _output_format(job['output']) != 'store'
+
+
+def _sink(output: dict):
+    output_format = _output_format(output)
+    return SINKS[output_format](output['path'], **({'dtype': output['dtype']} if 'dtype' in output else {}))
+
+
+def _marker(job: dict) -> str:
+    # Written next to the output once a job completes
+    return os.path.join(job['output']['path'], 'job.json') if _output_format(job['output']) == 'store' else \
+        f'{job["output"]["path"]}.job.json'
+
+
+def _fingerprint(job: dict) -> str:
+    return hashlib.sha256(json.dumps({key: value for key, value in job.items() if key != 'name'},
+                                     sort_keys=True, default=str).encode()).hexdigest()
+
+
+def is_complete(job: dict) -> bool:
+    """
+    :param job: Job from load_jobs
+    :return: Whether the output of the job was completed by a job with the same settings
+    """
+    marker = _marker(job)
+    if not os.path.exists(marker):
+        return False
+    with open(marker) as f:
+        return json.load(f).get('fingerprint') == _fingerprint(job)
+
+
+def _sweep(job: dict, model) -> Sweep:
+    """
+    Sweep of a job. The constant overrides are added to the design as fixed columns, since the runs are solved by
+    fresh models in the worker processes.
+    """
+    sweep = job.get('sweep') or {}
+    init = np.atleast_2d(np.asarray(job.get('init', list(model.initial_values.values())), dtype=float))
+    kwargs = dict(job.get('solver') or {}, t=job['t'], init=init, t_eval=_t_eval(job.get('t_eval')))
+    if kwargs['t_eval'] is None:
+        raise ValueError(f'Job {job["name"]} needs t_eval')
+
+    unknown = set(sweep) - {'grid', 'latin_hypercube', 'chunk_size'}
+    if unknown or ('grid' in sweep and 'latin_hypercube' in sweep):
+        raise ValueError(f'The sweep of job {job["name"]} must have one of grid or latin_hypercube (and chunk_size)')
+    if 'grid' in sweep:
+        result = Sweep.grid(type(model), values=sweep['grid'], **kwargs)
+    elif 'latin_hypercube' in sweep:
+        design = sweep['latin_hypercube']
+        result = Sweep.latin_hypercube(type(model), bounds={name: tuple(bounds) for name, bounds in
+                                                            design['bounds'].items()},
+                                       n_samples=design['n_samples'], seed=design.get('seed'), **kwargs)
+    else:
+        result = Sweep(type(model), param_names=[], design=np.empty((len(init), 0)), **kwargs)
+
+    constants = job.get('constants') or {}
+    if constants:
+        overlap = set(constants) & set(result.param_names)
+        if overlap:
+            raise ValueError(f'Constants {sorted(overlap)} of job {job["name"]} are both set and swept')
+        fixed = np.array([float(value) for value in constants.values()])
+        result.param_names += list(constants)
+        result.design = np.hstack([result.design, np.broadcast_to(fixed, (len(result.design), len(fixed)))])
+    return result
+
+
+def run_job(job: dict, n_workers: Optional[int] = None, resume: bool = False) -> str:
+    """
+    Runs a job and writes its output. A single run (one set of initial values and no sweep) is streamed to a sink
+    as it is solved (see KineticsModel.stream). Sweeps and ensembles are solved on n_workers processes and each
+    chunk of runs is written as it completes (see Sweep.write and Sweep.store).
+
+    :param job: Job from load_jobs
+    :param n_workers: [Optional] Number of worker processes of sweeps. Defaults to the number of CPUs.
+    :param resume: If True, a job whose output was completed with the same settings is skipped, and a sweep stored
+                   in a ResultStore only solves the runs that are missing from it
+    :return: Status of the job, 'done' or 'skipped'
+    """
+    if resume and is_complete(job):
+        logger.info(f'{job["name"]}: skipped, {job["output"]["path"]} is complete')
+        return 'skipped'
+
+    # The marker of an earlier run is removed first, so an output that is being rewritten is never marked complete
+    if os.path.exists(_marker(job)):
+        os.remove(_marker(job))
+    model = model_class(job['model'])()
+    output = job['output']
+    output_format = _output_format(output)
+    if os.path.dirname(output['path']):
+        os.makedirs(os.path.dirname(output['path']), exist_ok=True)
+
+    if _is_single(job):
+        for name, value in (job.get('constants') or {}).items():
+            model.const.set_value(name, value)
+        t_eval = _t_eval(job.get('t_eval'))
+        if t_eval is None:
+            raise ValueError(f'Job {job["name"]} needs t_eval')
+        solver = dict(job.get('solver') or {})
+        with _sink(output) as sink:
+            solver_info = model.stream(t=job['t'], sink=sink, t_eval=t_eval, init=job.get('init'),
+                                       chunk_size=output.get('chunk_size', 10000), **solver)
+        if solver_info['status'] < 0:
+            raise RuntimeError(f'The solver failed after {solver_info["n_points"]} time points')
+        logger.info(f'{job["name"]}: {solver_info["n_points"]} time points written to {output["path"]} '
+                    f'({solver_info["method"]}, {solver_info["n_steps"]} steps)')
+    else:
+        sweep = _sweep(job, model)
+        chunk_size = (job.get('sweep') or {}).get('chunk_size', 32)
+        if output_format == 'store':
+            if not resume:
+                ResultStore.create(output['path'], model=model, time=sweep.time, design=sweep.design,
+                                   param_names=sweep.param_names, inits=sweep.inits,
+                                   dtype=output.get('dtype', 'float64'))
+            store = sweep.store(output['path'], n_workers=n_workers, chunk_size=chunk_size,
+                                dtype=output.get('dtype', 'float64'))
+            n_runs = store.n_runs
+        else:
+            with _sink(output) as sink:
+                n_runs = sweep.write(sink, n_workers=n_workers, chunk_size=chunk_size)
+        logger.info(f'{job["name"]}: {n_runs} runs written to {output["path"]}')
+
+    with open(_marker(job), 'w') as f:
+        json.dump({'name': job['name'], 'fingerprint': _fingerprint(job)}, f)
+    return 'done'
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Entry point of the haem-kinetics command
+
+    :param argv: [Optional] Command line arguments, defaults to sys.argv[1:]
+    :return: Exit status, 0 if every job succeeded
+    """
+    parser = argparse.ArgumentParser(prog='haem-kinetics', description='Runs the simulations defined in job files',
+                                     epilog=EXAMPLE, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('job_files', nargs='+', help='YAML or TOML job files')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='Number of worker processes: single runs are run in parallel and sweeps are spread '
+                             'over the workers (default: 1)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip jobs whose output is complete and only solve the missing runs of stored sweeps')
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+
+    jobs = [job for path in args.job_files for job in load_jobs(path)]
+    singles = [job for job in jobs if _is_single(job)]
+    queue = [job for job in jobs if not _is_single(job)]
+
+    # Single runs are spread over the workers as whole jobs, sweeps spread their own runs over the workers
+    failed = 0
+    if args.jobs > 1 and len(singles) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs, mp_context=jit.worker_context()) as executor:
+            futures = {executor.submit(run_job, job, resume=args.resume): job for job in singles}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as error:
+                    logger.error(f'{futures[future]["name"]}: {error}')
+                    failed += 1
+    else:
+        queue = singles + queue
+
+    for job in queue:
+        try:
+            run_job(job, n_workers=args.jobs, resume=args.resume)
+        except Exception as error:
+            logger.error(f'{job["name"]}: {error}')
+            failed += 1
+
+    if failed:
+        logger.error(f'{failed} of {len(jobs)} jobs failed')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,82 @@
 
+import numpy as np
+
+from typing import Dict, List
+
+
+class _TrackedDict(dict):
+    """
+    Dictionary of constants (e.g. the enzyme constants) whose changes invalidate the derived constants (see
+    Constants.derived). Nested dictionaries are tracked as well.
+    """
+    # Incremented by every change of any tracked dictionary
+    generation = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.update(*args, **kwargs)
+
+    @staticmethod
+    def _changed():
+        _TrackedDict.generation += 1
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, _track(value))
+        self._changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._changed()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self._changed()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._changed()
+        return item
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+
+def _track(value):
+    """
+    :param value: Value of a constant
+    :return: The value, with dictionaries replaced by tracked dictionaries
+    """
+    if isinstance(value, dict) and not isinstance(value, _TrackedDict):
+        return _TrackedDict(value)
+    return value
+
+
 class Constants:
+    """
+    Constants of the models. Besides the base constants set in __init__, the combinations of them that the rate laws
+    use (e.g. the lipid sequestration constant and the maximum rate of each enzyme) are kept in a cache of derived
+    constants (see derived), which is invalidated whenever a constant is set or an entry of the enzyme dictionaries is
+    changed.
+    """
+    # The derived constants are kept in a slot, so they are not part of vars() (which is hashed by ResultCache and
+    # saved by ResultStore), nor of copies or pickles of the constants
+    __slots__ = ('__dict__', '__weakref__', '_derived')
+
     def __init__(self):
 
         # -------------------------------------------------------------------------------------
@@ -69,6 +146,108 @@ class Constants:
         # -------------------------------------------------------------------------------------
         self.K_partition = 398  # Fe(III)PPIX lipid partitioning coefficient
 
+    def __setattr__(self, name, value):
+        super().__setattr__(name, _track(value))
+        object.__setattr__(self, '_derived', None)
+
+    def __getstate__(self):
+        return self.__dict__
+
+    @property
+    def derived(self) -> Dict:
+        """
+        Derived constants, computed once and kept until a constant is changed. They can be addressed by name like any
+        other constant, e.g. get_value('derived.vmax.hap'), but can not be set.
+         * lipid_seq: Fraction of Fe(III)PP that is not sequestered in lipids (see compute_lipid_seq_constant)
+         * k_ox_eff: Rate constant (min-1) of Fe(II)PP oxidation, k_fe2pp_ox * conc_oxy
+         * k_red_eff: Rate constant (min-1) of Fe(III)PP reduction, k_fe3pp_red * lipid_seq * conc_supoxy
+         * k_hz_eff: Rate constant (min-1) of Hz formation, k_hz * lipid_seq
+         * vmax: Maximum rate (M.min-1) of each enzyme, kcat (s-1) * 60 * [enzyme], before any fudge factor
+         * km: Michaelis constant (M) of each enzyme
+
+        :return: Dictionary of derived constants (must not be modified)
+        """
+        return self._derived_cache()[1]
+
+    @property
+    def derived_names(self) -> List[str]:
+        """
+        Names of the derived constants in derived_vector, e.g. 'lipid_seq' or 'vmax.hap'
+        """
+        return self._derived_cache()[2]
+
+    def derived_vector(self) -> np.ndarray:
+        """
+        :return: Derived constants as a flat vector, in the order of derived_names (must not be modified)
+        """
+        return self._derived_cache()[3]
+
+    def _derived_cache(self) -> tuple:
+        """
+        :return: Tuple of (generation of the tracked dictionaries, derived constants, names and vector of the derived
+                 constants), recomputed if a constant was changed since it was cached
+        """
+        cached = getattr(self, '_derived', None)
+        if cached is not None and cached[0] == _TrackedDict.generation:
+            return cached
+
+        lipid_seq = (1 - self.vol_fract_lip) / (1 + self.vol_fract_lip + (self.vol_fract_lip * self.K_partition))
+        derived = {'lipid_seq': lipid_seq,
+                   'k_ox_eff': self.k_fe2pp_ox * self.conc_oxy,
+                   'k_red_eff': self.k_fe3pp_red * lipid_seq * self.conc_supoxy,
+                   'k_hz_eff': self.k_hz * lipid_seq,
+                   'vmax': {e: k['kcat'] * 60 * self.conc_enzymes[e] for e, k in self.k_enzymes.items()},
+                   'km': {e: k['Km'] for e, k in self.k_enzymes.items()}}
+        names, values = [], []
+        for name, value in derived.items():
+            for key, entry in (value.items() if isinstance(value, dict) else [(None, value)]):
+                names.append(name if key is None else f'{name}.{key}')
+                values.append(entry)
+
+        cached = (_TrackedDict.generation, derived, names, np.array(values))
+        object.__setattr__(self, '_derived', cached)
+        return cached
+
+    def get_value(self, name: str):
+        """
+        Gets the value of a constant by name. Entries of the enzyme dictionaries are addressed with dots, e.g.
+        'k_enzymes.hap.kcat' or 'conc_enzymes.plm_1'.
+
+        :param name: Name of the constant
+        :return: Value of the constant
+        """
+        value = self
+        for key in name.split('.'):
+            if isinstance(value, dict):
+                if key not in value:
+                    raise KeyError(f'Unknown constant: {name}')
+                value = value[key]
+            elif hasattr(value, key):
+                value = getattr(value, key)
+            else:
+                raise KeyError(f'Unknown constant: {name}')
+        return value
+
+    def set_value(self, name: str, value):
+        """
+        Sets the value of an existing constant by name (see get_value).
+
+        :param name: Name of the constant
+        :param value: New value of the constant
+        :return:
+        """
+        # Check that the constant exists so that typos are not silently added as new constants
+        self.get_value(name)
+        if name.split('.')[0] == 'derived':
+            raise KeyError(f'Derived constants can not be set: {name}')
+
+        *path, key = name.split('.')
+        target = self.get_value('.'.join(path)) if path else self
+        if isinstance(target, dict):
+            target[key] = value
+        else:
+            setattr(target, key, value)
+
     def _dv_ppm_to_molar(self, ppm) -> float:
         """
         Converts the concentration of an enzyme in the digestive vacuole from ppm to Molar.
@@ -105,4 +284,4 @@ class Constants:
         return hb_conc * 4
 
     def compute_lipid_seq_constant(self):
-        return (1 - self.vol_fract_lip) / (1 + self.vol_fract_lip + (self.vol_fract_lip * self.K_partition))
+        return self.derived['lipid_seq']
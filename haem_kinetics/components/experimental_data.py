@@ -1,27 +1,40 @@
-import pandas as pd
+from haem_kinetics.lazy import lazy_import
+
+# Only loaded when the data is first used (see LazyModule)
+pd = lazy_import('pandas')
 
 
 class ExperimentalData:
 
     def __init__(self):
-        self.data = pd.DataFrame()
         self.time = []
         self.hb = []
         self.hm = []
         self.hz = []
+        self._data = None
+
+    @property
+    def data(self) -> 'pd.DataFrame':
+        # Every model loads its experimental data, so the DataFrame is only built when the data is actually used
+        if self._data is None:
+            self._convert_to_dataframe()
+        return self._data
+
+    @data.setter
+    def data(self, data: 'pd.DataFrame'):
+        self._data = data
 
     def _convert_to_dataframe(self):
         # Add Haemoglobin to dataframe
-        df_temp = pd.DataFrame(self.hb, columns=['Hb', 'Hb:SEM'], index=self.time)
-        self.data = pd.concat([self.data, df_temp])
+        self._data = pd.DataFrame(self.hb, columns=['Hb', 'Hb:SEM'], index=self.time)
 
         # Add free haem to dataframe
         df_temp = pd.DataFrame(self.hm, columns=['Hm', 'Hm:SEM'], index=self.time)
-        self.data = self.data.merge(df_temp, left_index=True, right_index=True)
+        self._data = self._data.merge(df_temp, left_index=True, right_index=True)
 
         # Add haemozoin to dataframe
         df_temp = pd.DataFrame(self.hz, columns=['Hz', 'Hz:SEM'], index=self.time)
-        self.data = self.data.merge(df_temp, left_index=True, right_index=True)
+        self._data = self._data.merge(df_temp, left_index=True, right_index=True)
 
     def no_drug_nf54(self):
         self.time = [21, 24, 27, 30, 33, 36, 39, 41, 44, 47]  # In hours
@@ -42,8 +55,8 @@ class ExperimentalData:
                    [35.80161476, 4.290657439], [40.23068051, 4.705882353], [51.30334487, 0], [56.83967705, 6.551326413],
                    [65.88235294, 2.952710496], [69.38869666, 8.581314879]]
 
-        # Convert to dataframe
-        self._convert_to_dataframe()
+        # Converted to a dataframe when first used
+        self._data = None
 
     def no_drug_dd2(self):
         self.time = [20, 23, 26, 29, 32, 35, 38, 41, 44]  # In hours
@@ -60,5 +73,5 @@ class ExperimentalData:
         self.hz = [[23.05, 8.49], [28.22, 8.72], [31.29, 7.3], [33.76, 4.125], [43.75, 5.025], [54.6, 7.592],
                    [66.76, 12.63], [76.97, 15.91], [97.65, 20.75]]
 
-        # Convert to dataframe
-        self._convert_to_dataframe()
+        # Converted to a dataframe when first used
+        self._data = None
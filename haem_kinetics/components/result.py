@@ -0,0 +1,153 @@
+import numpy as np
+
+from typing import Callable, Dict, List, Optional
+
+from haem_kinetics.lazy import lazy_import
+
+# Only loaded when a DataFrame is asked for (see LazyModule)
+pd = lazy_import('pandas')
+
+
+class Concentrations:
+    """
+    Time courses of the species of a run, backed by the array returned by the solver (one row per species). The
+    conversion from M to fg/cell is a single scalar factor that is applied when values are requested, and a
+    DataFrame (one row per time point, one column per species) is only built when one is asked for, e.g. with
+    to_dataframe, or when an attribute of DataFrame (to_csv, loc, ...) is used.
+    """
+    known_units = ('fg/cell', 'M')
+
+    def __init__(self, y: np.ndarray, species: List[str], time, factor: float = 1.0, units: str = 'fg/cell',
+                 derived: Optional[Callable[[np.ndarray], Dict[str, np.ndarray]]] = None):
+        """
+        :param y: Solved concentrations (in M) with shape (n_species, n_times), e.g. solution.y
+        :param species: Names of the rows of y - order matters
+        :param time: Time points (in hrs)
+        :param factor: Conversion factor from M to fg/cell
+        :param units: Units of the values, 'fg/cell' or 'M'
+        :param derived: [Optional] Function of y that returns the concentrations derived from the integrated species
+                        (e.g. observed Hb) as a dictionary of name -> array of shape (n_times,). Derived
+                        concentrations must be linear in y so that they convert with the same factor.
+        """
+        if units not in self.known_units:
+            raise ValueError(f'Unknown units {units}, must be one of {self.known_units}')
+        self._y = y
+        self.species = list(species)
+        self.time = time
+        self.factor = factor
+        self.units = units
+        self._derived = derived
+        self._columns = None
+        self._values = None
+        self._df = None
+
+    def _raw(self) -> np.ndarray:
+        # Derived concentrations and the unit conversion are only computed once values are needed
+        if self._values is None:
+            derived = {} if self._derived is None else self._derived(self._y)
+            values = np.vstack([self._y] + [np.broadcast_to(value, self._y.shape[1:]) for value in derived.values()])
+            if self.units == 'fg/cell':
+                values *= self.factor
+            self._columns = self.species + list(derived)
+            self._values = values
+        return self._values
+
+    @property
+    def columns(self) -> List[str]:
+        self._raw()
+        return list(self._columns)
+
+    @property
+    def index(self):
+        return self.time
+
+    @property
+    def shape(self) -> tuple:
+        return len(self.time), len(self.columns)
+
+    @property
+    def values(self) -> np.ndarray:
+        """
+        :return: Concentrations with shape (n_times, n_columns), as DataFrame.values
+        """
+        return self._raw().T
+
+    def array(self, columns: Optional[List[str]] = None) -> np.ndarray:
+        """
+        :param columns: [Optional] Names of the species, defaults to all species (including derived ones)
+        :return: Concentrations with shape (n_columns, n_times)
+        """
+        values = self._raw()
+        if columns is None:
+            return values
+        return values[[self._columns.index(column) for column in columns]]
+
+    def to(self, units: str) -> 'Concentrations':
+        """
+        :param units: 'fg/cell' or 'M'
+        :return: The same concentrations in the given units, sharing the solved array
+        """
+        return Concentrations(y=self._y, species=self.species, time=self.time, factor=self.factor, units=units,
+                              derived=self._derived)
+
+    def to_dataframe(self) -> 'pd.DataFrame':
+        """
+        :return: Concentrations with one row per time point and one column per species. The DataFrame is built once.
+        """
+        if self._df is None:
+            self._df = pd.DataFrame(self.values, index=self.time, columns=self.columns)
+        return self._df
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return pd.Series(self.array([key])[0], index=self.time, name=key)
+        return pd.DataFrame(self.array(list(key)).T, index=self.time, columns=list(key))
+
+    def __getattr__(self, name):
+        # Anything else is answered by the DataFrame (to_csv, loc, plot, ...)
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.to_dataframe(), name)
+
+    def __array__(self, dtype=None):
+        return self.values if dtype is None else self.values.astype(dtype)
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def __repr__(self) -> str:
+        return repr(self.to_dataframe())
+
+
+class ModelResult:
+    """
+    Results of a single run of a model. Each call to KineticsModel.run returns its own result, so results of runs
+    that share a model instance (e.g. from several threads) do not overwrite each other.
+    """
+    def __init__(self, model_name: str, init: List[float], time, concentrations: Concentrations, solution,
+                 solver_info: dict, sensitivities: Dict[str, Concentrations], profile=None,
+                 events: Optional[Dict[str, np.ndarray]] = None):
+        """
+        :param model_name: Name of the model that was run
+        :param init: Initial concentrations of haem species (in M)
+        :param time: Time points of the solution (in hrs)
+        :param concentrations: Solved concentrations of haem species (in fg/cell)
+        :param solution: Solution returned by solve_ivp
+        :param solver_info: Selected solver and cost of the integration (see KineticsModel.run)
+        :param sensitivities: Sensitivities dY/d(constant) (in fg/cell per unit of the constant) of each requested
+                              constant
+        :param profile: [Optional] SolverProfile of the run, if it was profiled (see KineticsModel.run)
+        :param events: [Optional] Crossing times (in hrs) of each threshold of the run (see Threshold)
+        """
+        self.model_name = model_name
+        self.init = list(init)
+        self.time = time
+        self.concentrations = concentrations
+        self.solution = solution
+        self.solver_info = solver_info
+        self.sensitivities = sensitivities
+        self.profile = profile
+        self.events = {} if events is None else events
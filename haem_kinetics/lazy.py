@@ -0,0 +1,30 @@
+import importlib
+import importlib.util
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a module that is only imported when one of its attributes is first used, e.g. pandas when a
+    DataFrame is asked for. Heavy optional parts of the package (plotting, DataFrame output, the JIT backend) are
+    loaded this way so that importing a model, a worker process or the command line stays fast.
+
+    Type annotations that name a lazy module (e.g. pd.DataFrame) must be strings, or the module is imported when the
+    annotated function is defined.
+    """
+    def __getattr__(self, name):
+        module = importlib.import_module(self.__name__)
+        # Later lookups find the attributes directly instead of going through __getattr__
+        self.__dict__.update(module.__dict__)
+        return getattr(module, name)
+
+
+def lazy_import(name: str, optional: bool = False):
+    """
+    :param name: Name of the module, e.g. 'pandas' or 'pyarrow.parquet'
+    :param optional: If True, None is returned when the module is not installed
+    :return: LazyModule that imports the module on first use (or None)
+    """
+    if optional and importlib.util.find_spec(name.partition('.')[0]) is None:
+        return None
+    return LazyModule(name)
@@ -1,13 +1,61 @@
-import matplotlib.pyplot as plt
-import pandas as pd
+import copy
+import warnings
+import numpy as np
+import scipy.integrate
 
-from typing import List, Optional
+from scipy.integrate import solve_ivp
+from scipy.optimize import OptimizeResult
+from scipy.sparse import block_diag, csc_matrix
+from time import perf_counter
+from typing import Dict, List, Optional
 
 from haem_kinetics.components.constants import Constants
 from haem_kinetics.components.experimental_data import ExperimentalData
+from haem_kinetics.components.result import Concentrations, ModelResult
+from haem_kinetics.lazy import lazy_import
+from haem_kinetics.models import jit
+from haem_kinetics.models.events import Threshold
+from haem_kinetics.models.profiling import SolverProfile
+
+# Only loaded when a plot or a DataFrame is asked for (see LazyModule)
+pd = lazy_import('pandas')
+plotting = lazy_import('haem_kinetics.plotting')
 
 
 class KineticsModel:
+    # Solvers in solve_ivp that make use of a Jacobian
+    implicit_methods = ('BDF', 'Radau', 'LSODA')
+
+    # Structure of the Jacobian (non-zero entries), must be overwritten for each model
+    jac_sparsity = None
+
+    # Declarative definition of the species and reactions of the model (see ReactionNetwork). When a model class
+    # defines a network, _set_initial_conc, _pack_params, _rhs, _jac and jac_sparsity are compiled from it.
+    network = None
+
+    # Solver selection when run is called without a method (or with method='auto'). A model is considered stiff
+    # when its fastest decay rate at t0 multiplied by the integration span exceeds stiffness_threshold, i.e. an
+    # explicit solver would need more than ~stiffness_threshold steps just to remain stable.
+    nonstiff_method = 'RK45'
+    stiff_method = 'LSODA'
+    stiffness_threshold = 1e3
+
+    # Method used when run is called without a method, 'auto' to select the solver from the stiffness of the model
+    default_method = 'auto'
+
+    # Whether the Hb supplied as initial values is taken from the Hb available in the RBC
+    deplete_rbc_hb = False
+
+    # Concentrations shown when a plot is requested from run
+    plot_columns = ['conc_hb_dv', 'conc_hz', 'conc_fe3pp']
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.__dict__.get('network') is not None:
+            cls._rhs = staticmethod(cls.network.rhs)
+            cls._jac = staticmethod(cls.network.jac)
+            cls.jac_sparsity = cls.network.sparsity
+
     def __init__(self, model_name):
 
         # General
@@ -21,84 +69,704 @@ class KineticsModel:
         self.differential_eqs = []  # Stores the differential eqs to be integrated
 
         # Solved results
-        self.concentrations = pd.DataFrame()    # Stores the solved time-course concentrations of haem species
+        self.concentrations = None  # Stores the solved time-course concentrations of haem species (Concentrations)
         self.time = []              # Stores the time-series for the solution
         self.solution = None        # Stores the entire integrated solution (gives access to additional info if needed)
+        self.solver_info = {}       # Stores the solver that was selected and its cost (e.g. number of rhs evaluations)
+        self.sensitivities = {}     # Stores the solved sensitivities dY/d(constant) of each requested constant
+        self.profile = None         # Stores the SolverProfile of the latest run when it was profiled
+        self.events = {}            # Stores the crossing times of the thresholds of the latest run
+
+        # Cache of solved results (see ResultCache). If None, every run is integrated.
+        self.cache = None
 
     def _set_initial_conc(self, init):
         """
         Function to set the initial concentration of haem species. Since each model could have different haem species
-        or ordering of haem species, this class function must be overwritten for each model
+        or ordering of haem species, this class function must be overwritten for each model that does not define a
+        network
         :param init: Initial values for haem concentrations (Order matters!)
         :return:
         """
-        raise NotImplementedError('_set_initial_conc must be overwritten by the model class')
+        if self.network is None:
+            raise NotImplementedError('_set_initial_conc must be overwritten by the model class')
+        if len(init) != len(self.network.species):
+            raise ValueError(f'{self.model_name} needs {len(self.network.species)} initial values')
+        for species, conc in zip(self.network.species, init):
+            self.initial_values[species] = conc
+
+    def _pack_params(self, const: Constants) -> np.ndarray:
+        """
+        Packs the constants used by the right-hand side of the model into a flat vector. Any sub-expression that does
+        not depend on time or concentration (e.g. vmax = kcat * [enzyme] * scale, where the scale of MichaelisMenten
+        applies the fudge factor) should be computed here once so that the right-hand side only needs to index into
+        the vector. Since each model has its own set of terms, the layout of the vector is defined by the model and
+        this class function must be overwritten for each model that does not define a network.
+
+        :param const: Constants used by the model
+        :return: Parameter vector to be passed to _rhs
+        """
+        if self.network is None:
+            raise NotImplementedError('_pack_params must be overwritten by the model class')
+        return self.network.pack(const)
+
+    @staticmethod
+    def _rhs(t, y, p):
+        """
+        Right-hand side of the differential equations. This is a pure function of time, concentrations and the
+        parameter vector from _pack_params so it can be handed straight to solve_ivp. It must accept y with shape
+        (n_species,) or (n_species, k) and return an array of the same shape.
+
+        :param t: Time (min)
+        :param y: Concentrations of haem species (in M) - order matters
+        :param p: Parameter vector from _pack_params
+        :return: Rate of change of each haem species (M.min-1)
+        """
+        raise NotImplementedError('_rhs must be overwritten by the model class')
+
+    @staticmethod
+    def _jac(t, y, p):
+        """
+        Analytic Jacobian of _rhs with respect to the concentrations, i.e. J[i, j] = d(dy[i]/dt)/dy[j]. Like _rhs this
+        is a pure function of time, concentrations and the parameter vector. Any trailing dimensions of y (or p) are
+        carried through, giving an array of shape (n_species, n_species, ...).
+
+        :param t: Time (min)
+        :param y: Concentrations of haem species (in M) - order matters
+        :param p: Parameter vector from _pack_params
+        :return: Jacobian matrix (min-1)
+        """
+        raise NotImplementedError('_jac must be overwritten by the model class')
+
+    def _solve(self, t, init, params: np.ndarray, backend: str = 'numpy', profile: Optional[SolverProfile] = None,
+               **kwargs):
+        """
+        Integrates _rhs with solve_ivp. The analytic Jacobian is passed to the implicit solvers (BDF, Radau and
+        LSODA) unless one is supplied in kwargs. If jac=None is given explicitly, the finite difference estimate
+        uses the sparsity pattern of the model instead.
+
+        :param t: Time range that will be integrated over
+        :param init: Initial values for haem concentrations (Order matters!)
+        :param params: Parameter vector from _pack_params
+        :param backend: 'numpy' or 'numba' (compiled _rhs and _jac, see _check_backend)
+        :param profile: [Optional] SolverProfile that records the calls of _rhs and _jac and the steps of the solver
+        :param kwargs: Additional arguments passed to solve_ivp (e.g. method, t_eval)
+        :return: Solution from solve_ivp
+        """
+        rhs, jac = self._rhs, self._jac
+        if backend == 'numba':
+            compiled = jit.jit_network(self.network)
+            rhs, jac = compiled.rhs, compiled.jac
+
+        if kwargs.get('method') in self.implicit_methods:
+            if 'jac' not in kwargs:
+                kwargs['jac'] = jac
+            elif kwargs['jac'] is None and self.jac_sparsity is not None:
+                kwargs.setdefault('jac_sparsity', self.jac_sparsity)
+
+        if profile is not None:
+            rhs = profile.wrap_rhs(rhs)
+            if callable(kwargs.get('jac')):
+                kwargs['jac'] = profile.wrap_jac(kwargs['jac'])
+            kwargs['method'] = profile.wrap_method(kwargs.get('method', 'RK45'))
+            start = perf_counter()
+            solution = solve_ivp(rhs, t, init, args=(params,), **kwargs)
+            profile.solver_time = perf_counter() - start
+            return solution
+
+        return solve_ivp(rhs, t, init, args=(params,), **kwargs)
+
+    def _param_directions(self, const: Constants, names: List[str]):
+        """
+        Derivative of the parameter vector from _pack_params with respect to each named constant, scaled by the value
+        of the constant (i.e. d(params)/d(ln constant)). Since _pack_params is algebraic, central differences are
+        accurate to ~1e-10 here. Constants with a value of 0 are not scaled.
+
+        :param const: Constants used by the model
+        :param names: Names of the constants (see Constants.get_value)
+        :return: Tuple of (directions with shape (n_params, n_constants), scale of each constant)
+        """
+        directions, scales = [], []
+        for name in names:
+            value = const.get_value(name)
+            scale = value if value != 0 else 1.0
+            step = 1e-5 * scale
+            packed = []
+            for perturbed_value in [value + step, value - step]:
+                perturbed = copy.deepcopy(const)
+                perturbed.set_value(name, perturbed_value)
+                packed.append(self._pack_params(const=perturbed))
+            directions.append((packed[0] - packed[1]) / (2 * step) * scale)
+            scales.append(scale)
+
+        return np.stack(directions, axis=1), np.array(scales)
+
+    def _solve_sensitivities(self, t, init, params: np.ndarray, directions: np.ndarray, **kwargs):
+        """
+        Integrates the model together with its forward sensitivities. The state is augmented with
+        s_k = dy/d(ln constant_k), which evolves as ds_k/dt = J s_k + (df/dp) directions_k. Both terms are the
+        directional derivative of _rhs along (s_k, directions_k), which is evaluated exactly for every constant at
+        once with a single complex-step call of _rhs. The implicit solvers are given the block-diagonal
+        approximation of the augmented Jacobian (J for the state and for each sensitivity).
+
+        :param t: Time range that will be integrated over
+        :param init: Initial values for haem concentrations (Order matters!)
+        :param params: Parameter vector from _pack_params
+        :param directions: Directions in parameter space from _param_directions
+        :param kwargs: Additional arguments passed to solve_ivp (e.g. method, t_eval)
+        :return: Solution from solve_ivp. Rows n_species * (k + 1) to n_species * (k + 2) of y hold s_k.
+        """
+        n_species, n_sens = len(init), directions.shape[1]
+        step = 1e-30  # Complex step, there is no subtractive cancellation so it can be tiny
+
+        def rhs(t, z, p):
+            sens = z[n_species:].reshape(n_sens, n_species).T
+            dz = self._rhs(t, z[:n_species, np.newaxis] + 1j * step * sens, p[:, np.newaxis] + 1j * step * directions)
+            return np.concatenate([dz[:, 0].real, (dz.imag / step).T.ravel()])
+
+        if kwargs.get('method') in self.implicit_methods and 'jac' not in kwargs:
+            def jac(t, z, p):
+                return np.kron(np.eye(n_sens + 1), self._jac(t, z[:n_species], p))
+
+            kwargs['jac'] = jac
+
+        init = np.concatenate([np.asarray(init, dtype=float), np.zeros(n_species * n_sens)])
+        return solve_ivp(rhs, t, init, args=(params,), **kwargs)
+
+    def _solve_ensemble(self, t, inits: np.ndarray, params: np.ndarray, **kwargs):
+        """
+        Integrates many runs of the model as one block-diagonal system. The state of run m occupies
+        y[m * n_species:(m + 1) * n_species], and each column of params holds the parameter vector of one run, so
+        _rhs and _jac evaluate every run at once. The implicit solvers are given the block-diagonal Jacobian, in
+        banded form for LSODA and as a sparse matrix for BDF and Radau.
+
+        :param t: Time range that will be integrated over
+        :param inits: Initial values for haem concentrations with shape (n_runs, n_species)
+        :param params: Parameter vectors from _pack_params with shape (n_params, n_runs)
+        :param kwargs: Additional arguments passed to solve_ivp (e.g. method, t_eval)
+        :return: Solution from solve_ivp
+        """
+        n_runs, n_species = inits.shape
+
+        def rhs(t, y, p):
+            return self._rhs(t, y.reshape(n_runs, n_species).T, p).T.ravel()
+
+        method = kwargs.get('method')
+        if method in self.implicit_methods and self.jac_sparsity is not None:
+            rows, cols = np.nonzero(self.jac_sparsity)
+            band = n_species - 1
+
+            if 'jac' not in kwargs and method == 'LSODA':
+                def jac(t, y, p):
+                    # Packed banded storage: jac_packed[band + i - j, j] = jac[i, j]
+                    lanes = self._jac(t, y.reshape(n_runs, n_species).T, p)
+                    packed = np.zeros((2 * band + 1, n_runs * n_species))
+                    for i, j in zip(rows, cols):
+                        packed[band + i - j, j::n_species] = lanes[i, j]
+                    return packed
+
+                kwargs.update(jac=jac, lband=band, uband=band)
+            elif 'jac' not in kwargs:
+                offsets = n_species * np.arange(n_runs)[:, np.newaxis]
+                block_rows = (offsets + rows).ravel()
+                block_cols = (offsets + cols).ravel()
+
+                def jac(t, y, p):
+                    lanes = self._jac(t, y.reshape(n_runs, n_species).T, p)
+                    return csc_matrix((lanes[rows, cols].T.ravel(), (block_rows, block_cols)),
+                                      shape=(n_runs * n_species, n_runs * n_species))
+
+                kwargs['jac'] = jac
+            elif kwargs['jac'] is None and method == 'LSODA':
+                kwargs.update(lband=band, uband=band)
+            elif kwargs['jac'] is None:
+                kwargs.setdefault('jac_sparsity', block_diag([self.jac_sparsity] * n_runs, format='csc'))
+
+        return solve_ivp(rhs, t, inits.ravel(), args=(params,), **kwargs)
+
+    def _solve_ensemble_jit(self, t, inits: np.ndarray, params: np.ndarray, t_eval, rtol: float = 1e-3,
+                            atol: float = 1e-6, max_steps: int = 100000):
+        """
+        Integrates many runs of the model with the compiled Rosenbrock integrator of the JIT backend (see
+        jit.JitNetwork). Each run is integrated independently with its own step sizes, in parallel over the available
+        threads, without returning to Python between steps.
+
+        :param t: Time range that will be integrated over
+        :param inits: Initial values for haem concentrations with shape (n_runs, n_species)
+        :param params: Parameter vectors from _pack_params with shape (n_params, n_runs)
+        :param t_eval: Time points (increasing) at which the solution is stored
+        :param rtol: Relative tolerance
+        :param atol: Absolute tolerance
+        :param max_steps: Maximum number of (accepted and rejected) steps per run
+        :return: Tuple of (concentrations (in M) with shape (n_runs, n_species, n_times), status per run)
+        """
+        t_eval = np.asarray(t_eval, dtype=float)
+        if np.any(np.diff(t_eval) <= 0) or t_eval[0] < t[0] or t_eval[-1] > t[-1]:
+            raise ValueError('t_eval must be increasing and within t')
+        compiled = jit.jit_network(self.network)
+        return compiled.integrate(float(t[0]), t_eval, np.ascontiguousarray(inits),
+                                  np.ascontiguousarray(params.T), float(rtol), float(atol), int(max_steps))
+
+    def _check_backend(self, backend: str) -> str:
+        """
+        The numba backend compiles the network of the model (see jit.JitNetwork). Models without a network and
+        environments without numba fall back to numpy with a warning, so the same code runs with or without the
+        optional dependency.
+
+        :param backend: 'numpy' or 'numba'
+        :return: Backend that will be used
+        """
+        if backend not in ('numpy', 'numba'):
+            raise ValueError(f'Unknown backend {backend}')
+        if backend == 'numba' and not jit.NUMBA_AVAILABLE:
+            warnings.warn('numba is not installed (pip install haem_kinetics[jit]), falling back to numpy')
+            return 'numpy'
+        if backend == 'numba' and self.network is None:
+            warnings.warn(f'{self.model_name} does not define a network and can not be compiled, falling back to '
+                          f'numpy')
+            return 'numpy'
+        return backend
 
-    # ToDo: Implement later
     def _plot(self, save_file: str, title: str, columns: Optional[List[str]] = None,
-              exp_data: Optional[ExperimentalData] = None):
-        # Set which data will be plotted
-        df_plot = self.concentrations if columns is None else self.concentrations[columns]
-
-        # Set up plot
-        fig, axes = plt.subplots(1, 2, figsize=(20, 10))
-        font_size = 16
-        plt.rcParams.update({'font.size': font_size})
-        fig.suptitle(title, fontsize=font_size + 8)
-        x_range = range(int(self.time[-1]), int(self.time[0]), -5)
-        for ax in axes:
-            ax.xaxis.label.set_fontsize(font_size)
-            ax.yaxis.label.set_fontsize(font_size)
-            ax.tick_params(axis='x', labelsize=font_size)
-            ax.tick_params(axis='y', labelsize=font_size)
-
-        plt.setp(axes, xticks=x_range, xlabel='Time (hrs)', ylabel='Fe (fg/cell)')
-
-        # Plot Hz
-        axes[1].plot(df_plot.index, df_plot['conc_hz'], 'r', label='conc_hz')
-        if exp_data:
-            axes[1].errorbar(exp_data.data.index, exp_data.data['Hz'], yerr=exp_data.data['Hz:SEM'].values,
-                             label='Exp Hz', fmt="o", mfc='white', ecolor='r', color='r')
-        axes[1].legend(loc='upper right')
-
-        # Plot remaining Haem species
-        cols = [col for col in df_plot.columns if col != 'conc_hz']
-        axes[0].plot(df_plot.index, df_plot[cols], label=cols)
-        if exp_data:
-            axes[0].errorbar(exp_data.data.index, exp_data.data['Hm'], yerr=exp_data.data['Hm:SEM'].values,
-                             label='Exp Haem', fmt="o", mfc='white', ecolor='orange', color='orange')
-            axes[0].errorbar(exp_data.data.index, exp_data.data['Hb'], yerr=exp_data.data['Hb:SEM'].values,
-                             label='Exp Hb', fmt="o", mfc='white', ecolor='b', color='b')
-        axes[0].legend(loc='upper left')
-
-        # Format
-
-        # Save output
-        axes[1].legend(loc='upper left')
-        plt.savefig(save_file)
-
-    def _molar_to_fgcell(self, df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Converts mol/L (molar) concentrations to fg/cell. We only need to consider mol/L -> fg because we start off
-        the calculation on a per cell basis. When we set the rate of Hb transport, we use 106 fg Fe which is the max
-        mass of iron PER CELL. This the per cell actually inherent through the entire calculation.
+              exp_data: Optional[ExperimentalData] = None, result: Optional[ModelResult] = None):
+        """
+        Saves the concentrations of a run (the haem species on the left and Hz on the right) with the RunPlotter of
+        the current thread, which reuses one Agg figure for all plots (see haem_kinetics.plotting)
+
+        :param save_file: Name of file to save the figure to
+        :param title: Title of the figure
+        :param columns: [Optional] Concentrations to plot, defaults to all of them
+        :param exp_data: [Optional] Experimental data shown with the run
+        :param result: [Optional] ModelResult of the run to plot, defaults to the latest run
+        :return:
+        """
+        result = self if result is None else result
+        columns = result.concentrations.columns if columns is None else list(columns)
+        plotting.plot_run(save_file, time=result.time, values=result.concentrations.array(columns).T, columns=columns,
+                          title=title, exp_data=exp_data)
+
+    def _fgcell_factor(self) -> float:
+        """
+        Factor that converts mol/L (molar) concentrations to fg/cell. We only need to consider mol/L -> fg because we
+        start off the calculation on a per cell basis. When we set the rate of Hb transport, we use 106 fg Fe which is
+        the max mass of iron PER CELL. This the per cell actually inherent through the entire calculation.
 
         I.e. concentration M is actually M/cell, etc.
 
         mol/cell -> fg/cell: mol * 10^15 * mw of Fe
 
-        :param df: Dataframe of concentrations in molar
+        :return: Conversion factor
         """
-        return df * self.const.vol_dv * (10 ** 15) * 55.85
+        return self.const.vol_dv * (10 ** 15) * 55.85
 
-    def run(self, t, init, kwargs):
+    def _molar_to_fgcell(self, df: 'pd.DataFrame') -> 'pd.DataFrame':
         """
-        API that solves differential equations and saves output.
+        Converts mol/L (molar) concentrations to fg/cell (see _fgcell_factor)
+        :param df: Dataframe (or array) of concentrations in molar
+        """
+        return df * self._fgcell_factor()
 
-        :param t:
-        :param init:
-        :param kwargs:
+    def _derived_concentrations(self, y: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Concentrations that are derived from the integrated haem species (e.g. observed Hb). By default, there are
+        none. This class function can be overwritten by the model class. Derived concentrations must be linear in y,
+        so that they can be converted to fg/cell with the same factor as the integrated species.
+
+        :param y: Concentrations of the integrated haem species with shape (n_species, n_times)
+        :return: Dictionary of name -> derived concentrations with shape (n_times,)
+        """
+        return {}
+
+    def _concentrations(self, y: np.ndarray, time) -> Concentrations:
+        """
+        :param y: Solved concentrations (in M) of the integrated haem species with shape (n_species, n_times)
+        :param time: Time points (in hrs)
+        :return: Concentrations in fg/cell, including the derived concentrations
+        """
+        return Concentrations(y=y, species=list(self.initial_values.keys()), time=time, factor=self._fgcell_factor(),
+                              derived=self._derived_concentrations)
+
+    def _deplete_rbc_hb(self, const: Constants, init):
+        """
+        Reset the conc of Hb in RBC based on initial values supplied, i.e. Hb already in the DV at t0 is no longer
+        available for transport from the RBC.
+
+        :param const: Constants used by the model
+        :param init: Initial values for haem concentrations (in M)
         :return:
         """
+        tot_init = 0
+        for v in init:
+            tot_init += v
+        const.conc_hb_rbc = const.conc_hb_rbc - (tot_init * const.vol_dv / const.vol_rbc)
+
+    def _solver_info(self, solution, method, stiffness, t_eval) -> dict:
+        """
+        Summarises the selected solver and the cost of the integration
+
+        :param solution: Solution returned by solve_ivp
+        :param method: Method passed to solve_ivp
+        :param stiffness: Estimated stiffness when the method was selected automatically, otherwise None
+        :param t_eval: Time points requested from solve_ivp (if any)
+        :return: Dictionary of solver info
+        """
+        if t_eval is None:
+            n_steps = len(solution.t) - 1
+        elif solution.sol is not None:
+            n_steps = len(solution.sol.ts) - 1
+        else:
+            n_steps = None  # Accepted steps are only known when all of them are returned (or with dense_output)
+        return {'method': method if isinstance(method, str) else method.__name__,
+                'auto': stiffness is not None,
+                'stiff': None if stiffness is None else bool(stiffness > self.stiffness_threshold),
+                'stiffness': None if stiffness is None else float(stiffness),
+                'n_steps': n_steps,
+                'nfev': int(solution.nfev),
+                'njev': int(solution.njev),
+                'nlu': int(solution.nlu),
+                'status': int(solution.status)}
+
+    def _select_method(self, t, init, params: np.ndarray):
+        """
+        Selects an explicit or implicit solver from the stiffness of the model at t0. The stiffness is estimated as
+        the largest decay rate (most negative real part of the eigenvalues of the Jacobian) multiplied by the span
+        of the integration.
+
+        :param t: Time range that will be integrated over
+        :param init: Initial values for haem concentrations (Order matters!). For ensembles, this has shape
+                     (n_species, n_runs) and the stiffest run decides.
+        :param params: Parameter vector from _pack_params (shape (n_params, n_runs) for ensembles)
+        :return: Tuple of (method, stiffness)
+        """
+        jac = self._jac(t[0], np.asarray(init, dtype=float), params)
+        jac = np.moveaxis(jac.reshape(jac.shape[:2] + (-1,)), -1, 0)  # One matrix per run for ensembles
+        max_decay_rate = max(0.0, -np.linalg.eigvals(jac).real.min())
+        stiffness = max_decay_rate * abs(t[-1] - t[0])
+        method = self.stiff_method if stiffness > self.stiffness_threshold else self.nonstiff_method
+
+        return method, stiffness
+
+    def run(self, t, init: Optional[List[float]] = None, plot: Optional[str] = None,
+            sensitivities: Optional[List[str]] = None, backend: str = 'numpy', profile: bool = False,
+            thresholds: Optional[List[Threshold]] = None, **kwargs) -> ModelResult:
+        """
+        API that solves differential equations and saves output. When self.cache is set (see ResultCache), a run
+        with the same constants, initial values and options as a cached run reuses its solution without integrating.
+
+        A run does not change the model (self.const and self.initial_values are left untouched), so one instance can
+        serve any number of runs, including concurrent runs from several threads. The results are returned and the
+        results of the latest run are also kept in self.concentrations, self.time, self.solution, self.solver_info,
+        self.sensitivities and self.events.
+
+        :param t: Time range (in min) that will be integrated over
+        :param init: [Optional] Initial concentrations of haem species (in M) - order matters. Defaults to 0 M.
+        :param plot: [Optional] Name of file to save plot to. If None, no plot is generated.
+        :param sensitivities: [Optional] Names of constants (see Constants.get_value) for which the forward
+                              sensitivities dY/d(constant) are integrated alongside the concentrations. They are
+                              returned as Concentrations (fg/cell per unit of the constant), one per constant. The
+                              fg/cell conversion is treated as fixed, i.e. any dependence of the conversion itself on
+                              vol_dv is not included.
+        :param backend: 'numpy' (default) or 'numba' to integrate with the compiled right-hand side and Jacobian
+                        (requires the jit extra, see _check_backend). Sensitivities are always integrated with numpy.
+        :param profile: If True, the calls of the right-hand side and Jacobian, the time spent on each reaction and
+                        the steps of the solver are recorded in a SolverProfile (result.profile and self.profile).
+                        Profiled runs use the numpy right-hand side, are not cached and can not be combined with
+                        sensitivities.
+        :param thresholds: [Optional] Concentrations (in fg/cell) of species whose crossings are located during the
+                           integration (see Threshold). They are converted to M and passed to solve_ivp as events
+                           (after any events given in kwargs), and the crossing times (in hrs) are returned in
+                           result.events (and self.events) by the name of each threshold. A terminal threshold stops
+                           the run at its first crossing.
+        :param kwargs: Additional arguments passed to solve_ivp. If method is not given, default_method of the model
+                       is used. With 'auto' (the default) the solver is selected from the stiffness of the model (see
+                       _select_method). The selected method and the cost of the integration are returned in
+                       solver_info. With dense_output=True the continuous solution is kept, so it can be evaluated at
+                       any time points with sample.
+        :return: ModelResult of the run
+        """
+        if init is None:
+            init = [0.0] * len(self.initial_values)
+        if len(init) != len(self.initial_values):
+            raise ValueError(f'{self.model_name} needs {len(self.initial_values)} initial values')
+        if profile and sensitivities:
+            raise ValueError('Runs with sensitivities can not be profiled')
+        backend = self._check_backend(backend)
+
+        thresholds = thresholds or []
+        events = kwargs.pop('events', None)
+        events = [] if events is None else [events] if callable(events) else list(events)
+        n_events = len(events)
+
+        # Look up the result in the cache. Event functions can not be hashed, but thresholds can.
+        key = None
+        if self.cache is not None and not profile and not n_events:
+            key = self.cache.key(self, t=t, init=init, sensitivities=sensitivities, backend=backend,
+                                 thresholds=[vars(threshold) for threshold in thresholds] or None, **kwargs)
+        cached = None if key is None else self.cache.get(key)
+
+        # Thresholds are converted to M and passed to solve_ivp after any other events
+        species = list(self.initial_values.keys())
+        events += [threshold.event(species=species, factor=self._fgcell_factor()) for threshold in thresholds]
+        if events:
+            kwargs['events'] = events
+
+        # Constants of this run. Hb in the DV at t0 is taken from the RBC on a copy, so self.const is left untouched
+        # and every run starts from the same constants.
+        const = self.const
+        if self.deplete_rbc_hb:
+            const = copy.copy(self.const)
+            self._deplete_rbc_hb(const=const, init=init)
+        params = self._pack_params(const=const)
+        if sensitivities:
+            directions, scales = self._param_directions(const=const, names=sensitivities)
+
+        profiler = SolverProfile(network=self.network) if profile else None
+        if cached is not None:
+            solution, solver_info = cached
+        else:
+            # Select the solver
+            method = kwargs.pop('method', self.default_method)
+            stiffness = None
+            if method == 'auto':
+                method, stiffness = self._select_method(t=t, init=init, params=params)
+
+            # Solve the differential equations
+            if sensitivities:
+                solution = self._solve_sensitivities(t, init, params=params, directions=directions, method=method,
+                                                     **kwargs)
+            else:
+                solution = self._solve(t, init, params=params, backend=backend, profile=profiler, method=method,
+                                       **kwargs)
+            solver_info = self._solver_info(solution, method=method, stiffness=stiffness,
+                                            t_eval=kwargs.get('t_eval'))
+            if key is not None and solution.status >= 0:
+                self.cache.put(key, solution=solution, solver_info=solver_info)
+        solver_info['cached'] = cached is not None
+
+        n_species = len(species)
+        time = 16 + solution.t / 60  # In hours, offset by 16 for parasite life-cycle
+        concentrations = self._concentrations(y=solution.y[:n_species], time=time)  # fg/cell, converted when used
+
+        # Sensitivities were integrated per ln(constant), convert back to per unit of the constant
+        sens_dfs = {}
+        for k, name in enumerate(sensitivities or []):
+            sens = solution.y[n_species * (k + 1):n_species * (k + 2)] / scales[k]
+            sens_dfs[name] = self._concentrations(y=sens, time=time)
+
+        # Crossing times of the thresholds
+        events = {threshold.name: 16 + solution.t_events[n_events + k] / 60 for k, threshold in enumerate(thresholds)}
+
+        result = ModelResult(model_name=self.model_name, init=init, time=time, concentrations=concentrations,
+                             solution=solution, solver_info=solver_info, sensitivities=sens_dfs, profile=profiler,
+                             events=events)
+
+        # Keep the results of the latest run on the model
+        self.solution, self.time, self.concentrations = solution, time, concentrations
+        self.solver_info, self.sensitivities, self.profile, self.events = solver_info, sens_dfs, profiler, events
+
+        # Plot graph
+        if plot:
+            self._plot(save_file=plot, title=self.model_name, exp_data=self.exp_data, columns=self.plot_columns,
+                       result=result)
+
+        return result
+
+    def sample(self, times, result: Optional[ModelResult] = None) -> Concentrations:
+        """
+        Evaluates the continuous solution of a run at any time points, e.g. the time points of ExperimentalData and a
+        plotting grid from the same solve. The run must have been made with dense_output=True.
+
+        :param times: Time points (in hrs, i.e. including the 16 hr offset of the parasite life-cycle)
+        :param result: [Optional] ModelResult of the run to sample, defaults to the latest run
+        :return: Concentrations (in fg/cell) at the time points
+        """
+        solution = (self if result is None else result).solution
+        if solution is None or getattr(solution, 'sol', None) is None:
+            raise ValueError('The run has no continuous solution, run the model with dense_output=True')
+
+        times = np.atleast_1d(np.asarray(times, dtype=float))
+        t_min = (times - 16) * 60  # In min from the start of the integration
+        t_start, t_end = sorted([solution.sol.t_min, solution.sol.t_max])
+        if np.any(t_min < t_start - 1e-9) or np.any(t_min > t_end + 1e-9):
+            raise ValueError(f'Time points must lie within the integrated range of {16 + t_start / 60:g} - '
+                             f'{16 + t_end / 60:g} hrs')
+
+        y = solution.sol(t_min)[:len(self.initial_values)]
+        return self._concentrations(y=y, time=times)
+
+    def stream(self, t, sink, t_eval, init: Optional[List[float]] = None, chunk_size: int = 10000, run: int = 0,
+               backend: str = 'numpy', **kwargs) -> dict:
+        """
+        API that solves the differential equations like run, but writes the concentrations to a sink (see Sink) as
+        the solver advances instead of keeping them in memory. The solver is stepped directly and its local
+        interpolant is evaluated at the time points within each step, so only one chunk of at most chunk_size time
+        points (plus the current step) is held at a time, however long or finely sampled the run is.
+
+        :param t: Time range (in min) that will be integrated over
+        :param sink: Sink that the concentrations (in fg/cell, including the derived concentrations) are written to
+        :param t_eval: Time points (in min, increasing) at which the concentrations are written
+        :param init: [Optional] Initial concentrations of haem species (in M) - order matters. Defaults to 0 M.
+        :param chunk_size: Number of time points written to the sink at once
+        :param run: Index of the run in the sink (e.g. to stream several runs to one file)
+        :param backend: 'numpy' (default) or 'numba' (see run)
+        :param kwargs: Additional arguments passed to the solver (e.g. method, rtol, atol, first_step, max_step). If
+                       method is not given, it is selected as in run.
+        :return: Solver info of the run (see run), with the number of time points written in n_points
+        """
+        if init is None:
+            init = [0.0] * len(self.initial_values)
+        if len(init) != len(self.initial_values):
+            raise ValueError(f'{self.model_name} needs {len(self.initial_values)} initial values')
+        backend = self._check_backend(backend)
+        t_eval = np.asarray(t_eval, dtype=float)
+        if np.any(t_eval < t[0]) or np.any(t_eval > t[-1]) or np.any(np.diff(t_eval) < 0):
+            raise ValueError('t_eval must be increasing and lie within t')
+
+        const = self.const
+        if self.deplete_rbc_hb:
+            const = copy.copy(self.const)
+            self._deplete_rbc_hb(const=const, init=init)
+        params = self._pack_params(const=const)
+
+        method = kwargs.pop('method', self.default_method)
+        stiffness = None
+        if method == 'auto':
+            method, stiffness = self._select_method(t=t, init=init, params=params)
+
+        # OdeSolver classes take fun(t, y) and jac(t, y), so the parameters are bound here (see _solve)
+        rhs, jac = self._rhs, self._jac
+        if backend == 'numba':
+            compiled = jit.jit_network(self.network)
+            rhs, jac = compiled.rhs, compiled.jac
+        if method in self.implicit_methods:
+            if 'jac' not in kwargs:
+                kwargs['jac'] = jac
+            elif kwargs['jac'] is None and self.jac_sparsity is not None:
+                kwargs.setdefault('jac_sparsity', self.jac_sparsity)
+        if callable(kwargs.get('jac')):
+            jac_p = kwargs['jac']
+            kwargs['jac'] = lambda t_, y_: jac_p(t_, y_, params)
+        solver_class = getattr(scipy.integrate, method) if isinstance(method, str) else method
+        solver = solver_class(lambda t_, y_: rhs(t_, y_, params), t[0], np.asarray(init, dtype=float), t[-1],
+                              **kwargs)
+
+        def flush(chunk):
+            y = np.hstack(chunk)
+            n = y.shape[1]
+            concentrations = self._concentrations(y=y, time=16 + t_eval[k - n:k] / 60)
+            sink.write(time=concentrations.time, values=concentrations.values, species=concentrations.columns,
+                       run=run)
+
+        # Time points at t0 need no integration
+        k = int(np.searchsorted(t_eval, t[0], side='right'))
+        chunk = [np.repeat(np.asarray(init, dtype=float)[:, np.newaxis], k, axis=1)] if k else []
+        n_chunk, n_steps = k, 0
+        while solver.status == 'running':
+            solver.step()
+            if solver.status == 'failed':
+                break
+            n_steps += 1
+
+            # Time points passed by this step are interpolated and buffered until a chunk is full
+            end = int(np.searchsorted(t_eval, solver.t, side='right'))
+            while k < end:
+                stop = min(end, k + chunk_size - n_chunk)
+                chunk.append(solver.dense_output()(t_eval[k:stop]).reshape(len(init), -1))
+                n_chunk += stop - k
+                k = stop
+                if n_chunk == chunk_size:
+                    flush(chunk)
+                    chunk, n_chunk = [], 0
+        if n_chunk:
+            flush(chunk)
+
+        solution = OptimizeResult(t=t_eval[:k], sol=None, nfev=solver.nfev, njev=solver.njev, nlu=solver.nlu,
+                                  status=0 if solver.status == 'finished' else -1)
+        solver_info = self._solver_info(solution, method=method, stiffness=stiffness, t_eval=t_eval)
+        solver_info.update(n_steps=n_steps, n_points=k)
+        return solver_info
+
+    def run_ensemble(self, t, inits, params=None, param_names: Optional[List[str]] = None, backend: str = 'numpy',
+                     **kwargs) -> np.ndarray:
+        """
+        API that solves the differential equations for many initial values and/or sets of constants at once. The runs
+        are integrated together as one block-diagonal system so that the overhead of the solver is shared by the
+        whole batch instead of being paid for each run.
+
+        :param t: Time range (in min) that will be integrated over
+        :param inits: Initial concentrations of haem species (in M) with shape (n_runs, n_species). A single set of
+                      initial values is used for every run.
+        :param params: [Optional] Values of constants with shape (n_runs, n_params). Run m uses a copy of self.const
+                       with the constants in param_names set to params[m] (see Constants.set_value).
+        :param param_names: Names of the constants in params, e.g. ['fudge', 'K_partition', 'k_enzymes.hap.kcat']
+        :param backend: 'numpy' (default) or 'numba' to integrate every run in compiled code (requires the jit extra,
+                        see _check_backend). The numba backend needs t_eval, accepts rtol, atol and max_steps, and
+                        always uses its own Rosenbrock integrator (method is ignored). Runs that fail are NaN.
+                        With numpy, the runs are integrated together and fail together: every run is NaN if t_eval
+                        is given, otherwise a RuntimeError is raised. solver_info['n_failed'] counts the failed runs.
+        :param kwargs: Additional arguments passed to solve_ivp (see run)
+        :return: Concentrations (in fg/cell) with shape (n_runs, n_species, n_times). The time points (in hrs) are
+                 stored in self.time.
+        """
+        backend = self._check_backend(backend)
+        inits = np.atleast_2d(np.asarray(inits, dtype=float))
+        if params is None:
+            params = np.empty((len(inits), 0))
+            param_names = []
+        params = np.atleast_2d(np.asarray(params, dtype=float))
+        if param_names is None or len(param_names) != params.shape[1]:
+            raise ValueError('param_names must name each column of params')
+        if len(inits) == 1:
+            inits = np.repeat(inits, len(params), axis=0)
+        if len(inits) != len(params):
+            raise ValueError(f'Got {len(inits)} sets of initial values for {len(params)} sets of constants')
+        if inits.shape[1] != len(self.initial_values):
+            raise ValueError(f'{self.model_name} needs {len(self.initial_values)} initial values per run')
+
+        # Pack the constants of each run, one column per run
+        packed = []
+        for init, values in zip(inits, params):
+            const = copy.deepcopy(self.const)
+            for name, value in zip(param_names, values):
+                const.set_value(name, value)
+            if self.deplete_rbc_hb:
+                self._deplete_rbc_hb(const=const, init=init)
+            packed.append(self._pack_params(const=const))
+        packed = np.stack(packed, axis=1)
+
+        if backend == 'numba':
+            if kwargs.get('t_eval') is None:
+                raise ValueError('The numba backend needs t_eval')
+            kwargs.pop('method', None)
+            y, status = self._solve_ensemble_jit(t, inits, params=packed, **kwargs)
+            self.solution = None
+            self.solver_info = {'method': 'Rosenbrock23', 'backend': 'numba', 'n_failed': int(np.sum(status < 0))}
+            self.time = 16 + np.asarray(kwargs['t_eval']) / 60  # In hours, offset by 16 for parasite life-cycle
+            return self._molar_to_fgcell(y)
+
+        # Select the solver
+        method = kwargs.pop('method', self.default_method)
+        stiffness = None
+        if method == 'auto':
+            method, stiffness = self._select_method(t=t, init=inits.T, params=packed)
+
+        # Solve the differential equations
+        solution = self._solve_ensemble(t, inits, params=packed, method=method, **kwargs)
+        solver_info = self._solver_info(solution, method=method, stiffness=stiffness, t_eval=kwargs.get('t_eval'))
+        self.solution, self.solver_info = solution, solver_info
+
+        y = solution.y.reshape(inits.shape + (-1,))
+        time = solution.t
+        solver_info['n_failed'] = 0
+        if solution.status < 0:
+            t_eval = kwargs.get('t_eval')
+            if t_eval is None:
+                raise RuntimeError(f'Integration of the ensemble failed at t = {solution.t[-1]:g} min: '
+                                   f'{solution.message}')
+            # The runs are integrated as one system, so all of them failed (NaN, as with the numba backend)
+            time = np.asarray(t_eval, dtype=float)
+            y = np.full(inits.shape + (len(time),), np.nan)
+            solver_info['n_failed'] = len(inits)
+        self.time = 16 + time / 60  # In hours, offset by 16 for parasite life-cycle
 
-        raise NotImplementedError('"run" must be overwritten by the model class')
+        return self._molar_to_fgcell(y)
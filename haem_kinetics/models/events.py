@@ -0,0 +1,43 @@
+from typing import List, Optional
+
+
+class Threshold:
+    """
+    Concentration of a haem species (in fg/cell) whose crossing is detected during a run, e.g. the toxicity level of
+    free Fe(III)PP or a target amount of Hz. Thresholds are passed to solve_ivp as events (see KineticsModel.run), so
+    the crossing times are located by root finding on the continuous solution instead of on the t_eval grid.
+    """
+    def __init__(self, species: str, value: float, terminal: bool = False, direction: int = 0,
+                 name: Optional[str] = None):
+        """
+        :param species: Name of the integrated species, e.g. 'conc_fe3pp'
+        :param value: Concentration (in fg/cell)
+        :param terminal: If True, the integration stops at the first crossing
+        :param direction: 1 to only detect the concentration rising past the value, -1 for falling and 0 for both
+        :param name: [Optional] Name of the crossing times in the results, defaults to e.g. 'conc_hz 50 fg/cell'
+        """
+        if direction not in (-1, 0, 1):
+            raise ValueError('direction must be -1, 0 or 1')
+        self.species = species
+        self.value = value
+        self.terminal = terminal
+        self.direction = direction
+        self.name = f'{species} {value:g} fg/cell' if name is None else name
+
+    def event(self, species: List[str], factor: float):
+        """
+        :param species: Integrated species of the model - order matters
+        :param factor: Factor that converts M to fg/cell (see KineticsModel._fgcell_factor)
+        :return: Event function event(t, y, p) for solve_ivp
+        """
+        if self.species not in species:
+            raise ValueError(f'Thresholds can only be set on the integrated species {species}, got {self.species}')
+        index = species.index(self.species)
+        value = self.value / factor  # In M
+
+        def event(t, y, p):
+            return y[index] - value
+
+        event.terminal = self.terminal
+        event.direction = self.direction
+        return event
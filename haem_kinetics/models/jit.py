@@ -0,0 +1,184 @@
+import functools
+import multiprocessing
+import sys
+import threading
+import numpy as np
+
+from haem_kinetics.lazy import lazy_import
+
+# Optional dependency, install with pip install haem_kinetics[jit]. Numba takes a few hundred ms to import, so it is
+# only loaded when a network is compiled (see LazyModule).
+numba = lazy_import('numba', optional=True)
+
+NUMBA_AVAILABLE = numba is not None
+
+
+def worker_context():
+    """
+    Multiprocessing context of the worker pools of the package (see Sweep, ModelFit and the CLI). Workers are forked,
+    unless numba has already run a parallel function in this process on a threading layer that does not survive a
+    fork (TBB or GNU OpenMP: the parent hangs on exit or the workers crash). The workers are then started by a fork
+    server. The threading layer itself is left to numba and the user (NUMBA_THREADING_LAYER), so compiling a network
+    does not change how other numba code in the process runs.
+
+    :return: Context to pass to ProcessPoolExecutor, or None for the default
+    """
+    if not NUMBA_AVAILABLE or 'numba' not in sys.modules:
+        return None
+    try:
+        layer = numba.threading_layer()
+    except ValueError:
+        # No parallel function has run yet, the workers start their own thread pools after the fork
+        return None
+    if layer == 'workqueue':
+        return None
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+# Coefficients of the Rosenbrock 2(3) pair of Shampine & Reichelt (MATLAB's ode23s)
+_D = 1 / (2 + np.sqrt(2))
+_E32 = 6 + np.sqrt(2)
+
+
+class JitNetwork:
+    """
+    Numba compiled versions of the functions of a ReactionNetwork. rhs(t, y, p) and jac(t, y, p) are compiled in
+    nopython mode for a single state y of shape (n_species,) and the flat parameter vector from ReactionNetwork.pack,
+    so they can be called from solve_ivp or from other compiled code. integrate runs a whole ensemble in compiled
+    code.
+    """
+    def __init__(self, network):
+        """
+        :param network: ReactionNetwork to compile
+        """
+        if numba is None:
+            raise ImportError('numba is required for the JIT backend (pip install haem_kinetics[jit])')
+
+        # The profiles are compiled first so that rhs and jac can call them in nopython mode
+        namespace = {'np': np}
+        for name, profile in network.profiles.items():
+            namespace[name] = numba.njit(getattr(profile, '__func__', profile))
+        exec(compile(network.generate_source(backend='numba'), f'<jit network {", ".join(network.species)}>', 'exec'),
+             namespace)
+
+        self.network = network
+        self.rhs = numba.njit(namespace['rhs'])
+        self.jac = numba.njit(namespace['jac'])
+        self._integrate = _make_integrator(self.rhs, self.jac)
+        # The workqueue threading layer does not allow parallel regions to be entered from several threads at once
+        self._lock = threading.Lock()
+
+    def integrate(self, t0: float, t_eval: np.ndarray, inits: np.ndarray, params: np.ndarray, rtol: float,
+                  atol: float, max_steps: int):
+        """
+        Integrates an ensemble in compiled code (see _make_integrator)
+
+        :param t0: Start time
+        :param t_eval: Time points (increasing) at which the solution is stored
+        :param inits: Initial values with shape (n_runs, n_species)
+        :param params: Parameter vectors with shape (n_runs, n_params)
+        :param rtol: Relative tolerance
+        :param atol: Absolute tolerance
+        :param max_steps: Maximum number of (accepted and rejected) steps per run
+        :return: Tuple of (y with shape (n_runs, n_species, n_times), status per run)
+        """
+        with self._lock:
+            return self._integrate(t0, t_eval, inits, params, rtol, atol, max_steps)
+
+
+@functools.lru_cache(maxsize=None)
+def jit_network(network) -> JitNetwork:
+    """
+    Compiles a network once per process
+
+    :param network: ReactionNetwork to compile
+    :return: JitNetwork
+    """
+    return JitNetwork(network)
+
+
+def _make_integrator(rhs, jac):
+    """
+    Builds an adaptive Rosenbrock 2(3) integrator for the compiled rhs and jac. Rosenbrock methods are linearly
+    implicit (one LU of I - h * d * J per step and no Newton iterations), which suits the stiff haem models and keeps
+    the whole integration inside compiled code. Runs of an ensemble are integrated independently, in parallel over
+    the available threads.
+
+    :param rhs: Compiled right-hand side
+    :param jac: Compiled Jacobian
+    :return: integrate(t0, t_eval, inits, params, rtol, atol, max_steps) -> (y, status), where inits has shape
+             (n_runs, n_species), params has shape (n_runs, n_params) and y has shape (n_runs, n_species, n_times).
+             A status of 0 means the run reached t_eval[-1], -1 means it failed (too many or too small steps).
+    """
+    @numba.njit
+    def integrate_run(t0, t_eval, y0, p, rtol, atol, max_steps, out):
+        n_times = t_eval.shape[0]
+        eye = np.eye(y0.shape[0])
+        y = y0.copy()
+        t = t0
+
+        # Time points at t0 need no integration
+        k = 0
+        while k < n_times and t_eval[k] <= t0:
+            out[:, k] = y
+            k += 1
+
+        h = 1e-3 * (t_eval[n_times - 1] - t0)
+        n_steps = 0
+        while k < n_times:
+            # The Jacobian and the time derivative of rhs (non-zero for the Hb supply profiles) are refreshed once
+            # per step and reused when a step is rejected
+            f0 = rhs(t, y, p)
+            dt = 1e-8 * max(abs(t), 1.0)
+            f_t = (rhs(t + dt, y, p) - f0) / dt
+            jac_t = jac(t, y, p)
+
+            while True:
+                n_steps += 1
+                if n_steps > max_steps or h < 1e-14 * max(abs(t), 1.0):
+                    return -1
+
+                # Steps are clipped to land on the requested time points
+                h_proposed = h
+                landing = h >= t_eval[k] - t
+                if landing:
+                    h = t_eval[k] - t
+
+                w_inv = np.linalg.inv(eye - h * _D * jac_t)
+                k1 = np.dot(w_inv, f0 + h * _D * f_t)
+                f1 = rhs(t + 0.5 * h, y + 0.5 * h * k1, p)
+                k2 = np.dot(w_inv, f1 - k1) + k1
+                y_new = y + h * k2
+                f2 = rhs(t + h, y_new, p)
+                k3 = np.dot(w_inv, f2 - _E32 * (k2 - f1) - 2 * (k1 - f0) + h * _D * f_t)
+
+                # RMS norm of the local error estimate
+                scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+                error = np.sqrt(np.mean((h / 6 * (k1 - 2 * k2 + k3) / scale) ** 2))
+                factor = 5.0 if error == 0 else min(5.0, max(0.2, 0.8 * error ** (-1 / 3)))
+                if error <= 1:
+                    break
+                h *= factor
+
+            y = y_new
+            if landing:
+                t = t_eval[k]
+                out[:, k] = y
+                k += 1
+                h = max(h * factor, h_proposed)
+            else:
+                t += h
+                h *= factor
+        return 0
+
+    @numba.njit(parallel=True)
+    def integrate(t0, t_eval, inits, params, rtol, atol, max_steps):
+        n_runs, n_species = inits.shape
+        out = np.full((n_runs, n_species, t_eval.shape[0]), np.nan)
+        status = np.zeros(n_runs, dtype=np.int64)
+        for m in numba.prange(n_runs):
+            status[m] = integrate_run(t0, t_eval, inits[m].copy(), params[m].copy(), rtol, atol, max_steps, out[m])
+        return out, status
+
+    return integrate
@@ -0,0 +1,337 @@
+import copy
+import numpy as np
+
+from scipy.integrate import solve_ivp
+from scipy.linalg import expm
+from scipy.sparse import csc_matrix
+from typing import List, Optional
+
+from haem_kinetics.components.result import Concentrations
+from haem_kinetics.models.base import KineticsModel
+from haem_kinetics.models.network import MassAction
+
+
+class LinearChain:
+    """
+    Semi-analytic evaluator for models whose network splits into a nonlinear driver and a linear part that the driver
+    feeds, e.g. Hb transport and degradation (driver) and the Fe(II)PP -> Fe(III)PP -> Hz chain (linear) of Model2 and
+    Model3. The species of the linear part are only consumed by first-order mass action reactions without a profile,
+    so they evolve as dx/dt = A x + s(t) with a constant matrix A and the source s(t) formed by the driver.
+
+    Only the driver is integrated numerically. The source is taken as linear between the points of a grid that refines
+    t_eval, for which the linear part is solved exactly over each step from the eigen-decomposition of A (see
+    _propagators). No step size control is needed however stiff A is, and sweeps of constants that only enter A (e.g.
+    k_hz, K_partition and vol_fract_lip) integrate the driver once. Otherwise the drivers of all runs are integrated
+    together as one block-diagonal system (see _drive), which is smaller than the full system of run_ensemble.
+    """
+    def __init__(self, model: KineticsModel, linear: Optional[List[str]] = None):
+        """
+        :param model: Model, which must define a network
+        :param linear: [Optional] Species of the linear part. By default, all species that can be solved as part of
+                       the linear part are.
+        """
+        if model.network is None:
+            raise ValueError(f'{model.model_name} does not define a network')
+        self.model = model
+        self.network = model.network
+        self.linear = self._linear_species() if linear is None else list(linear)
+        invalid = set(self.linear) - set(self._linear_species())
+        if invalid:
+            raise ValueError(f'{sorted(invalid)} can not be solved as part of the linear part of {model.model_name}')
+        self.driver = [sp for sp in self.network.species if sp not in self.linear]
+
+        species = self.network.species
+        self._l = np.array([species.index(sp) for sp in self.linear], dtype=int)
+        self._n = np.array([species.index(sp) for sp in self.driver], dtype=int)
+
+        # Parameters of the reactions that do not depend on the linear part, i.e. those that determine the source
+        self._driver_params, start = [], 0
+        for reaction in self.network.reactions:
+            if not set(reaction.depends_on) & set(self.linear):
+                self._driver_params += range(start, start + reaction.n_params)
+            start += reaction.n_params
+
+        # Time points (in hrs) of the latest evaluation
+        self.time = []
+
+    def _linear_species(self) -> List[str]:
+        """
+        :return: Largest set of species that are only consumed by first-order mass action reactions without a
+                 profile, and that do not form any species outside of the set (so that the driver does not depend on
+                 them)
+        """
+        linear = set(self.network.species)
+        for reaction in self.network.reactions:
+            if not (isinstance(reaction, MassAction) and len(reaction.reactants) == 1 and reaction.profile is None):
+                linear -= set(reaction.depends_on)
+        changed = True
+        while changed:
+            changed = False
+            for reaction in self.network.reactions:
+                if set(reaction.depends_on) & linear and not set(reaction.products) <= linear:
+                    linear -= set(reaction.depends_on)
+                    changed = True
+        return [sp for sp in self.network.species if sp in linear]
+
+    @staticmethod
+    def _grid(points: np.ndarray, substeps: int) -> np.ndarray:
+        """
+        :param points: Start of the integration followed by the time points (in min), increasing
+        :param substeps: Number of equal steps between consecutive points
+        :return: Grid of the points and the steps between them
+        """
+        steps = np.linspace(0, 1, substeps + 1)[:-1]
+        grid = points[:-1, np.newaxis] + np.diff(points)[:, np.newaxis] * steps
+        return np.append(grid.ravel(), points[-1])
+
+    def _drive(self, grid: np.ndarray, inits: np.ndarray, params: np.ndarray, **kwargs):
+        """
+        Integrates the driver of several runs and evaluates the source of the linear part on the grid. The runs are
+        integrated together as one block-diagonal system, like KineticsModel.run_ensemble: the driver of run m
+        occupies y[m * n_driver:(m + 1) * n_driver], and the implicit solvers are given the driver block of the
+        Jacobian of the network, in banded form for LSODA and as a sparse matrix for BDF and Radau. The driver is
+        usually stiff itself (e.g. Hb degradation with a large fudge factor), so it is solved with the default method
+        of the model, or its stiff method if the model selects its solver automatically.
+
+        :param grid: Time points (in min)
+        :param inits: Initial values of all species (in M) with shape (n_runs, n_species)
+        :param params: Parameter vectors of the network with shape (n_params, n_runs)
+        :param kwargs: Additional arguments passed to solve_ivp (e.g. method, rtol)
+        :return: Tuple of (driver species with shape (n_runs, n_driver, n_grid), source with shape
+                 (n_runs, n_linear, n_grid))
+        """
+        n_species, n_runs, n_driver = len(self.network.species), len(inits), len(self._n)
+        driver = np.empty((n_driver, n_runs, len(grid)))
+        if n_driver:
+            def rhs(t, y_n, p):
+                y = np.zeros((n_species, n_runs))
+                y[self._n] = y_n.reshape(n_runs, n_driver).T
+                return self.network.rhs(t, y, p)[self._n].T.ravel()
+
+            def lanes(t, y_n, p):
+                y = np.zeros((n_species, n_runs))
+                y[self._n] = y_n.reshape(n_runs, n_driver).T
+                return self.network.jac(t, y, p)[np.ix_(self._n, self._n)]
+
+            default = self.model.default_method
+            method = kwargs.setdefault('method', self.model.stiff_method if default == 'auto' else default)
+            rows, cols = np.nonzero(self.network.sparsity[np.ix_(self._n, self._n)])
+            band = n_driver - 1
+            if 'jac' not in kwargs and method == 'LSODA':
+                def jac(t, y_n, p):
+                    # Packed banded storage: jac_packed[band + i - j, j] = jac[i, j]
+                    values = lanes(t, y_n, p)
+                    packed = np.zeros((2 * band + 1, n_runs * n_driver))
+                    for i, j in zip(rows, cols):
+                        packed[band + i - j, j::n_driver] = values[i, j]
+                    return packed
+
+                kwargs.update(jac=jac, lband=band, uband=band)
+            elif 'jac' not in kwargs and method in self.model.implicit_methods:
+                offsets = n_driver * np.arange(n_runs)[:, np.newaxis]
+                block_rows, block_cols = (offsets + rows).ravel(), (offsets + cols).ravel()
+
+                def jac(t, y_n, p):
+                    return csc_matrix((lanes(t, y_n, p)[rows, cols].T.ravel(), (block_rows, block_cols)),
+                                      shape=(n_runs * n_driver, n_runs * n_driver))
+
+                kwargs['jac'] = jac
+
+            solution = solve_ivp(rhs, (grid[0], grid[-1]), inits[:, self._n].ravel(), args=(params,),
+                                 dense_output=True, **kwargs)
+            if solution.status < 0:
+                raise RuntimeError(f'Integration of the driver failed: {solution.message}')
+            driver = np.moveaxis(solution.sol(grid).reshape(n_runs, n_driver, len(grid)), 0, 1)
+
+        # With the linear part at 0, the rhs of the linear species is the rate at which they are formed by the driver.
+        # Profiles are only evaluated at single times, so the rhs is vectorised over the runs.
+        y = np.zeros((n_species, n_runs))
+        source = np.empty((len(self._l), n_runs, len(grid)))
+        for k, t in enumerate(grid):
+            y[self._n] = driver[:, :, k]
+            source[:, :, k] = self.network.rhs(t, y, params)[self._l]
+        return np.moveaxis(driver, 1, 0), np.moveaxis(source, 1, 0)
+
+    @staticmethod
+    def _propagators(a: np.ndarray, vectors: np.ndarray, values: np.ndarray, h: float):
+        """
+        Propagators of a step h: Phi = exp(A h), G0 = int_0^h exp(A s) ds and G1 = int_0^h exp(A s) (h - s) / h ds, so
+        that x(t + h) = Phi x(t) + G0 s(t) + G1 (s(t + h) - s(t)) for a source that is linear over the step. With the
+        eigen-decomposition A = V L V^-1, they are V f(L h) V^-1 with f(z) = exp(z), h (exp(z) - 1) / z and
+        h (exp(z) - 1 - z) / z^2, which is evaluated for every run at once. Runs whose A is (nearly) defective, e.g.
+        when two rate constants coincide, use the matrix exponential of the Van Loan block matrix
+        [[A h, I h, 0], [0, 0, I], [0, 0, 0]] instead.
+
+        :param a: Matrix A of each run with shape (n_runs, n_linear, n_linear)
+        :param vectors: Eigenvectors V of each A
+        :param values: Eigenvalues L of each A
+        :param h: Step (in min)
+        :return: Tuple of (Phi, G0, G1), each with the shape of a
+        """
+        z = values * h
+        small = np.abs(z) < 1e-4
+        z_safe = np.where(small, 1.0, z)
+        f0 = np.exp(z)
+        f1 = h * np.where(small, 1 + z / 2 + z ** 2 / 6, np.expm1(z_safe) / z_safe)
+        f2 = h * np.where(small, 1 / 2 + z / 6 + z ** 2 / 24, (np.expm1(z_safe) - z_safe) / z_safe ** 2)
+
+        m = a.shape[-1]
+        defective = np.linalg.cond(vectors) > 1e8
+        inverse = np.linalg.inv(np.where(defective[:, np.newaxis, np.newaxis], np.eye(m), vectors))
+        phi, g0, g1 = [((vectors * f[:, np.newaxis, :]) @ inverse).real for f in (f0, f1, f2)]
+
+        if np.any(defective):
+            block = np.zeros((np.sum(defective), 3 * m, 3 * m))
+            block[:, :m, :m] = a[defective] * h
+            block[:, :m, m:2 * m] = np.eye(m) * h
+            block[:, m:2 * m, 2 * m:] = np.eye(m)
+            exp_block = expm(block)
+            phi[defective], g0[defective], g1[defective] = (exp_block[:, :m, :m], exp_block[:, :m, m:2 * m],
+                                                            exp_block[:, :m, 2 * m:])
+        return phi, g0, g1
+
+    def _propagate(self, points: np.ndarray, substeps: int, a: np.ndarray, x0: np.ndarray, source: np.ndarray,
+                   group: np.ndarray) -> np.ndarray:
+        """
+        Solves the linear part of several runs, with the source linear between the points of the grid (see _grid)
+
+        :param points: Start of the integration followed by the time points (in min)
+        :param substeps: Number of steps of the grid between consecutive points
+        :param a: Matrix A of each run with shape (n_runs, n_linear, n_linear)
+        :param x0: Initial values of the linear species with shape (n_runs, n_linear)
+        :param source: Distinct sources on the grid with shape (n_sources, n_linear, n_grid)
+        :param group: Index of the source of each run
+        :return: Linear species at the points with shape (n_runs, n_linear, n_points)
+        """
+        n_runs, m = x0.shape
+        n_intervals = len(points) - 1
+        s0 = source[:, :, :-1].reshape(len(source), m, n_intervals, substeps)
+        s1 = source[:, :, 1:].reshape(len(source), m, n_intervals, substeps)
+        steps, step_index = np.unique(np.round(np.diff(points) / substeps, 9), return_inverse=True)
+
+        # Propagators of each step size (see _propagators). Over the steps j of an interval between points, the source
+        # adds sum_j Phi^(n - 1 - j) (G0 s0_j + G1 (s1_j - s0_j)). The coefficients of s0_j and s1_j are small matrices
+        # per run, so the source term of all intervals is one matrix product per run, leaving only the propagation of
+        # x to loop over.
+        values, vectors = np.linalg.eig(a)
+        phis = []
+        forced = np.empty((n_runs, m, n_intervals))
+        for u, h in enumerate(steps):
+            phi, g0, g1 = self._propagators(a, vectors, values, h)
+
+            k = np.flatnonzero(step_index == u)
+            powers = [np.broadcast_to(np.eye(m), phi.shape)]
+            for _ in range(substeps):
+                powers.append(powers[-1] @ phi)
+            powers = np.stack(powers[substeps - 1::-1], axis=1)  # Phi^(n - 1 - j) of each run and step j
+            coeffs = np.concatenate([powers @ (g0 - g1)[:, np.newaxis], powers @ g1[:, np.newaxis]], axis=1)
+            sources = np.concatenate([s0[:, :, k], s1[:, :, k]], axis=-1)
+            forced[:, :, k] = np.einsum('rjab,rbkj->rak', coeffs, sources[group], optimize=True)
+            phis.append(powers[:, 0] @ phi)
+
+        x = np.empty((n_intervals + 1, n_runs, m, 1))
+        x[0] = x0[:, :, np.newaxis]
+        forced = np.moveaxis(forced, -1, 0)[..., np.newaxis]
+        for k, u in enumerate(step_index):
+            x[k + 1] = phis[u] @ x[k] + forced[k]
+        return np.moveaxis(x[..., 0], 0, -1)
+
+    def _solve(self, t, t_eval, inits: np.ndarray, params: np.ndarray, substeps: int, **kwargs) -> np.ndarray:
+        """
+        :param t: Time range (in min) that will be integrated over
+        :param t_eval: Time points (in min)
+        :param inits: Initial values (in M) with shape (n_runs, n_species)
+        :param params: Parameter vectors with shape (n_params, n_runs)
+        :param substeps: Number of steps between consecutive time points
+        :param kwargs: Additional arguments passed to solve_ivp for the driver
+        :return: Concentrations (in M) with shape (n_runs, n_species, n_times)
+        """
+        t_eval = np.asarray(t_eval, dtype=float)
+        if np.any(np.diff(t_eval) <= 0) or t_eval[0] < t[0] or t_eval[-1] > t[-1]:
+            raise ValueError('t_eval must be increasing and within t')
+        points = np.unique(np.concatenate([[float(t[0])], t_eval]))
+        grid = self._grid(points, substeps)
+        index = np.searchsorted(points, t_eval)
+
+        # The driver is integrated once for each distinct set of initial values and parameters that it depends on
+        n_runs = len(inits)
+        keys = [tuple(inits[r, self._n]) + tuple(params[self._driver_params, r]) for r in range(n_runs)]
+        first = {}  # First run of each distinct key
+        for r, key in enumerate(keys):
+            first.setdefault(key, r)
+        distinct = {key: g for g, key in enumerate(first)}
+        group = np.array([distinct[key] for key in keys], dtype=int)
+        first = list(first.values())
+        driver, source = self._drive(grid, inits[first], params[:, first], **kwargs)
+
+        # A is constant, so the Jacobian at 0 gives it for every run at once
+        jac = self.network.jac(grid[0], np.zeros((len(self.network.species), n_runs)), params)
+        a = np.moveaxis(jac[np.ix_(self._l, self._l)], -1, 0)
+        x = self._propagate(points, substeps, a, inits[:, self._l], source, group)
+
+        y = np.empty((n_runs, len(self.network.species), len(t_eval)))
+        y[:, self._n] = driver[group][:, :, index * substeps]
+        y[:, self._l] = x[:, :, index]
+        return y
+
+    def run(self, t, t_eval, init: Optional[List[float]] = None, substeps: int = 4, **kwargs) -> Concentrations:
+        """
+        Evaluates the model at the time points, like KineticsModel.run with t_eval
+
+        :param t: Time range (in min) that will be integrated over
+        :param t_eval: Time points (in min)
+        :param init: [Optional] Initial concentrations of haem species (in M) - order matters. Defaults to 0 M.
+        :param substeps: Number of steps of the grid between consecutive time points. The error of the linear part
+                         decreases with the square of the step size.
+        :param kwargs: Additional arguments passed to solve_ivp for the driver (e.g. rtol)
+        :return: Concentrations (in fg/cell) at the time points
+        """
+        if init is None:
+            init = [0.0] * len(self.network.species)
+        const = self.model.const
+        if self.model.deplete_rbc_hb:
+            const = copy.copy(self.model.const)
+            self.model._deplete_rbc_hb(const=const, init=init)
+        params = self.model._pack_params(const=const)
+
+        y = self._solve(t, t_eval, np.asarray([init], dtype=float), params[:, np.newaxis], substeps, **kwargs)
+        self.time = 16 + np.asarray(t_eval, dtype=float) / 60  # In hours, offset by 16 for parasite life-cycle
+        return self.model._concentrations(y=y[0], time=self.time)
+
+    def sweep(self, t, t_eval, inits, params, param_names: List[str], substeps: int = 4, **kwargs) -> np.ndarray:
+        """
+        Evaluates many sets of initial values and/or constants, like KineticsModel.run_ensemble
+
+        :param t: Time range (in min) that will be integrated over
+        :param t_eval: Time points (in min)
+        :param inits: Initial concentrations of haem species (in M) with shape (n_runs, n_species). A single set of
+                      initial values is used for every run.
+        :param params: Values of constants with shape (n_runs, n_params). Run m uses a copy of the constants of the
+                       model with the constants in param_names set to params[m] (see Constants.set_value).
+        :param param_names: Names of the constants in params, e.g. ['k_hz', 'K_partition', 'vol_fract_lip']
+        :param substeps: Number of steps of the grid between consecutive time points (see run)
+        :param kwargs: Additional arguments passed to solve_ivp for the driver (e.g. rtol)
+        :return: Concentrations (in fg/cell) with shape (n_runs, n_species, n_times). The time points (in hrs) are
+                 stored in self.time.
+        """
+        inits = np.atleast_2d(np.asarray(inits, dtype=float))
+        params = np.atleast_2d(np.asarray(params, dtype=float))
+        if len(param_names) != params.shape[1]:
+            raise ValueError('param_names must name each column of params')
+        if len(inits) == 1:
+            inits = np.repeat(inits, len(params), axis=0)
+        if len(inits) != len(params):
+            raise ValueError(f'Got {len(inits)} sets of initial values for {len(params)} sets of constants')
+
+        packed = []
+        for init, values in zip(inits, params):
+            const = copy.deepcopy(self.model.const)
+            for name, value in zip(param_names, values):
+                const.set_value(name, value)
+            if self.model.deplete_rbc_hb:
+                self.model._deplete_rbc_hb(const=const, init=init)
+            packed.append(self.model._pack_params(const=const))
+
+        y = self._solve(t, t_eval, inits, np.stack(packed, axis=1), substeps, **kwargs)
+        self.time = 16 + np.asarray(t_eval, dtype=float) / 60  # In hours, offset by 16 for parasite life-cycle
+        return self.model._molar_to_fgcell(y)
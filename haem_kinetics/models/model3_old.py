@@ -1,10 +1,7 @@
 import math
-import pandas as pd
-
-from scipy.integrate import solve_ivp
-from typing import List, Optional
 
 from haem_kinetics.models.base import KineticsModel
+from haem_kinetics.models.network import Forcing, MassAction, ReactionNetwork
 from haem_kinetics.components.experimental_data import ExperimentalData
 
 
@@ -17,6 +14,9 @@ class Model3(KineticsModel):
     levels as measured by Combrink et al. Consequently, an alteration to the model was necessary which is
     described in Model 2.
     """
+    # Solved with BDF unless another method is given
+    default_method = 'BDF'
+
     def __init__(self, model_name: str = 'Model 3'):
         super().__init__(model_name=model_name)
 
@@ -28,34 +28,27 @@ class Model3(KineticsModel):
         # self.exp_data.no_drug_nf54()
         self.exp_data.no_drug_dd2()
 
-    def _d_hb_dv_dirkie(self, t):
+    @staticmethod
+    def _hb_formation_dirkie(t):
 
         # Formation
         # form = self.const.k_hb_trans * self.const.conc_hb_rbc
         a = 13.1
         b = 8.3e-4
-        form = a * b * (math.e ** (b * t)) / 55.845
-
-        # Removal
-        remove = self.const.k_hb_deg * self.initial_values['conc_hb_dv'] / 4
+        return a * b * (math.e ** (b * t)) / 55.845
 
-        return form - remove
-
-    def _d_hb_dv_kuter(self, t):
+    @staticmethod
+    def _hb_formation_kuter(t):
         """
         abe^(bt)
         :return:
         """
         a = 0.1213
         b = 0.001036
-        form = a * b * (math.e ** (b * t))
-
-        # Removal
-        remove = self.const.k_hb_deg * self.initial_values['conc_hb_dv'] / 4
+        return a * b * (math.e ** (b * t))
 
-        return form - remove
-
-    def _d_hb_dv_sigmoid(self, t):
+    @staticmethod
+    def _hb_formation_sigmoid(t):
         """
 
         :return:
@@ -66,101 +59,30 @@ class Model3(KineticsModel):
         k = 7.121
         h = 2.493
         denom = (1 + (math.e ** (h * (k - ln_t))))**2
-        form = h * (top - bot) * (math.e ** (h * (k - ln_t))) / denom
-
-        # Removal
-        remove = self.const.k_hb_deg * self.initial_values['conc_hb_dv'] / 4
-
-        return form - remove
-
-    def _d_fe2pp(self):
-
-        # Formation
-        form = (self.const.k_hb_deg * self.initial_values['conc_hb_dv'] / 4) + \
-               (self.const.k_fe3pp_red * self.const.compute_lipid_seq_constant() * self.initial_values['conc_fe3pp'])
-
-        # Removal
-        remove = self.const.k_fe2pp_ox * self.initial_values['conc_fe2pp']
-
-        return form - remove
-
-    def _d_fe3pp(self):
-
-        # Formation
-        form = self.const.k_fe2pp_ox * self.initial_values['conc_fe2pp']
-
-        # Removal
-        remove = (self.const.k_fe3pp_red * self.const.compute_lipid_seq_constant()
-                  * self.initial_values['conc_fe3pp']) + \
-                 (self.const.k_hz * self.const.compute_lipid_seq_constant() * self.initial_values['conc_fe3pp'])
-
-        return form - remove
-
-    def _d_hz(self):
-
-        # Formation
-        return self.const.k_hz * self.const.compute_lipid_seq_constant() * self.initial_values['conc_fe3pp']
-
-    def _set_initial_conc(self, init: List[float]):
-        """
-        Sets the initial concentrations of haem species to be integrated
-
-        :param init: List of concentrations (in M) - order matters
-        :return:
-        """
-
-        if len(init) != 4:
-            raise ValueError(f'The number of initial values needed for this model')
-
-        self.initial_values['conc_hb_dv'] = init[0]  # Concentration of Haemoglobin in the digestive vacuole
-        self.initial_values['conc_fe2pp'] = init[1]  # Concentration of Free Fe(II) haem
-        self.initial_values['conc_fe3pp'] = init[2]  # Concentration of Free Fe(III) haem
-        self.initial_values['conc_hz'] = init[3]     # Concentration of haemozoin
-
-    def _integrate(self, t, init):
-        """
-        Function that will integrate differential equations for the model. The differential equations must be set
-        by within the model but adding them to the self.differential_eqs list.
-
-        :param t: Time range that will be integrated over
-        :param init: Initial values for haem concentrations (Order matters!)
-        :return: returns concentrations for each haem species in the model at each time point. E.g.:
-                   t0      t1      t2     t3     t4
-                 [
-                  [0.    0.001    0.01   0.02   0.03]     # Haem species 1
-                  [0.    0.       0.001  0.002  0.003]    # Haem species 2
-                 ]
-        """
-        # Set initial concentration values
-        self._set_initial_conc(init=init)
-
-        # return [self._d_hb_dv_dirkie(t), self._d_fe2pp(), self._d_fe3pp(), self._d_hz()]
-        return [self._d_hb_dv_kuter(t), self._d_fe2pp(), self._d_fe3pp(), self._d_hz()]
-        # return [self._d_hb_dv_sigmoid(t), self._d_fe2pp(), self._d_fe3pp(), self._d_hz()]
-
-
-    def run(self, t, init: Optional[List[float]] = None, plot: Optional[str] = None, **kwargs):
+        return h * (top - bot) * (math.e ** (h * (k - ln_t))) / denom
+
+    # Species (order matters) and reactions
+    network = ReactionNetwork(
+        species=['conc_hb_dv',   # Concentration of Haemoglobin in the digestive vacuole
+                 'conc_fe2pp',   # Concentration of Free Fe(II) haem
+                 'conc_fe3pp',   # Concentration of Free Fe(III) haem
+                 'conc_hz'],     # Concentration of haemozoin
+        reactions=[
+            # Transport of Hb into the DV (alternatives: _hb_formation_dirkie, _hb_formation_sigmoid)
+            Forcing(rate=1.0, products=['conc_hb_dv'], profile=_hb_formation_kuter),
+            # First order Hb degradation, per haem
+            MassAction(k=lambda c: c.k_hb_deg / 4, reactants=['conc_hb_dv'], products=['conc_fe2pp']),
+            # Fe(II)PP oxidation
+            MassAction(k='k_fe2pp_ox', reactants=['conc_fe2pp'], products=['conc_fe3pp']),
+            # Fe(III)PP reduction and haemozoin formation, both slowed by lipid sequestration
+            MassAction(k=lambda c: c.k_fe3pp_red * c.compute_lipid_seq_constant(), reactants=['conc_fe3pp'],
+                       products=['conc_fe2pp']),
+            MassAction(k=lambda c: c.k_hz * c.compute_lipid_seq_constant(), reactants=['conc_fe3pp'],
+                       products=['conc_hz']),
+        ])
+
+    def _fgcell_factor(self) -> float:
         """
-
-        :param t:
-        :param init:
-        :param plot: [Optional] Name of file to save plot to. If None, no plot is generated.
-        :param kwargs:
-        :return:
+        Factor that converts mol/L (molar) concentrations to fg/cell
         """
-        if init is None:
-            init = [0.0, 0.0, 0.0, 0.0]
-
-        if kwargs is False:
-            kwargs = {}
-
-        # Solve the differential equations
-        self.solution = solve_ivp(self._integrate, t, init, method='BDF', **kwargs)
-        self.time = 16 + self.solution.t / 60  # In hours, offset by 16 for parasite life-cycle
-        self.concentrations = pd.DataFrame(self.solution.y, columns=self.time, index=list(self.initial_values.keys())).T
-        self.concentrations = self.concentrations * 1000 * 0.2232  # convert to fg/cell
-
-        # Plot graph
-        if plot:
-            self._plot(save_file=plot, title=self.model_name, exp_data=self.exp_data,
-                       columns=['conc_hb_dv', 'conc_hz', 'conc_fe3pp'])
+        return 1000 * 0.2232
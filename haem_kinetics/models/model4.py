@@ -1,10 +1,7 @@
 import math
-import pandas as pd
-
-from scipy.integrate import solve_ivp
-from typing import List, Optional
 
 from haem_kinetics.models.base import KineticsModel
+from haem_kinetics.models.network import Forcing, MassAction, MichaelisMenten, ReactionNetwork
 from haem_kinetics.components.experimental_data import ExperimentalData
 
 
@@ -17,6 +14,9 @@ class Model4(KineticsModel):
     levels as measured by Combrink et al. Consequently, an alteration to the model was necessary which is
     described in Model 2.
     """
+    # Solved with BDF unless another method is given
+    default_method = 'BDF'
+
     def __init__(self, model_name: str = 'Model 4'):
         super().__init__(model_name=model_name)
 
@@ -28,65 +28,27 @@ class Model4(KineticsModel):
         # self.exp_data.no_drug_nf54()
         self.exp_data.no_drug_dd2()
 
-    def _calc_enzyme_rate(self, enzyme, conc_hb_dv):
-        kcat = self.const.k_enzymes[enzyme]['kcat'] * 60  # Converts s-1 to min-1
-        Km = self.const.k_enzymes[enzyme]['Km']
-        conc_enzyme = self.const.conc_enzymes[enzyme] / self.const.fudge
-        denom = Km + conc_hb_dv
-
-        if denom == 0:
-            return 0
-        else:
-            return kcat * conc_enzyme / denom
-
-    def _hb_removal(self):
-        """
-        Haemoglobin degradation by enzymes
-        :return:
-        """
-        conc_hb_dv = self.initial_values['conc_hb_dv'] / 4
-        # plm_1_deg = self._calc_enzyme_rate(enzyme='plm_1',
-        #                                    conc_hb_dv=conc_hb_dv)
-        # plm_2_deg = self._calc_enzyme_rate(enzyme='plm_2',
-        #                                    conc_hb_dv=conc_hb_dv)
-        hap_deg = self._calc_enzyme_rate(enzyme='hap',
-                                         conc_hb_dv=conc_hb_dv)
-        # plm_4_deg = self._calc_enzyme_rate(enzyme='plm_4',
-        #                                    conc_hb_dv=conc_hb_dv)
-        conc_hb_dv = self.initial_values['conc_hb_dv']
-        # return (plm_1_deg + plm_2_deg + hap_deg + plm_4_deg) * conc_hb_dv
-        # return (plm_1_deg + plm_2_deg) * conc_hb_dv
-        return hap_deg * conc_hb_dv
-
-    def _d_hb_dv_dirkie(self, t):
+    @staticmethod
+    def _hb_formation_dirkie(t):
 
         # Formation
         # form = self.const.k_hb_trans * self.const.conc_hb_rbc
         a = 13.1
         b = 8.3e-4
-        form = a * b * (math.e ** (b * t)) / 55.845
-
-        # Removal
+        return a * b * (math.e ** (b * t)) / 55.845
 
-        remove = self._hb_removal()
-
-        return form - remove
-
-    def _d_hb_dv_kuter(self, t):
+    @staticmethod
+    def _hb_formation_kuter(t):
         """
         abe^(bt)
         :return:
         """
         a = 0.298 / 4
         b = 0.001102
-        form = a * b * (math.e ** (b * t))
-
-        # Removal
-        remove = self._hb_removal()
+        return a * b * (math.e ** (b * t))
 
-        return form - remove
-
-    def _d_hb_dv_sigmoid(self, t):
+    @staticmethod
+    def _hb_formation_sigmoid(t):
         """
 
         :return:
@@ -97,100 +59,30 @@ class Model4(KineticsModel):
         k = 7.121
         h = 2.493
         denom = (1 + (math.e ** (h * (k - ln_t))))**2
-        form = h * (top - bot) * (math.e ** (h * (k - ln_t))) / denom
-
-        # Removal
-        remove = self._hb_removal()
-
-        return form - remove
-
-    def _d_fe2pp(self):
-
-        # Formation
-        form = (self._hb_removal()) + \
-               (self.const.k_fe3pp_red * self.const.compute_lipid_seq_constant() * self.initial_values['conc_fe3pp'])
-
-        # Removal
-        remove = self.const.k_fe2pp_ox * self.initial_values['conc_fe2pp']
-
-        return form - remove
-
-    def _d_fe3pp(self):
-
-        # Formation
-        form = self.const.k_fe2pp_ox * self.initial_values['conc_fe2pp']
-
-        # Removal
-        remove = (self.const.k_fe3pp_red * self.const.compute_lipid_seq_constant()
-                  * self.initial_values['conc_fe3pp']) + \
-                 (self.const.k_hz * self.const.compute_lipid_seq_constant() * self.initial_values['conc_fe3pp'])
-
-        return form - remove
-
-    def _d_hz(self):
-
-        # Formation
-        return self.const.k_hz * self.const.compute_lipid_seq_constant() * self.initial_values['conc_fe3pp']
-
-    def _set_initial_conc(self, init: List[float]):
+        return h * (top - bot) * (math.e ** (h * (k - ln_t))) / denom
+
+    # Species (order matters) and reactions
+    network = ReactionNetwork(
+        species=['conc_hb_dv',   # Concentration of Haemoglobin in the digestive vacuole
+                 'conc_fe2pp',   # Concentration of Free Fe(II) haem
+                 'conc_fe3pp',   # Concentration of Free Fe(III) haem
+                 'conc_hz'],     # Concentration of haemozoin
+        reactions=[
+            # Transport of Hb into the DV (alternatives: _hb_formation_dirkie, _hb_formation_sigmoid)
+            Forcing(rate=1.0, products=['conc_hb_dv'], profile=_hb_formation_kuter),
+            # Hb degradation by HAP, lowered by the fudge factor
+            MichaelisMenten(substrate='conc_hb_dv', products=['conc_fe2pp'], enzymes=['hap'],
+                            scale=lambda c: 1 / c.fudge, subunits=4),
+            # Fe(II)PP oxidation
+            MassAction(k='k_fe2pp_ox', reactants=['conc_fe2pp'], products=['conc_fe3pp']),
+            # Fe(III)PP reduction and haemozoin formation, both slowed by lipid sequestration
+            MassAction(k=lambda c: c.k_fe3pp_red * c.compute_lipid_seq_constant(), reactants=['conc_fe3pp'],
+                       products=['conc_fe2pp']),
+            MassAction(k='derived.k_hz_eff', reactants=['conc_fe3pp'], products=['conc_hz']),
+        ])
+
+    def _fgcell_factor(self) -> float:
         """
-        Sets the initial concentrations of haem species to be integrated
-
-        :param init: List of concentrations (in M) - order matters
-        :return:
-        """
-
-        if len(init) != 4:
-            raise ValueError(f'The number of initial values needed for this model')
-
-        self.initial_values['conc_hb_dv'] = init[0]  # Concentration of Haemoglobin in the digestive vacuole
-        self.initial_values['conc_fe2pp'] = init[1]  # Concentration of Free Fe(II) haem
-        self.initial_values['conc_fe3pp'] = init[2]  # Concentration of Free Fe(III) haem
-        self.initial_values['conc_hz'] = init[3]     # Concentration of haemozoin
-
-    def _integrate(self, t, init):
+        Factor that converts mol/L (molar) concentrations to fg/cell
         """
-        Function that will integrate differential equations for the model. The differential equations must be set
-        by within the model but adding them to the self.differential_eqs list.
-
-        :param t: Time range that will be integrated over
-        :param init: Initial values for haem concentrations (Order matters!)
-        :return: returns concentrations for each haem species in the model at each time point. E.g.:
-                   t0      t1      t2     t3     t4
-                 [
-                  [0.    0.001    0.01   0.02   0.03]     # Haem species 1
-                  [0.    0.       0.001  0.002  0.003]    # Haem species 2
-                 ]
-        """
-        # Set initial concentration values
-        self._set_initial_conc(init=init)
-
-        # return [self._d_hb_dv_dirkie(t), self._d_fe2pp(), self._d_fe3pp(), self._d_hz()]
-        return [self._d_hb_dv_kuter(t), self._d_fe2pp(), self._d_fe3pp(), self._d_hz()]
-        # return [self._d_hb_dv_sigmoid(t), self._d_fe2pp(), self._d_fe3pp(), self._d_hz()]
-
-    def run(self, t, init: Optional[List[float]] = None, plot: Optional[str] = None, **kwargs):
-        """
-
-        :param t:
-        :param init:
-        :param plot: [Optional] Name of file to save plot to. If None, no plot is generated.
-        :param kwargs:
-        :return:
-        """
-        if init is None:
-            init = [0.0, 0.0, 0.0, 0.0]
-
-        if kwargs is False:
-            kwargs = {}
-
-        # Solve the differential equations
-        self.solution = solve_ivp(self._integrate, t, init, method='BDF', **kwargs)
-        self.time = 16 + self.solution.t / 60  # In hours, offset by 16 for parasite life-cycle
-        self.concentrations = pd.DataFrame(self.solution.y, columns=self.time, index=list(self.initial_values.keys())).T
-        self.concentrations = self.concentrations * 1000 * 0.2232  # convert to fg/cell
-
-        # Plot graph
-        if plot:
-            self._plot(save_file=plot, title=self.model_name, exp_data=self.exp_data,
-                       columns=['conc_hb_dv', 'conc_hz', 'conc_fe3pp'])
+        return 1000 * 0.2232
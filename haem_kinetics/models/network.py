@@ -0,0 +1,430 @@
+import numpy as np
+
+from typing import Callable, List, Optional, Union
+
+from haem_kinetics.components.constants import Constants
+
+# A parameter is bound to the constants by name (see Constants.get_value), by a function of the constants or is fixed
+Binding = Union[str, float, Callable[[Constants], float]]
+
+
+def _bind(binding: Binding, const: Constants) -> float:
+    """
+    :param binding: Name of a constant, function of the constants or fixed value
+    :param const: Constants used by the model
+    :return: Value of the parameter
+    """
+    if isinstance(binding, str):
+        return const.get_value(binding)
+    if callable(binding):
+        return binding(const)
+    return binding
+
+
+class Reaction:
+    """
+    A reaction that consumes its reactants and forms its products (one of each per reaction) at a rate given by its
+    rate law. The rate can be modulated by a time-dependent profile, e.g. the growth of the parasite.
+
+    Rate laws are written as Python expressions of the concentrations and parameters so that ReactionNetwork can
+    compile all reactions of a model into a single function.
+    """
+    # Number of parameters returned by pack
+    n_params = 1
+
+    def __init__(self, reactants: List[str], products: List[str], profile: Optional[Callable] = None,
+                 name: Optional[str] = None):
+        """
+        :param reactants: Species consumed by the reaction
+        :param products: Species formed by the reaction
+        :param profile: [Optional] Function of time (min) that multiplies the rate
+        :param name: [Optional] Name of the reaction
+        """
+        self.reactants = list(reactants)
+        self.products = list(products)
+        # Profiles defined in a class body (e.g. of a model) are staticmethod objects, which can not be called before
+        # Python 3.10
+        self.profile = getattr(profile, '__func__', profile)
+        self.name = name if name else f"{' + '.join(reactants) or '0'} -> {' + '.join(products) or '0'}"
+
+    @property
+    def depends_on(self) -> List[str]:
+        """
+        Species the rate depends on (in the order of the derivatives returned by deriv_exprs)
+        """
+        return []
+
+    def pack(self, const: Constants) -> List[float]:
+        """
+        :param const: Constants used by the model
+        :return: Parameters of the rate law
+        """
+        raise NotImplementedError('pack must be overwritten by the reaction class')
+
+    def rate_expr(self, y: List[str], p: List[str]) -> str:
+        """
+        Rate law without the profile
+
+        :param y: Expressions of the concentrations of the species in depends_on (in M)
+        :param p: Expressions of the parameters from pack
+        :return: Expression of the rate (M.min-1)
+        """
+        raise NotImplementedError('rate_expr must be overwritten by the reaction class')
+
+    def deriv_exprs(self, y: List[str], p: List[str]) -> List[str]:
+        """
+        Derivatives of the rate law (without the profile) with respect to each species in depends_on
+
+        :param y: Expressions of the concentrations of the species in depends_on (in M)
+        :param p: Expressions of the parameters from pack
+        :return: Expression of each derivative (min-1)
+        """
+        raise NotImplementedError('deriv_exprs must be overwritten by the reaction class')
+
+
+class Forcing(Reaction):
+    """
+    Zero-order formation of the products at a fixed rate, e.g. transport of Hb into the DV
+    """
+    def __init__(self, rate: Binding, products: List[str], profile: Optional[Callable] = None,
+                 name: Optional[str] = None):
+        """
+        :param rate: Rate of formation (M.min-1), or its amplitude when a profile is given
+        :param products: Species formed
+        :param profile: [Optional] Function of time (min) that multiplies the rate
+        :param name: [Optional] Name of the reaction
+        """
+        super().__init__(reactants=[], products=products, profile=profile, name=name)
+        self.rate = rate
+
+    def pack(self, const: Constants) -> List[float]:
+        return [_bind(self.rate, const)]
+
+    def rate_expr(self, y: List[str], p: List[str]) -> str:
+        return p[0]
+
+    def deriv_exprs(self, y: List[str], p: List[str]) -> List[str]:
+        return []
+
+
+class MassAction(Reaction):
+    """
+    Reaction with a rate of k * [reactant 1] * [reactant 2] * ...
+    """
+    def __init__(self, k: Binding, reactants: List[str], products: List[str], profile: Optional[Callable] = None,
+                 name: Optional[str] = None):
+        """
+        :param k: Rate constant
+        :param reactants: Species consumed by the reaction
+        :param products: Species formed by the reaction
+        :param profile: [Optional] Function of time (min) that multiplies the rate
+        :param name: [Optional] Name of the reaction
+        """
+        super().__init__(reactants=reactants, products=products, profile=profile, name=name)
+        self.k = k
+
+    @property
+    def depends_on(self) -> List[str]:
+        return self.reactants
+
+    def pack(self, const: Constants) -> List[float]:
+        return [_bind(self.k, const)]
+
+    def rate_expr(self, y: List[str], p: List[str]) -> str:
+        return ' * '.join([p[0]] + y)
+
+    def deriv_exprs(self, y: List[str], p: List[str]) -> List[str]:
+        return [' * '.join([p[0]] + y[:j] + y[j + 1:]) for j in range(len(y))]
+
+
+class MichaelisMenten(Reaction):
+    """
+    Degradation of a substrate by several enzymes, each following Michaelis-Menten kinetics. For Hb, the substrate
+    is tracked as haem and the rates are computed per Hb molecule (subunits=4), i.e.
+    rate = 4 * sum(vmax * [Hb] / (Km + [Hb])) with [Hb] = [haem in Hb] / 4.
+
+    A Km of 0 is floored at the smallest positive float. This keeps the rate at 0 when both Km and the substrate are
+    0 (as the original zero denominator check did) without branching in the right-hand side.
+    """
+    def __init__(self, substrate: str, products: List[str], enzymes: List[str], scale: Binding = 1.0,
+                 subunits: int = 1, consume_substrate: bool = True, profile: Optional[Callable] = None,
+                 name: Optional[str] = None):
+        """
+        :param substrate: Species degraded by the enzymes
+        :param products: Species formed
+        :param enzymes: Names of the enzymes in Constants.k_enzymes and Constants.conc_enzymes
+        :param scale: Factor applied to the enzyme concentrations (e.g. the fudge factor)
+        :param subunits: Number of units of the species released per substrate molecule
+        :param consume_substrate: Whether the substrate is removed (False when the degraded substrate is still
+                                  counted in the substrate species)
+        :param profile: [Optional] Function of time (min) that multiplies the rate, e.g. enzyme expression
+        :param name: [Optional] Name of the reaction
+        """
+        super().__init__(reactants=[substrate] if consume_substrate else [], products=products, profile=profile,
+                         name=name)
+        self.substrate = substrate
+        self.enzymes = list(enzymes)
+        self.scale = scale
+        self.subunits = subunits
+
+    @property
+    def depends_on(self) -> List[str]:
+        return [self.substrate]
+
+    @property
+    def n_params(self) -> int:
+        return 2 * len(self.enzymes)
+
+    def pack(self, const: Constants) -> List[float]:
+        """
+        :param const: Constants used by the model
+        :return: vmax = kcat (min-1) * [enzyme] * scale of each enzyme, followed by Km * subunits of each enzyme
+        """
+        scale = _bind(self.scale, const)
+        derived = const.derived
+        vmax = [derived['vmax'][e] * scale for e in self.enzymes]
+        km = [max(derived['km'][e], np.finfo(float).tiny) * self.subunits for e in self.enzymes]
+        return vmax + km
+
+    # With Km in units of the species (Km * subunits), vmax * [S] / (Km + [S]) with [S] = [species] / subunits
+    # becomes vmax * [species] / (Km * subunits + [species])
+    def rate_expr(self, y: List[str], p: List[str]) -> str:
+        n = len(self.enzymes)
+        terms = [f'{p[i]} * {y[0]} / ({p[n + i]} + {y[0]})' for i in range(n)]
+        return f"{self.subunits} * ({' + '.join(terms)})"
+
+    def deriv_exprs(self, y: List[str], p: List[str]) -> List[str]:
+        n = len(self.enzymes)
+        terms = [f'{p[i]} * {p[n + i]} / ({p[n + i]} + {y[0]}) ** 2' for i in range(n)]
+        return [f"{self.subunits} * ({' + '.join(terms)})"]
+
+
+class Rerouted(Reaction):
+    """
+    A reaction that formed a fast species which is eliminated by the quasi-steady-state approximation (see
+    ReactionNetwork.reduce). The fast species is consumed as soon as it is formed, so the reaction forms the products
+    of one of the reactions that consume it instead, at the fraction of the flux that goes through that reaction.
+    """
+    def __init__(self, reaction: Reaction, fast: str, consumer: 'MassAction', consumers: List['MassAction']):
+        """
+        :param reaction: Reaction that forms the fast species
+        :param fast: Fast species
+        :param consumer: First-order reaction that consumes the fast species, whose products are formed instead
+        :param consumers: All reactions that consume the fast species
+        """
+        products = []
+        for sp in reaction.products:
+            products += consumer.products if sp == fast else [sp]
+        super().__init__(reactants=reaction.reactants, products=products, profile=reaction.profile,
+                         name=f'{reaction.name} (via {consumer.name})')
+        self.reaction = reaction
+        self.consumer = consumer
+        self.consumers = list(consumers)
+
+    @property
+    def depends_on(self) -> List[str]:
+        return self.reaction.depends_on
+
+    @property
+    def n_params(self) -> int:
+        return self.reaction.n_params + 1
+
+    def pack(self, const: Constants) -> List[float]:
+        """
+        :param const: Constants used by the model
+        :return: Parameters of the reaction, followed by the fraction of the fast species consumed by the consumer
+        """
+        k = _bind(self.consumer.k, const)
+        return self.reaction.pack(const) + [k / sum(_bind(c.k, const) for c in self.consumers)]
+
+    def rate_expr(self, y: List[str], p: List[str]) -> str:
+        return f'{p[-1]} * ({self.reaction.rate_expr(y, p[:-1])})'
+
+    def deriv_exprs(self, y: List[str], p: List[str]) -> List[str]:
+        return [f'{p[-1]} * ({deriv})' for deriv in self.reaction.deriv_exprs(y, p[:-1])]
+
+
+class ReactionNetwork:
+    """
+    Declarative definition of a kinetics model: its species, the reactions between them and how the parameters of
+    each rate law are bound to Constants.
+
+    The network is compiled once into a flat parameter vector (pack), the source of a vectorised right-hand side
+    (rhs) and of its analytic Jacobian (jac), and the sparsity pattern of the Jacobian. KineticsModel uses these for
+    the model class that defines the network. The generated functions have no loops over reactions or dictionary
+    lookups, so they are as fast as writing the equations out by hand.
+    """
+    def __init__(self, species: List[str], reactions: List[Reaction]):
+        """
+        :param species: Names of the integrated species - order matters
+        :param reactions: Reactions between the species
+        """
+        self.species = list(species)
+        self.reactions = list(reactions)
+        # Species eliminated by reduce -> reactions that consume them
+        self.quasi_steady = {}
+        self.sparsity = np.zeros((len(species), len(species)), dtype=int)
+
+        index = {sp: i for i, sp in enumerate(self.species)}
+        self.profiles = {}
+        self._rate_lines, self._rhs_terms, self._jac_terms = [], {}, {}
+        start = 0
+        for k, reaction in enumerate(self.reactions):
+            unknown = set(reaction.reactants + reaction.products + reaction.depends_on) - set(index)
+            if unknown:
+                raise ValueError(f'Reaction {reaction.name} uses species {sorted(unknown)} not in the network')
+
+            # Net stoichiometry of each species
+            stoich = {}
+            for sp in reaction.reactants:
+                stoich[index[sp]] = stoich.get(index[sp], 0) - 1
+            for sp in reaction.products:
+                stoich[index[sp]] = stoich.get(index[sp], 0) + 1
+            stoich = {i: coeff for i, coeff in stoich.items() if coeff != 0}
+
+            y = [f'y{index[sp]}' for sp in reaction.depends_on]
+            p = [f'p{i}' for i in range(start, start + reaction.n_params)]
+            start += reaction.n_params
+
+            # Time-dependent profiles are evaluated once per call
+            factor = ''
+            rate_lines = []
+            if reaction.profile is not None:
+                self.profiles[f'profile_{k}'] = reaction.profile
+                rate_lines.append(f'    g{k} = profile_{k}(t)')
+                factor = f'g{k} * '
+
+            rate_lines.append(f'    r{k} = {factor}({reaction.rate_expr(y, p)})  # {reaction.name}')
+            self._rate_lines.append(rate_lines)
+            for i, coeff in stoich.items():
+                self._rhs_terms.setdefault(i, []).append(self._term(coeff, f'r{k}'))
+            for j, deriv in zip(reaction.depends_on, reaction.deriv_exprs(y, p)):
+                for i, coeff in stoich.items():
+                    self._jac_terms.setdefault((i, index[j]), []).append(self._term(coeff, f'{factor}({deriv})'))
+                    self.sparsity[i, index[j]] = 1
+        self.n_params = start
+
+        self.source = self.generate_source()
+        namespace = dict(self.profiles, np=np)
+        exec(compile(self.source, f'<network {", ".join(self.species)}>', 'exec'), namespace)
+        self.rhs = namespace['rhs']
+        self.jac = namespace['jac']
+
+    def generate_source(self, backend: str = 'numpy', timed: bool = False) -> str:
+        """
+        Source of the functions rhs(t, y, p) and jac(t, y, p). The profiles are referred to by their names in
+        self.profiles.
+
+        :param backend: 'numpy' for functions that accept single states (unpacked to Python scalars) and vectorised
+                        calls, or 'numba' for functions of single states that can be compiled in nopython mode
+        :param timed: If True, rhs adds the time spent on the rate of reaction k to term_time[k], using perf_counter
+                      (both must be provided in the namespace the source is executed in)
+        :return: Source code
+        """
+        n_species = len(self.species)
+        y_names = ', '.join(f'y{i}' for i in range(n_species))
+        p_names = ', '.join(f'p{i}' for i in range(self.n_params))
+        if backend == 'numpy':
+            # Single states are unpacked to Python scalars, which are much faster to compute with than numpy
+            # scalars, and vectorised calls to the rows of y and p
+            unpack = [f'    {y_names}, = y.tolist() if y.ndim == 1 else y']
+            if self.n_params:
+                unpack.append(f'    {p_names}, = p.tolist() if p.ndim == 1 else p')
+            jac_shape = f'({n_species}, {n_species}) + np.shape(y)[1:]'
+        elif backend == 'numba':
+            unpack = [f"    {y_names}, = {', '.join(f'y[{i}]' for i in range(n_species))},"]
+            if self.n_params:
+                unpack.append(f"    {p_names}, = {', '.join(f'p[{i}]' for i in range(self.n_params))},")
+            jac_shape = f'({n_species}, {n_species})'
+        else:
+            raise ValueError(f'Unknown backend {backend}')
+
+        # Right-hand side
+        lines = ['def rhs(t, y, p):'] + unpack
+        for k, rate_lines in enumerate(self._rate_lines):
+            if timed:
+                lines += ['    start = perf_counter()'] + rate_lines + [f'    term_time[{k}] += perf_counter() - start']
+            else:
+                lines += rate_lines
+        lines.append('    dy = np.empty_like(y)')
+        for i in range(n_species):
+            lines.append(f'    dy[{i}] = {self._sum(self._rhs_terms.get(i, []))}')
+        lines.append('    return dy')
+
+        # Jacobian. Only the profiles are needed from the rates.
+        lines.append('')
+        lines.append('def jac(t, y, p):')
+        lines += unpack + [line for rate_lines in self._rate_lines for line in rate_lines if line.startswith('    g')]
+        lines.append(f'    jac = np.zeros({jac_shape})')
+        for (i, j), terms in sorted(self._jac_terms.items()):
+            lines.append(f'    jac[{i}, {j}] = {self._sum(terms)}')
+        lines.append('    return jac')
+
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _term(coeff: int, expr: str) -> str:
+        if coeff == 1:
+            return f'+ {expr}'
+        if coeff == -1:
+            return f'- {expr}'
+        return f'{"+" if coeff > 0 else "-"} {abs(coeff)} * {expr}'
+
+    @staticmethod
+    def _sum(terms: List[str]) -> str:
+        if not terms:
+            return '0'
+        expr = ' '.join(terms)
+        return expr[2:] if expr.startswith('+ ') else expr
+
+    def pack(self, const: Constants) -> np.ndarray:
+        """
+        Packs the parameters of every reaction into a flat vector, in the order of the reactions
+
+        :param const: Constants used by the model
+        :return: Parameter vector
+        """
+        return np.array([value for reaction in self.reactions for value in reaction.pack(const)], dtype=float)
+
+    def reduce(self, fast: List[str]) -> 'ReactionNetwork':
+        """
+        Network without the fast species, by the quasi-steady-state approximation (QSSA). A fast species that is
+        consumed much faster than it is formed stays at the concentration where its formation and consumption
+        balance, i.e. [fast] = (rate of formation) / k with k the sum of the rate constants of its consumers. Each
+        reaction that forms the fast species then forms the products of the consumers directly (see Rerouted), and
+        reactions that no longer change any species (e.g. a cycle through the fast species) are dropped. The fastest
+        mode of the network is removed, so the reduced network is usually not stiff.
+
+        The fast species must only be consumed by first-order mass action reactions without a profile, and the
+        remaining reactions must not depend on it. Species are eliminated in the order given.
+
+        :param fast: Names of the fast species
+        :return: Reduced network. Its quasi_steady attribute maps each fast species to the reactions that consume it.
+        """
+        reactions = list(self.reactions)
+        quasi_steady = dict(self.quasi_steady)
+        for sp in fast:
+            if sp not in self.species:
+                raise ValueError(f'{sp} is not a species of the network')
+            consumers = [r for r in reactions if sp in r.reactants]
+            if not consumers or any(not isinstance(r, MassAction) or r.reactants != [sp] or r.profile is not None
+                                    for r in consumers):
+                raise ValueError(f'{sp} must be consumed by first-order mass action reactions without a profile to '
+                                 f'be eliminated')
+            if any(sp in r.depends_on for r in reactions if r not in consumers):
+                raise ValueError(f'{sp} can not be eliminated, the rate of another reaction depends on it')
+
+            reduced = []
+            for reaction in reactions:
+                if reaction in consumers:
+                    continue
+                if sp in reaction.products:
+                    reduced += [Rerouted(reaction, fast=sp, consumer=c, consumers=consumers) for c in consumers]
+                else:
+                    reduced.append(reaction)
+            reactions = [r for r in reduced if sorted(r.reactants) != sorted(r.products)]
+            quasi_steady[sp] = consumers
+
+        network = ReactionNetwork(species=[sp for sp in self.species if sp not in fast], reactions=reactions)
+        network.quasi_steady = quasi_steady
+        return network
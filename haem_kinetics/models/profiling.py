@@ -0,0 +1,148 @@
+import time
+import numpy as np
+import scipy.integrate
+
+from scipy.integrate import OdeSolver
+
+from haem_kinetics.lazy import lazy_import
+
+# Only loaded when the profile is read (see LazyModule)
+pd = lazy_import('pandas')
+
+
+class SolverProfile:
+    """
+    Instrumentation of a single integration, enabled with run(profile=True). The right-hand side and Jacobian are
+    wrapped to count and time their calls, and every step of the solver is recorded:
+
+    - summary: number of calls and time spent in rhs and jac, and the number of steps
+    - terms: time spent on each reaction of the network (from a timed version of the generated rhs)
+    - steps: accepted steps (t at the end of the step and its size h), the largest rejected trial step before each
+      accepted step (h_rejected, NaN if the first trial was accepted), the rhs calls made for the step (n_rhs) and
+      whether the Jacobian was refreshed during the step (jac)
+    - jac_times: times at which the Jacobian was evaluated
+
+    All times are in min. Timing each term adds a small overhead to every rhs call, so the split between terms is
+    more meaningful than the absolute times.
+    """
+    def __init__(self, network=None):
+        """
+        :param network: [Optional] ReactionNetwork of the model. If None, the time spent in rhs is not split by term.
+        """
+        self.network = network
+        self.rhs_calls = []     # Time of each rhs call
+        self.jac_calls = []     # Time of each jac call
+        self.rhs_time = 0.0     # Wall time (s) spent in rhs
+        self.jac_time = 0.0     # Wall time (s) spent in jac
+        self.solver_time = 0.0  # Wall time (s) of the whole integration
+        self._steps = []
+        self._term_time = np.zeros(0 if network is None else len(network.reactions))
+
+    def wrap_rhs(self, rhs):
+        """
+        :param rhs: Right-hand side rhs(t, y, p) of the model. Replaced by the timed rhs of the network, if any.
+        :return: Instrumented right-hand side
+        """
+        if self.network is not None:
+            namespace = dict(self.network.profiles, np=np, perf_counter=time.perf_counter, term_time=self._term_time)
+            exec(compile(self.network.generate_source(timed=True), '<timed network>', 'exec'), namespace)
+            rhs = namespace['rhs']
+
+        def profiled_rhs(t, y, p):
+            self.rhs_calls.append(t)
+            start = time.perf_counter()
+            dy = rhs(t, y, p)
+            self.rhs_time += time.perf_counter() - start
+            return dy
+
+        return profiled_rhs
+
+    def wrap_jac(self, jac):
+        """
+        :param jac: Jacobian jac(t, y, p) of the model
+        :return: Instrumented Jacobian
+        """
+        def profiled_jac(t, y, p):
+            self.jac_calls.append(t)
+            start = time.perf_counter()
+            jac_t = jac(t, y, p)
+            self.jac_time += time.perf_counter() - start
+            return jac_t
+
+        return profiled_jac
+
+    def wrap_method(self, method):
+        """
+        Subclasses the solver to record each step. Every scipy solver evaluates rhs at the end of a trial step, so
+        rhs calls past the end of the accepted step belong to rejected trials.
+
+        :param method: Name of a solve_ivp method (e.g. 'LSODA') or an OdeSolver class
+        :return: Instrumented OdeSolver class
+        """
+        solver_class = getattr(scipy.integrate, method) if isinstance(method, str) else method
+        if not (isinstance(solver_class, type) and issubclass(solver_class, OdeSolver)):
+            raise ValueError(f'Unknown method {method}')
+        profile = self
+
+        class ProfiledSolver(solver_class):
+            def _step_impl(self):
+                t_old, first_rhs, first_jac = self.t, len(profile.rhs_calls), len(profile.jac_calls)
+                success, message = super()._step_impl()
+                if success:
+                    calls = np.array(profile.rhs_calls[first_rhs:])
+                    rejected = calls[self.direction * (calls - self.t) > 0]
+                    profile._steps.append((self.t, self.t - t_old,
+                                           np.max(np.abs(rejected - t_old)) if len(rejected) else np.nan,
+                                           len(calls), len(profile.jac_calls) > first_jac))
+                return success, message
+
+        ProfiledSolver.__name__ = ProfiledSolver.__qualname__ = solver_class.__name__
+        return ProfiledSolver
+
+    @property
+    def steps(self) -> 'pd.DataFrame':
+        return pd.DataFrame(self._steps, columns=['t', 'h', 'h_rejected', 'n_rhs', 'jac'])
+
+    @property
+    def jac_times(self) -> np.ndarray:
+        return np.array(self.jac_calls)
+
+    @property
+    def terms(self) -> 'pd.DataFrame':
+        if self.network is None:
+            return pd.DataFrame(columns=['time', 'fraction'])
+        total = self._term_time.sum()
+        return pd.DataFrame({'time': self._term_time, 'fraction': self._term_time / total if total else 0.0},
+                            index=[reaction.name for reaction in self.network.reactions])
+
+    @property
+    def summary(self) -> dict:
+        steps = self.steps
+        return {'rhs_calls': len(self.rhs_calls),
+                'rhs_time': self.rhs_time,
+                'jac_calls': len(self.jac_calls),
+                'jac_time': self.jac_time,
+                'solver_time': self.solver_time,
+                'n_accepted': len(steps),
+                'n_rejected': int(steps['h_rejected'].notna().sum()),
+                'min_step': float(steps['h'].abs().min()) if len(steps) else None,
+                'max_step': float(steps['h'].abs().max()) if len(steps) else None}
+
+    def report(self) -> str:
+        """
+        :return: Human readable summary of the profile
+        """
+        summary = self.summary
+        lines = [f'Integration: {summary["solver_time"] * 1e3:.1f} ms, {summary["n_accepted"]} accepted steps '
+                 f'({summary["n_rejected"]} with rejected trials)',
+                 f'rhs: {summary["rhs_calls"]} calls, {summary["rhs_time"] * 1e3:.1f} ms',
+                 f'jac: {summary["jac_calls"]} calls, {summary["jac_time"] * 1e3:.1f} ms']
+        if summary['n_accepted']:
+            lines.append(f'Step size: {summary["min_step"]:.3g} - {summary["max_step"]:.3g} min')
+        terms = self.terms
+        if len(terms):
+            lines.append('Time per term:')
+            width = max(len(name) for name in terms.index)
+            for name, row in terms.iterrows():
+                lines.append(f'  {name:<{width}}  {row["time"] * 1e3:8.2f} ms  {row["fraction"]:6.1%}')
+        return '\n'.join(lines)
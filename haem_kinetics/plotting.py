@@ -0,0 +1,256 @@
+import threading
+import matplotlib
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from typing import List, Optional, Sequence
+
+from haem_kinetics.models import jit
+
+# Figures are drawn with the Agg canvas directly instead of through pyplot, so no global figure state is kept (or
+# leaked) and the interactive backend of the session is never touched. Fonts are set per figure with rc_context.
+FONT_SIZE = 16
+_RC = {'font.size': FONT_SIZE, 'axes.labelsize': FONT_SIZE, 'xtick.labelsize': FONT_SIZE,
+       'ytick.labelsize': FONT_SIZE}
+
+# One RunPlotter per thread (see run_plotter), Agg figures must not be drawn from several threads at once
+_local = threading.local()
+
+
+class RunPlotter:
+    """
+    Figure of a single run (as saved by KineticsModel.run with plot=...) that is built once and reused: the left
+    panel shows the haem species and the right panel Hz, each with the experimental data if given. Plotting another
+    run only replaces the data of the existing lines, so saving one figure per run of a batch neither rebuilds the
+    figure nor accumulates open figures.
+    """
+    def __init__(self, figsize=(20, 10), dpi: int = 100):
+        """
+        :param figsize: Size of the figure (in inches)
+        :param dpi: Resolution of the saved figure
+        """
+        with matplotlib.rc_context(_RC):
+            self.figure = Figure(figsize=figsize, dpi=dpi)
+            FigureCanvasAgg(self.figure)
+            self.axes = self.figure.subplots(1, 2)
+            self.title = self.figure.suptitle('', fontsize=FONT_SIZE + 8)
+            for ax in self.axes:
+                ax.set_xlabel('Time (hrs)')
+                ax.set_ylabel('Fe (fg/cell)')
+        self._lines = {}  # Column -> Line2D
+        self._exp_data = None
+        self._exp_artists = []
+
+    def _line(self, column: str):
+        if column not in self._lines:
+            if column == 'conc_hz':
+                self._lines[column], = self.axes[1].plot([], [], 'r', label=column)
+            else:
+                self._lines[column], = self.axes[0].plot([], [], label=column)
+        return self._lines[column]
+
+    def _set_exp_data(self, exp_data):
+        # Experimental data does not change between the runs of a batch, so it is only redrawn for other data
+        if exp_data is self._exp_data:
+            return
+        for artist in self._exp_artists:
+            artist.remove()
+        self._exp_artists = []
+        self._exp_data = exp_data
+        if exp_data is None:
+            return
+
+        data = exp_data.data
+        self._exp_artists = [
+            self.axes[1].errorbar(data.index, data['Hz'], yerr=data['Hz:SEM'].values, label='Exp Hz', fmt='o',
+                                  mfc='white', ecolor='r', color='r'),
+            self.axes[0].errorbar(data.index, data['Hm'], yerr=data['Hm:SEM'].values, label='Exp Haem', fmt='o',
+                                  mfc='white', ecolor='orange', color='orange'),
+            self.axes[0].errorbar(data.index, data['Hb'], yerr=data['Hb:SEM'].values, label='Exp Hb', fmt='o',
+                                  mfc='white', ecolor='b', color='b')]
+
+    def draw(self, time, values: np.ndarray, columns: List[str], title: str = '', exp_data=None):
+        """
+        :param time: Time points (in hrs)
+        :param values: Concentrations (in fg/cell) with shape (n_times, n_columns)
+        :param columns: Names of the columns of values
+        :param title: Title of the figure
+        :param exp_data: [Optional] ExperimentalData shown with the run
+        :return:
+        """
+        time = np.asarray(time)
+        values = np.asarray(values)
+
+        # Lines of columns that are not in this run are removed, the others only get new data
+        for column in set(self._lines) - set(columns):
+            self._lines.pop(column).remove()
+        for k, column in enumerate(columns):
+            self._line(column).set_data(time, values[:, k])
+        self._set_exp_data(exp_data)
+
+        self.title.set_text(title)
+        x_ticks = range(int(time[-1]), int(time[0]), -5)
+        with matplotlib.rc_context(_RC):
+            for ax in self.axes:
+                ax.set_xticks(x_ticks)
+                ax.relim()
+                ax.autoscale_view()
+                ax.legend(loc='upper left')
+
+    def save(self, save_file: str):
+        """
+        :param save_file: Name of file to save the figure to
+        :return:
+        """
+        with matplotlib.rc_context(_RC):
+            self.figure.savefig(save_file)
+
+
+def run_plotter() -> RunPlotter:
+    """
+    :return: RunPlotter of the current thread, created on first use and reused by every later plot of the thread
+    """
+    if getattr(_local, 'plotter', None) is None:
+        _local.plotter = RunPlotter()
+    return _local.plotter
+
+
+def plot_run(save_file: str, time, values: np.ndarray, columns: List[str], title: str = '', exp_data=None):
+    """
+    Saves the figure of a run with the RunPlotter of the current thread
+
+    :param save_file: Name of file to save the figure to
+    :param time: Time points (in hrs)
+    :param values: Concentrations (in fg/cell) with shape (n_times, n_columns)
+    :param columns: Names of the columns of values
+    :param title: Title of the figure
+    :param exp_data: [Optional] ExperimentalData shown with the run
+    :return:
+    """
+    plotter = run_plotter()
+    plotter.draw(time, values, columns, title=title, exp_data=exp_data)
+    plotter.save(save_file)
+
+
+def _plot_runs(tasks: list, exp_data):
+    # Renders a batch of runs in a worker process, reusing the RunPlotter of the process
+    for save_file, time, values, columns, title in tasks:
+        plot_run(save_file, time, values, columns, title=title, exp_data=exp_data)
+    return len(tasks)
+
+
+def plot_runs(save_files: Sequence[str], time, concentrations: np.ndarray, columns: List[str],
+              titles: Optional[Sequence[str]] = None, exp_data=None, n_workers: Optional[int] = None,
+              batch_size: int = 16) -> int:
+    """
+    Saves one figure per run of an ensemble (e.g. from run_ensemble, Sweep.collect or ResultStore.array), rendered on
+    a pool of worker processes. Each worker reuses one figure for all of its runs.
+
+    :param save_files: Name of the file of each run
+    :param time: Time points (in hrs) shared by the runs
+    :param concentrations: Concentrations (in fg/cell) with shape (n_runs, n_columns, n_times)
+    :param columns: Names of the columns of concentrations
+    :param titles: [Optional] Title of each figure
+    :param exp_data: [Optional] ExperimentalData shown with every run
+    :param n_workers: [Optional] Number of worker processes. Defaults to the number of CPUs.
+    :param batch_size: Number of figures rendered by each task
+    :return: Number of figures saved
+    """
+    if len(save_files) != len(concentrations):
+        raise ValueError(f'Got {len(save_files)} files for {len(concentrations)} runs')
+    titles = [''] * len(save_files) if titles is None else list(titles)
+    time = np.asarray(time)
+
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=jit.worker_context()) as executor:
+        futures = []
+        for start in range(0, len(save_files), batch_size):
+            tasks = [(save_files[m], time, np.asarray(concentrations[m]).T, list(columns), titles[m])
+                     for m in range(start, min(start + batch_size, len(save_files)))]
+            futures.append(executor.submit(_plot_runs, tasks, exp_data))
+        return sum(future.result() for future in futures)
+
+
+def plot_small_multiples(save_file: str, time, concentrations: np.ndarray, columns: List[str],
+                         titles: Optional[Sequence[str]] = None, n_cols: int = 6, panel_size=(3, 2.5),
+                         dpi: int = 100):
+    """
+    Saves a grid with one small panel per run of an ensemble. The panels share their axes, so runs can be compared at
+    a glance.
+
+    :param save_file: Name of file to save the figure to
+    :param time: Time points (in hrs) shared by the runs
+    :param concentrations: Concentrations (in fg/cell) with shape (n_runs, n_columns, n_times)
+    :param columns: Names of the columns of concentrations, one line per column in every panel
+    :param titles: [Optional] Title of each panel, e.g. the constants of the run
+    :param n_cols: Number of panels per row
+    :param panel_size: Size of each panel (in inches)
+    :param dpi: Resolution of the saved figure
+    :return:
+    """
+    n_runs = len(concentrations)
+    n_cols = min(n_cols, n_runs)
+    n_rows = -(-n_runs // n_cols)
+    with matplotlib.rc_context({'font.size': 8}):
+        figure = Figure(figsize=(panel_size[0] * n_cols, panel_size[1] * n_rows), dpi=dpi, layout='constrained')
+        FigureCanvasAgg(figure)
+        axes = figure.subplots(n_rows, n_cols, sharex=True, sharey=True, squeeze=False).ravel()
+        for m, ax in enumerate(axes):
+            if m >= n_runs:
+                ax.set_visible(False)
+                continue
+            lines = ax.plot(time, np.asarray(concentrations[m]).T)
+            if titles is not None:
+                ax.set_title(titles[m])
+        figure.legend(lines, columns, loc='outside upper center', ncols=len(columns))
+        figure.supxlabel('Time (hrs)')
+        figure.supylabel('Fe (fg/cell)')
+        figure.savefig(save_file)
+
+
+def plot_ensemble(save_file: str, time, concentrations: np.ndarray, columns: List[str],
+                  percentiles=(5, 95), exp_data=None, figsize=(20, 10), dpi: int = 100):
+    """
+    Saves a summary of a whole ensemble with one panel per column: every run drawn as one thin line (a single
+    LineCollection per panel, so thousands of runs stay cheap to draw), the median and a percentile band.
+
+    :param save_file: Name of file to save the figure to
+    :param time: Time points (in hrs) shared by the runs
+    :param concentrations: Concentrations (in fg/cell) with shape (n_runs, n_columns, n_times)
+    :param columns: Names of the columns of concentrations
+    :param percentiles: Lower and upper percentile of the band
+    :param exp_data: [Optional] ExperimentalData shown in the panels of Hb, free haem and Hz
+    :param figsize: Size of the figure (in inches)
+    :param dpi: Resolution of the saved figure
+    :return:
+    """
+    time = np.asarray(time)
+    concentrations = np.asarray(concentrations)
+    measured = {'conc_hb_dv': 'Hb', 'conc_fe3pp': 'Hm', 'conc_hz': 'Hz'}
+    with matplotlib.rc_context(_RC):
+        figure = Figure(figsize=figsize, dpi=dpi, layout='constrained')
+        FigureCanvasAgg(figure)
+        n_cols = min(3, len(columns))
+        axes = figure.subplots(-(-len(columns) // n_cols), n_cols, sharex=True, squeeze=False).ravel()
+        for k, ax in enumerate(axes):
+            if k >= len(columns):
+                ax.set_visible(False)
+                continue
+            runs = concentrations[:, k]
+            segments = np.stack([np.broadcast_to(time, runs.shape), runs], axis=-1)
+            ax.add_collection(LineCollection(segments, colors='grey', linewidths=0.5, alpha=0.2))
+            low, median, high = np.nanpercentile(runs, [percentiles[0], 50, percentiles[1]], axis=0)
+            ax.fill_between(time, low, high, color='C0', alpha=0.3, label=f'{percentiles[0]}-{percentiles[1]}%')
+            ax.plot(time, median, color='C0', label='Median')
+            if exp_data is not None and measured.get(columns[k]) in exp_data.data:
+                column = measured[columns[k]]
+                ax.errorbar(exp_data.data.index, exp_data.data[column], yerr=exp_data.data[f'{column}:SEM'].values,
+                            fmt='o', mfc='white', color='k', label=f'Exp {column}')
+            ax.autoscale_view()
+            ax.set_title(columns[k])
+            ax.legend(loc='upper left')
+        figure.supxlabel('Time (hrs)')
+        figure.supylabel('Fe (fg/cell)')
+        figure.savefig(save_file)
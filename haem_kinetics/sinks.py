@@ -0,0 +1,241 @@
+import json
+import os
+import numpy as np
+
+from typing import List, Optional
+
+from haem_kinetics.lazy import lazy_import
+
+# Only loaded when a sink of their format is used (see LazyModule). pyarrow and h5py are optional dependencies,
+# install with pip install haem_kinetics[io].
+pd = lazy_import('pandas')
+pa = lazy_import('pyarrow', optional=True)
+pa_ipc = lazy_import('pyarrow.ipc', optional=True)
+pa_parquet = lazy_import('pyarrow.parquet', optional=True)
+h5py = lazy_import('h5py', optional=True)
+
+
+class Sink:
+    """
+    Destination for results that are written in chunks as they are solved (see KineticsModel.stream and
+    Sweep.write), so a long or finely sampled run or a large sweep never has to be held in memory as a whole.
+
+    Every chunk is a block of rows with the columns run (index of the run or ensemble member), time (in hrs) and one
+    column per species (in fg/cell). The species are fixed by the first chunk. Sinks are context managers, so the file
+    is completed and closed when the with block exits.
+    """
+    def __init__(self, path: str, dtype: str = 'float64'):
+        """
+        :param path: File to write to, it is overwritten
+        :param dtype: Data type of the concentrations, 'float64' or 'float32'
+        """
+        if dtype not in ('float64', 'float32'):
+            raise ValueError(f'Unknown dtype {dtype}, must be float64 or float32')
+        self.path = os.path.expanduser(path)
+        self.dtype = np.dtype(dtype)
+        self.species = None
+        self.n_rows = 0
+
+    def write(self, time, values: np.ndarray, species: List[str], run: int = 0):
+        """
+        :param time: Time points of the chunk (in hrs)
+        :param values: Concentrations (in fg/cell) with shape (n_times, n_species)
+        :param species: Names of the columns of values - order matters
+        :param run: Index of the run (or runs, one per time point) the chunk belongs to
+        :return:
+        """
+        time = np.asarray(time, dtype=float)
+        values = np.asarray(values).astype(self.dtype, copy=False)
+        if values.shape != (len(time), len(species)):
+            raise ValueError(f'Expected values with shape {(len(time), len(species))}, got {values.shape}')
+        if self.species is None:
+            self.species = list(species)
+            self._open()
+        elif list(species) != self.species:
+            raise ValueError(f'Species of the chunk {list(species)} differ from those of the sink {self.species}')
+
+        run = np.broadcast_to(np.asarray(run, dtype=np.int64), time.shape)
+        self._write(run, time, values)
+        self.n_rows += len(time)
+
+    def close(self):
+        """
+        Completes and closes the file
+        :return:
+        """
+        pass
+
+    def _open(self):
+        # Called with the species of the first chunk
+        raise NotImplementedError('_open must be overwritten by the sink')
+
+    def _write(self, run: np.ndarray, time: np.ndarray, values: np.ndarray):
+        raise NotImplementedError('_write must be overwritten by the sink')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _ArrowSink(Sink):
+    """
+    Sinks that write each chunk as one Arrow record batch
+    """
+    def __init__(self, path: str, dtype: str = 'float64'):
+        if pa is None:
+            raise ImportError(f'pyarrow is required for {type(self).__name__} (pip install haem_kinetics[io])')
+        super().__init__(path, dtype=dtype)
+        self._writer = None
+
+    def _schema(self):
+        value_type = pa.float32() if self.dtype == np.float32 else pa.float64()
+        return pa.schema([('run', pa.int64()), ('time', pa.float64())] +
+                         [(name, value_type) for name in self.species])
+
+    def _batch(self, run: np.ndarray, time: np.ndarray, values: np.ndarray):
+        arrays = [pa.array(run), pa.array(time)] + [pa.array(column) for column in values.T]
+        return pa.RecordBatch.from_arrays(arrays, schema=self._schema())
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class ParquetSink(_ArrowSink):
+    """
+    Writes results to a Parquet file, one row group per chunk. Read with pandas.read_parquet.
+    """
+    def __init__(self, path: str, dtype: str = 'float64', compression: Optional[str] = 'snappy'):
+        """
+        :param path: File to write to, it is overwritten
+        :param dtype: Data type of the concentrations, 'float64' or 'float32'
+        :param compression: [Optional] Compression codec of the columns, e.g. 'snappy', 'zstd' or None
+        """
+        super().__init__(path, dtype=dtype)
+        self.compression = compression
+
+    def _open(self):
+        self._writer = pa_parquet.ParquetWriter(self.path, self._schema(), compression=self.compression)
+
+    def _write(self, run: np.ndarray, time: np.ndarray, values: np.ndarray):
+        self._writer.write_table(pa.Table.from_batches([self._batch(run, time, values)]))
+
+
+class ArrowSink(_ArrowSink):
+    """
+    Writes results to an Arrow IPC file, one record batch per chunk. Read with pyarrow.ipc.open_file or
+    pandas.read_feather.
+    """
+    def _open(self):
+        self._writer = pa_ipc.new_file(self.path, self._schema())
+
+    def _write(self, run: np.ndarray, time: np.ndarray, values: np.ndarray):
+        self._writer.write_batch(self._batch(run, time, values))
+
+
+class HDF5Sink(Sink):
+    """
+    Writes results to an HDF5 file with the datasets run (n_rows,), time (n_rows,) and concentrations
+    (n_rows, n_species), which grow by one chunk at a time. The names of the species are stored in the species
+    attribute of the concentrations dataset.
+    """
+    def __init__(self, path: str, dtype: str = 'float64', compression: Optional[str] = None):
+        """
+        :param path: File to write to, it is overwritten
+        :param dtype: Data type of the concentrations, 'float64' or 'float32'
+        :param compression: [Optional] Compression filter of the datasets, e.g. 'gzip' or 'lzf'
+        """
+        if h5py is None:
+            raise ImportError('h5py is required for HDF5Sink (pip install haem_kinetics[io])')
+        super().__init__(path, dtype=dtype)
+        self.compression = compression
+        self._file = None
+
+    def _open(self):
+        self._file = h5py.File(self.path, 'w')
+        options = dict(chunks=True, compression=self.compression)
+        self._file.create_dataset('run', shape=(0,), maxshape=(None,), dtype=np.int64, **options)
+        self._file.create_dataset('time', shape=(0,), maxshape=(None,), dtype=np.float64, **options)
+        dataset = self._file.create_dataset('concentrations', shape=(0, len(self.species)),
+                                            maxshape=(None, len(self.species)), dtype=self.dtype, **options)
+        dataset.attrs['species'] = self.species
+
+    def _write(self, run: np.ndarray, time: np.ndarray, values: np.ndarray):
+        for name, data in (('run', run), ('time', time), ('concentrations', values)):
+            dataset = self._file[name]
+            dataset.resize(self.n_rows + len(data), axis=0)
+            dataset[self.n_rows:] = data
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def read(path: str) -> 'pd.DataFrame':
+        """
+        :param path: File written by HDF5Sink
+        :return: Results with the columns run, time and one column per species
+        """
+        if h5py is None:
+            raise ImportError('h5py is required to read HDF5 results (pip install haem_kinetics[io])')
+        with h5py.File(os.path.expanduser(path), 'r') as file:
+            dataset = file['concentrations']
+            df = pd.DataFrame(dataset[:], columns=[str(name) for name in dataset.attrs['species']])
+            df.insert(0, 'time', file['time'][:])
+            df.insert(0, 'run', file['run'][:])
+        return df
+
+
+class BinarySink(Sink):
+    """
+    Writes results to a compact raw binary file of fixed size records (run as int32, time as float64 and the
+    concentrations as float32 by default), with the layout of the records in a JSON sidecar (path + '.json'). The
+    file needs no library to write and can be memory mapped with read.
+    """
+    def __init__(self, path: str, dtype: str = 'float32'):
+        """
+        :param path: File to write to, it is overwritten
+        :param dtype: Data type of the concentrations, 'float32' (default) or 'float64'
+        """
+        super().__init__(path, dtype=dtype)
+        self._file = None
+        self._record = None
+
+    def _open(self):
+        self._record = np.dtype([('run', '<i4'), ('time', '<f8')] +
+                                [(name, self.dtype.newbyteorder('<')) for name in self.species])
+        with open(self.path + '.json', 'w') as file:
+            json.dump({'columns': ['run', 'time'] + self.species, 'dtype': self._record.descr}, file)
+        self._file = open(self.path, 'wb')
+
+    def _write(self, run: np.ndarray, time: np.ndarray, values: np.ndarray):
+        records = np.empty(len(time), dtype=self._record)
+        records['run'] = run
+        records['time'] = time
+        for k, name in enumerate(self.species):
+            records[name] = values[:, k]
+        records.tofile(self._file)
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def read(path: str) -> np.memmap:
+        """
+        :param path: File written by BinarySink
+        :return: Memory mapped records with the fields run, time and one field per species (e.g. pd.DataFrame(records))
+        """
+        path = os.path.expanduser(path)
+        with open(path + '.json') as file:
+            header = json.load(file)
+        record = np.dtype([tuple(field) for field in header['dtype']])
+        if os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=record)
+        return np.memmap(path, dtype=record, mode='r')
@@ -0,0 +1,187 @@
+import copy
+import json
+import os
+import numpy as np
+
+from typing import Dict, List, Optional
+
+from haem_kinetics.components.constants import Constants
+from haem_kinetics.components.experimental_data import ExperimentalData
+from haem_kinetics.components.result import Concentrations
+from haem_kinetics.lazy import lazy_import
+
+# Only loaded when a store is opened or created (see LazyModule)
+pd = lazy_import('pandas')
+
+
+class ResultStore:
+    """
+    On-disk store of the results of an ensemble or sweep. The concentrations (in fg/cell) of every run are kept in one
+    .npy array of shape (n_runs, n_species, n_times) that is memory mapped, so slicing a species, a block of runs or a
+    time window reads only what is needed and returns a view instead of a copy. A directory holds:
+
+    - concentrations.npy: Concentrations with shape (n_runs, n_species, n_times)
+    - time.npy: Time points (in hrs)
+    - done.npy: Whether each run has been written (runs that are not done hold zeros)
+    - params.csv: Values of the varied constants of each run (one row per run, one column per constant)
+    - inits.csv: Initial concentrations (in M) of each run (one row per run, one column per species)
+    - store.json: Model, species and the constants shared by all runs (see constants)
+    """
+    def __init__(self, directory: str, mode: str = 'r'):
+        """
+        Opens an existing store (see create)
+
+        :param directory: Directory of the store
+        :param mode: 'r' to read or 'r+' to also write runs
+        """
+        if mode not in ('r', 'r+'):
+            raise ValueError(f'Unknown mode {mode}, must be r or r+')
+        self.directory = os.path.expanduser(directory)
+        self.mode = mode
+        with open(os.path.join(self.directory, 'store.json')) as f:
+            self.info = json.load(f)
+
+        self.model_name = self.info['model_name']
+        self.species = self.info['species']
+        self.param_names = self.info['param_names']
+        self.concentrations = np.load(self._path('concentrations.npy'), mmap_mode=mode)
+        self.time = np.load(self._path('time.npy'))
+        self.done = np.load(self._path('done.npy'), mmap_mode=mode)
+        self.params = pd.read_csv(self._path('params.csv'), index_col='run')
+        self.inits = pd.read_csv(self._path('inits.csv'), index_col='run')
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @classmethod
+    def create(cls, directory: str, model, time, design, param_names: List[str], inits,
+               dtype: str = 'float64') -> 'ResultStore':
+        """
+        Creates an empty store for a design. The array is allocated on disk (sparse where the file system allows
+        it) and filled in with write as runs complete.
+
+        :param directory: Directory of the store, created if needed. An existing store in it is overwritten.
+        :param model: KineticsModel whose constants are varied by the design
+        :param time: Time points (in hrs) shared by all runs
+        :param design: Values of the varied constants with shape (n_runs, n_params)
+        :param param_names: Names of the varied constants (see Constants.set_value)
+        :param inits: Initial concentrations (in M) with shape (n_runs, n_species)
+        :param dtype: Data type of the concentrations, 'float64' or 'float32'
+        :return: ResultStore opened for writing
+        """
+        if dtype not in ('float64', 'float32'):
+            raise ValueError(f'Unknown dtype {dtype}, must be float64 or float32')
+        directory = os.path.expanduser(directory)
+        os.makedirs(directory, exist_ok=True)
+        species = list(model.initial_values)
+        design = np.atleast_2d(np.asarray(design, dtype=float))
+        time = np.asarray(time, dtype=float)
+
+        runs = pd.RangeIndex(len(design), name='run')
+        pd.DataFrame(design, index=runs, columns=list(param_names)).to_csv(os.path.join(directory, 'params.csv'))
+        pd.DataFrame(inits, index=runs, columns=species).to_csv(os.path.join(directory, 'inits.csv'))
+        np.save(os.path.join(directory, 'time.npy'), time)
+        np.save(os.path.join(directory, 'done.npy'), np.zeros(len(design), dtype=bool))
+        np.lib.format.open_memmap(os.path.join(directory, 'concentrations.npy'), mode='w+', dtype=dtype,
+                                  shape=(len(design), len(species), len(time)))
+
+        # The info is written last, so a store without it is incomplete
+        info = {'model_name': model.model_name,
+                'model_class': f'{type(model).__module__}.{type(model).__qualname__}',
+                'species': species,
+                'param_names': list(param_names),
+                'units': 'fg/cell',
+                'constants': vars(model.const)}
+        with open(os.path.join(directory, 'store.json'), 'w') as f:
+            json.dump(info, f, indent=2)
+
+        return cls(directory, mode='r+')
+
+    @property
+    def n_runs(self) -> int:
+        return self.concentrations.shape[0]
+
+    def write(self, indices, concentrations: np.ndarray):
+        """
+        Writes a block of runs, e.g. a chunk yielded by Sweep.run. The concentrations are flushed to disk before the
+        runs are marked as done, so a killed job never marks a run that was not written.
+
+        :param indices: Indices of the runs
+        :param concentrations: Concentrations (in fg/cell) with shape (len(indices), n_species, n_times)
+        :return:
+        """
+        if self.mode != 'r+':
+            raise ValueError('The store was opened read-only, open it with mode=r+ to write runs')
+        self.concentrations[indices] = concentrations
+        self.concentrations.flush()
+        self.done[indices] = True
+        self.done.flush()
+
+    def missing(self) -> np.ndarray:
+        """
+        :return: Indices of the runs that have not been written
+        """
+        return np.flatnonzero(~np.asarray(self.done))
+
+    def array(self, species: Optional[str] = None, runs=None) -> np.ndarray:
+        """
+        :param species: [Optional] Name of a species. Defaults to all species.
+        :param runs: [Optional] Runs to select (index, slice or array of indices). Defaults to all runs.
+        :return: Concentrations (in fg/cell) with shape (n_runs, n_times) for one species, otherwise
+                 (n_runs, n_species, n_times). Runs selected with a slice are a view of the memory mapped array.
+        """
+        runs = slice(None) if runs is None else runs
+        if species is None:
+            return self.concentrations[runs]
+        return self.concentrations[runs, self.species.index(species)]
+
+    def run(self, index: int) -> Concentrations:
+        """
+        :param index: Index of the run
+        :return: Concentrations (in fg/cell) of the run
+        """
+        return Concentrations(y=self.concentrations[index], species=self.species, time=self.time)
+
+    def constants(self, index: int) -> Constants:
+        """
+        :param index: Index of the run
+        :return: Constants of the run, i.e. the shared constants with the varied constants of the run set
+        """
+        const = Constants()
+        for name, value in copy.deepcopy(self.info['constants']).items():
+            setattr(const, name, value)
+        for name, value in self.params.loc[index].items():
+            const.set_value(name, value)
+        return const
+
+    def at(self, times, species: Optional[str] = None, runs=None) -> np.ndarray:
+        """
+        Linearly interpolates the concentrations of every run at other time points, e.g. those of ExperimentalData
+
+        :param times: Time points (in hrs) within the time points of the store
+        :param species: [Optional] Name of a species. Defaults to all species.
+        :param runs: [Optional] Runs to select (see array)
+        :return: Concentrations (in fg/cell) with the time axis of array replaced by times
+        """
+        times = np.asarray(times, dtype=float)
+        if np.any(times < self.time[0]) or np.any(times > self.time[-1]):
+            raise ValueError(f'Time points must lie within {self.time[0]:g} - {self.time[-1]:g} hrs')
+        right = np.clip(np.searchsorted(self.time, times), 1, len(self.time) - 1)
+        weight = (times - self.time[right - 1]) / (self.time[right] - self.time[right - 1])
+
+        values = self.array(species=species, runs=runs)
+        return values[..., right - 1] * (1 - weight) + values[..., right] * weight
+
+    def compare(self, exp_data: ExperimentalData, species_map: Dict[str, str], runs=None) -> np.ndarray:
+        """
+        Differences between every run and the measurements, e.g. to rank the runs of a sweep by how well they match
+        the experiments
+
+        :param exp_data: Experimental data
+        :param species_map: Measured column of exp_data -> species, e.g. {'Hz': 'conc_hz'}
+        :param runs: [Optional] Runs to select (see array)
+        :return: Model - measured (in fg/cell) with shape (n_runs, len(species_map), n_measured_times)
+        """
+        times = exp_data.data.index.values.astype(float)
+        predicted = np.stack([self.at(times, species=sp, runs=runs) for sp in species_map.values()], axis=-2)
+        return predicted - exp_data.data[list(species_map)].values.T
@@ -0,0 +1,198 @@
+import itertools
+import os
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Type
+
+from haem_kinetics.lazy import lazy_import
+from haem_kinetics.models import jit
+from haem_kinetics.models.base import KineticsModel
+from haem_kinetics.store import ResultStore
+
+# scipy.stats takes longer to import than the rest of the package and is only used by latin_hypercube
+qmc = lazy_import('scipy.stats.qmc')
+
+# Models are cached per worker process so that Constants() and ExperimentalData() are only set up once per process
+_worker_models = {}
+
+
+def _run_chunk(model_class: Type[KineticsModel], param_names: List[str], indices: np.ndarray, inits: np.ndarray,
+               params: np.ndarray, t, kwargs: dict) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Solves a chunk of the sweep in a worker process. Only the model class (pickled by reference) and the parameter
+    vectors of the chunk are sent to the worker.
+
+    :param model_class: Model to be solved
+    :param param_names: Names of the constants in params
+    :param indices: Indices of the runs in the chunk
+    :param inits: Initial concentrations of the runs (n_chunk, n_species)
+    :param params: Values of the constants of the runs (n_chunk, n_params)
+    :param t: Time range (in min) that will be integrated over
+    :param kwargs: Additional arguments passed to run_ensemble
+    :return: Tuple of (indices, concentrations in fg/cell with shape (n_chunk, n_species, n_times))
+    """
+    if model_class not in _worker_models:
+        _worker_models[model_class] = model_class()
+    model = _worker_models[model_class]
+
+    return indices, model.run_ensemble(t=t, inits=inits, params=params, param_names=param_names, **kwargs)
+
+
+class Sweep:
+    """
+    Parameter sweep over the constants of a model. The design (one row of constants per run) is split into chunks
+    that are solved with KineticsModel.run_ensemble on a pool of worker processes.
+
+    Constants are named as in Constants.set_value, e.g. 'fudge', 'K_partition' or 'k_enzymes.hap.kcat'.
+    """
+    def __init__(self, model_class: Type[KineticsModel], param_names: List[str], design, t, init, **kwargs):
+        """
+        :param model_class: Model to be solved, e.g. Model3
+        :param param_names: Names of the constants that are varied
+        :param design: Values of the constants with shape (n_runs, n_params)
+        :param t: Time range (in min) that will be integrated over
+        :param init: Initial concentrations of haem species (in M), either one set for every run or one per run
+        :param kwargs: Additional arguments passed to run_ensemble. t_eval is required so that all runs share the
+                       same time points.
+        """
+        if kwargs.get('t_eval') is None:
+            raise ValueError('t_eval is required so that all runs of the sweep share the same time points')
+
+        self.model_class = model_class
+        self.param_names = list(param_names)
+        self.design = np.atleast_2d(np.asarray(design, dtype=float))
+        if self.design.shape[1] != len(self.param_names):
+            raise ValueError('param_names must name each column of the design')
+
+        self.inits = np.atleast_2d(np.asarray(init, dtype=float))
+        if len(self.inits) == 1:
+            self.inits = np.repeat(self.inits, len(self.design), axis=0)
+        if len(self.inits) != len(self.design):
+            raise ValueError(f'Got {len(self.inits)} sets of initial values for {len(self.design)} runs')
+
+        self.t = t
+        self.kwargs = kwargs
+        self.time = 16 + np.asarray(kwargs['t_eval'], dtype=float) / 60  # In hours
+
+    @classmethod
+    def grid(cls, model_class: Type[KineticsModel], values: Dict[str, Sequence[float]], t, init, **kwargs):
+        """
+        Full factorial design over the values given for each constant
+
+        :param model_class: Model to be solved
+        :param values: Values to use for each constant, e.g. {'fudge': [1, 2, 3], 'k_hz': [0.1, 0.15]}
+        :param t: Time range (in min) that will be integrated over
+        :param init: Initial concentrations of haem species (in M)
+        :param kwargs: Additional arguments passed to run_ensemble
+        :return: Sweep
+        """
+        design = np.array(list(itertools.product(*values.values())), dtype=float)
+        return cls(model_class, param_names=list(values), design=design, t=t, init=init, **kwargs)
+
+    @classmethod
+    def latin_hypercube(cls, model_class: Type[KineticsModel], bounds: Dict[str, Tuple[float, float]], n_samples: int,
+                        t, init, seed: Optional[int] = None, **kwargs):
+        """
+        Latin hypercube design within the bounds given for each constant
+
+        :param model_class: Model to be solved
+        :param bounds: Lower and upper bound of each constant, e.g. {'fudge': (1, 4), 'K_partition': (200, 600)}
+        :param n_samples: Number of runs
+        :param t: Time range (in min) that will be integrated over
+        :param init: Initial concentrations of haem species (in M)
+        :param seed: [Optional] Seed of the random number generator
+        :param kwargs: Additional arguments passed to run_ensemble
+        :return: Sweep
+        """
+        lower, upper = np.array(list(bounds.values()), dtype=float).T
+        sample = qmc.LatinHypercube(d=len(bounds), seed=seed).random(n=n_samples)
+        design = qmc.scale(sample, lower, upper)
+        return cls(model_class, param_names=list(bounds), design=design, t=t, init=init, **kwargs)
+
+    def run(self, n_workers: Optional[int] = None, chunk_size: int = 32,
+            indices: Optional[Sequence[int]] = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Solves the sweep on a pool of worker processes. Results are yielded as soon as each chunk completes, so they
+        arrive out of order.
+
+        :param n_workers: [Optional] Number of worker processes. Defaults to the number of CPUs.
+        :param chunk_size: Number of runs solved together by each task
+        :param indices: [Optional] Indices of the runs to solve (e.g. those missing when resuming). Defaults to all.
+        :return: Iterator of (indices, concentrations) where concentrations (in fg/cell) has the shape
+                 (len(indices), n_species, n_times)
+        """
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=jit.worker_context()) as executor:
+            runs = np.arange(len(self.design)) if indices is None else np.asarray(indices, dtype=int)
+            futures = []
+            for start in range(0, len(runs), chunk_size):
+                chunk = runs[start:start + chunk_size]
+                futures.append(executor.submit(_run_chunk, self.model_class, self.param_names, chunk,
+                                               self.inits[chunk], self.design[chunk], self.t, self.kwargs))
+
+            for future in as_completed(futures):
+                yield future.result()
+
+    def collect(self, n_workers: Optional[int] = None, chunk_size: int = 32) -> np.ndarray:
+        """
+        Solves the sweep and gathers all results
+
+        :param n_workers: [Optional] Number of worker processes. Defaults to the number of CPUs.
+        :param chunk_size: Number of runs solved together by each task
+        :return: Concentrations (in fg/cell) with shape (n_runs, n_species, n_times), in the order of the design
+        """
+        results = None
+        for indices, concentrations in self.run(n_workers=n_workers, chunk_size=chunk_size):
+            if results is None:
+                results = np.empty((len(self.design),) + concentrations.shape[1:])
+            results[indices] = concentrations
+        return results
+
+    def write(self, sink, n_workers: Optional[int] = None, chunk_size: int = 32,
+              indices: Optional[Sequence[int]] = None) -> int:
+        """
+        Solves the sweep and writes each run to a sink (see Sink) as soon as its chunk completes, so only the chunks
+        in flight are held in memory. Runs are written in the order they complete, with the index of the run in the
+        design as the run column.
+
+        :param sink: Sink that the concentrations (in fg/cell) are written to
+        :param n_workers: [Optional] Number of worker processes. Defaults to the number of CPUs.
+        :param chunk_size: Number of runs solved together by each task
+        :param indices: [Optional] Indices of the runs to solve. Defaults to all.
+        :return: Number of runs written
+        """
+        species = list(self.model_class().initial_values)
+        n_runs = 0
+        for chunk, concentrations in self.run(n_workers=n_workers, chunk_size=chunk_size, indices=indices):
+            for index, values in zip(chunk, concentrations):
+                sink.write(time=self.time, values=values.T, species=species, run=index)
+            n_runs += len(chunk)
+        return n_runs
+
+    def store(self, directory: str, n_workers: Optional[int] = None, chunk_size: int = 32,
+              dtype: str = 'float64') -> ResultStore:
+        """
+        Solves the sweep into a ResultStore, writing each chunk as it completes. If the directory already holds a
+        store of this sweep, only the runs that are missing from it are solved, so a killed sweep resumes where it
+        stopped.
+
+        :param directory: Directory of the store
+        :param n_workers: [Optional] Number of worker processes. Defaults to the number of CPUs.
+        :param chunk_size: Number of runs solved together by each task
+        :param dtype: Data type of the concentrations, 'float64' or 'float32'
+        :return: ResultStore of the sweep
+        """
+        if os.path.exists(os.path.join(os.path.expanduser(directory), 'store.json')):
+            store = ResultStore(directory, mode='r+')
+            if store.param_names != self.param_names or store.params.shape != self.design.shape or \
+                    not np.allclose(store.params.values, self.design) or not np.allclose(store.time, self.time):
+                raise ValueError(f'{directory} holds the results of a different sweep')
+        else:
+            store = ResultStore.create(directory, model=self.model_class(), time=self.time, design=self.design,
+                                       param_names=self.param_names, inits=self.inits, dtype=dtype)
+
+        missing = store.missing()
+        if len(missing):
+            for indices, concentrations in self.run(n_workers=n_workers, chunk_size=chunk_size, indices=missing):
+                store.write(indices, concentrations)
+        return store
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from haem_kinetics.analysis.fitting import ModelFit
+from haem_kinetics.components.experimental_data import ExperimentalData
+from haem_kinetics.models.model3 import Model3
+
+INIT = [0.018, 0.0, 0.0, 0.0]
+
+
+def synthetic_data(fudge: float) -> ExperimentalData:
+    """
+    Experimental data generated by Model3 with the given fudge factor
+    """
+    model = Model3()
+    model.const.fudge = fudge
+    model.run(t=[0, 1680], init=INIT, t_eval=(np.arange(20, 45, 3) - 16) * 60, rtol=1e-8, atol=1e-14)
+
+    exp_data = ExperimentalData()
+    exp_data.data = pd.DataFrame({'Hb': model.concentrations['conc_hb_dv'].values, 'Hb:SEM': 0.5,
+                                  'Hm': model.concentrations['conc_fe3pp'].values, 'Hm:SEM': 0.0,
+                                  'Hz': model.concentrations['conc_hz'].values, 'Hz:SEM': 5.0},
+                                 index=np.arange(20, 45, 3))
+    exp_data.data.loc[20, 'Hm:SEM'] = 0.2
+    return exp_data
+
+
+def test_fit_recovers_constant():
+    """
+    Test that fitting to data generated by the model recovers the constant used to generate it
+    :return:
+    """
+    fitter = ModelFit(Model3(), bounds={'fudge': (0.5, 10)}, init=INIT, exp_data=synthetic_data(fudge=4.0),
+                      rtol=1e-8, atol=1e-14)
+    result = fitter.fit(x0=[3.5])
+
+    assert np.isclose(result.x[0], 4.0, rtol=1e-3)
+    assert result.cost < 1e-6
+
+
+def test_residuals_cached():
+    """
+    Test that repeated evaluations of the residuals are served from the cache and that zero SEMs are replaced
+    :return:
+    """
+    fitter = ModelFit(Model3(), bounds={'fudge': (0.5, 10)}, init=INIT, exp_data=synthetic_data(fudge=4.0))
+    first = fitter.residuals([3.0])
+    second = fitter.residuals(np.array([3.0]))
+
+    assert np.array_equal(first, second)
+    assert fitter._evaluate_cached.cache_info().hits == 1
+    assert np.all(fitter.sem[fitter.columns.index('Hm')] == 0.2)
+
+
+def test_multi_start_fit():
+    """
+    Test that a multi-start fit runs each start and keeps the best result first
+    :return:
+    """
+    fitter = ModelFit(Model3(), bounds={'fudge': (0.5, 10)}, init=INIT, exp_data=synthetic_data(fudge=4.0))
+    result = fitter.fit(n_starts=3, n_workers=2, seed=0)
+
+    assert len(fitter.results) == 3
+    assert result.cost == min(r.cost for r in fitter.results)
@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+from haem_kinetics.analysis import sensitivity
+
+from haem_kinetics.analysis.sensitivity import GlobalSensitivity
+
+BOUNDS = {'fudge': (1, 4), 'K_partition': (200, 600)}
+
+
+def test_sobol_indices_linear():
+    """
+    Test the Sobol estimators on y = x0 + 2 * x1 with uniform inputs, for which S1 = ST = [0.2, 0.8]
+    :return:
+    """
+    n_samples = 4096
+    sample = GlobalSensitivity._saltelli_sample(n_params=2, n_samples=n_samples, seed=0)
+    y = (sample[:, 0] + 2 * sample[:, 1]).reshape(4, n_samples)
+    first, total = GlobalSensitivity._sobol_indices(f_a=y[0], f_b=y[1], f_ab=y[2:])
+
+    assert np.allclose(first, [0.2, 0.8], atol=0.02)
+    assert np.allclose(total, [0.2, 0.8], atol=0.02)
+
+
+def test_saltelli_sample_size():
+    """
+    Test that the base sample size must be a power of 2
+    :return:
+    """
+    assert GlobalSensitivity._saltelli_sample(n_params=3, n_samples=8, seed=0).shape == (40, 3)
+    with pytest.raises(ValueError):
+        GlobalSensitivity._saltelli_sample(n_params=3, n_samples=10)
+
+
+def test_morris_sample():
+    """
+    Test that each step of a Morris trajectory moves exactly one constant by delta and stays in the unit hypercube,
+    and that the number of levels must be even
+    :return:
+    """
+    sample, moved, steps = GlobalSensitivity._morris_sample(n_params=3, n_trajectories=5, n_levels=4, seed=0)
+    diffs = np.diff(sample.reshape(5, 4, 3), axis=1)
+
+    assert np.all((sample >= 0) & (sample <= 1))
+    assert np.all(np.count_nonzero(diffs, axis=2) == 1)
+    assert np.all(np.sort(moved, axis=1) == np.arange(3))
+    assert np.allclose(np.abs(steps), 2 / 3)
+    for n_levels in [0, 3]:
+        with pytest.raises(ValueError):
+            GlobalSensitivity._morris_sample(n_params=3, n_trajectories=5, n_levels=n_levels)
+
+
+def test_sobol_checkpoint_resume(tmp_path):
+    """
+    Test that Sobol indices are computed on a process pool and that an analysis resumes from its checkpoint
+    :return:
+    """
+    checkpoint = str(tmp_path / 'sobol.npz')
+    analysis = GlobalSensitivity(bounds=BOUNDS, init=[0.018, 0.0, 0.0, 0.0], method='LSODA')
+    results = analysis.sobol(n_samples=8, seed=0, checkpoint=checkpoint, n_workers=2, chunk_size=8)
+
+    assert list(results) == ['hz_44h', 'peak_fe3pp']
+    assert list(results['hz_44h'].index) == list(BOUNDS)
+    assert list(results['hz_44h'].columns) == ['S1', 'S1_conf', 'ST', 'ST_conf']
+
+    # Drop part of the saved outputs as if the job had been killed
+    with np.load(checkpoint) as saved:
+        design, outputs, done = saved['design'], saved['outputs'], saved['done']
+    assert done.all()
+    partial, partial_done = outputs.copy(), done.copy()
+    partial[10:] = np.nan
+    partial_done[10:] = False
+    GlobalSensitivity._save_checkpoint(checkpoint=checkpoint, design=design, outputs=partial, done=partial_done)
+
+    # Runs are batched differently on resume, so they only agree within the solver tolerance
+    resumed = analysis.evaluate(design, checkpoint=checkpoint, n_workers=2, chunk_size=8)
+    assert np.all(resumed[:10] == outputs[:10])
+    assert np.allclose(resumed, outputs, rtol=1e-2)
+
+    with pytest.raises(ValueError):
+        analysis.evaluate(design[:-1], checkpoint=checkpoint)
+
+
+def test_morris():
+    """
+    Test that Morris screening ranks fudge above K_partition for Hz at 44 hrs. The enzyme fudge factor sets the rate
+    of haem release while K_partition only affects the rate of Hz formation.
+    :return:
+    """
+    analysis = GlobalSensitivity(bounds=BOUNDS, init=[0.018, 0.0, 0.0, 0.0], method='LSODA')
+    results = analysis.morris(n_trajectories=4, seed=0, n_workers=2)
+
+    assert results['peak_fe3pp'].shape == (2, 3)
+    assert np.all(np.isfinite(results['peak_fe3pp'].values))
+    assert results['hz_44h'].loc['fudge', 'mu_star'] > results['hz_44h'].loc['K_partition', 'mu_star']
+
+
+def test_failed_runs(tmp_path, monkeypatch):
+    """
+    Test that failed runs saved in a checkpoint are not solved again, and that they are reported and left out of
+    the Morris and Sobol estimates
+    :return:
+    """
+    analysis = GlobalSensitivity(bounds=BOUNDS)
+    design = analysis._scale(GlobalSensitivity._saltelli_sample(n_params=2, n_samples=8, seed=0))
+    outputs = np.stack([design[:, 0], design[:, 1] / 100], axis=1)
+    outputs[[3, 20]] = np.nan  # Base sample 3 (in A) and 4 (in AB_0) failed
+    checkpoint = str(tmp_path / 'sobol.npz')
+    GlobalSensitivity._save_checkpoint(checkpoint=checkpoint, design=design, outputs=outputs,
+                                       done=np.ones(len(design), dtype=bool))
+
+    # Everything is solved, so the model is never run
+    monkeypatch.setattr(sensitivity, 'Sweep', None)
+    with pytest.warns(UserWarning, match='2 of 32 runs failed'):
+        results = analysis.sobol(n_samples=8, seed=0, checkpoint=checkpoint)
+    assert list(results['hz_44h'].attrs['failed']) == [3, 20]
+    assert results['hz_44h'].attrs['n_samples'] == 6
+    assert np.all(np.isfinite(results['hz_44h'].values))
+
+    sample, _, _ = GlobalSensitivity._morris_sample(n_params=2, n_trajectories=4, n_levels=4, seed=0)
+    morris_outputs = np.stack([sample[:, 0], sample[:, 1]], axis=1)
+    morris_outputs[4] = np.nan  # Second trajectory
+    monkeypatch.setattr(analysis, 'evaluate', lambda *args, **kwargs: morris_outputs)
+    results = analysis.morris(n_trajectories=4, seed=0)
+    assert results['hz_44h'].attrs['n_trajectories'] == 3
+    assert np.all(np.isfinite(results['hz_44h'].values))
@@ -0,0 +1,90 @@
+import os
+import time
+import numpy as np
+
+from haem_kinetics.cache import ResultCache
+from haem_kinetics.models.model3 import Model3
+from haem_kinetics.models.network import MassAction, ReactionNetwork
+
+INIT = [0.018, 0.0, 0.0, 0.0]
+
+
+def test_cache_hit(tmp_path):
+    """
+    Test that a repeated run is read from the cache (memory, then disk) and gives the same concentrations
+    :return:
+    """
+    cache = ResultCache(directory=str(tmp_path))
+    first = Model3()
+    first.cache = cache
+    first.run(t=[0, 1700], init=INIT, t_eval=range(0, 1700, 20))
+    assert not first.solver_info['cached']
+    assert len(os.listdir(tmp_path)) == 1
+
+    second = Model3()
+    second.cache = cache
+    second.run(t=[0, 1700], init=INIT, t_eval=range(0, 1700, 20))
+    assert second.solver_info['cached']
+    assert second.solver_info['nfev'] == first.solver_info['nfev']
+    assert np.all(second.concentrations.values == first.concentrations.values)
+    assert np.all(second.const.conc_hb_rbc == first.const.conc_hb_rbc)
+
+    # A new cache on the same directory (e.g. in another session) reads the result from disk
+    third = Model3()
+    third.cache = ResultCache(directory=str(tmp_path))
+    third.run(t=[0, 1700], init=INIT, t_eval=range(0, 1700, 20))
+    assert third.solver_info['cached']
+    assert np.all(third.concentrations.values == first.concentrations.values)
+
+
+def test_cache_key():
+    """
+    Test that the key changes with the equations, constants, initial values and options, and that runs with options
+    that can not be hashed are not cached
+    :return:
+    """
+    model = Model3()
+    key = ResultCache.key(model, t=[0, 1700], init=INIT, t_eval=range(0, 1700, 20))
+
+    assert key == ResultCache.key(Model3(), t=[0, 1700], init=INIT, t_eval=list(range(0, 1700, 20)))
+    assert key != ResultCache.key(model, t=[0, 1700], init=INIT, t_eval=range(0, 1700, 20), rtol=1e-6)
+    assert key != ResultCache.key(model, t=[0, 1700], init=[0.01, 0.0, 0.0, 0.0], t_eval=range(0, 1700, 20))
+    model.const.k_enzymes['hap']['kcat'] = 0.2
+    assert key != ResultCache.key(model, t=[0, 1700], init=INIT, t_eval=range(0, 1700, 20))
+
+    # Same class and constants, but Hz formation is no longer slowed by lipid sequestration
+    edited = Model3()
+    edited.network = ReactionNetwork(species=Model3.network.species,
+                                     reactions=Model3.network.reactions[:-1] +
+                                     [MassAction(k='k_hz', reactants=['conc_fe3pp'], products=['conc_hz'])])
+    assert key != ResultCache.key(edited, t=[0, 1700], init=INIT, t_eval=range(0, 1700, 20))
+
+    assert ResultCache.key(model, t=[0, 1700], init=INIT, events=lambda t, y: y[0]) is None
+    assert ResultCache.key(model, t=[0, 1700], init=INIT, dense_output=True) is None
+
+
+def test_cache_eviction(tmp_path):
+    """
+    Test that the least recently used results are evicted by size and that old results are evicted by age
+    :return:
+    """
+    cache = ResultCache(directory=str(tmp_path))
+    model = Model3()
+    model.cache = cache
+    for fudge in [1.0, 2.0, 3.0]:
+        model.const.fudge = fudge
+        model.run(t=[0, 1700], init=INIT, t_eval=range(0, 1700, 20))
+    files = sorted(tmp_path.iterdir(), key=os.path.getmtime)
+    size = os.path.getsize(files[0])
+
+    # Keep the two most recent results
+    cache.max_size = 2.5 * size
+    cache.evict()
+    assert sorted(tmp_path.iterdir()) == sorted(files[1:])
+
+    # Age the oldest remaining result
+    old = time.time() - 100
+    os.utime(files[1], (old, old))
+    cache.max_age = 50
+    cache.evict()
+    assert list(tmp_path.iterdir()) == [files[2]]
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from haem_kinetics import cli
+from haem_kinetics.models.model3 import Model3
+from haem_kinetics.sinks import BinarySink
+from haem_kinetics.store import ResultStore
+
+requires_toml = pytest.mark.skipif(cli.tomllib is None, reason='tomli is not installed')
+
+TOML_JOBS = """
+[[jobs]]
+name = "single"
+model = "Model3"
+init = [0.018, 0.0, 0.0, 0.0]
+t = [0, 1700]
+t_eval = {start = 0, stop = 1700, step = 20}
+constants = {fudge = 2.0}
+solver = {method = "LSODA"}
+output = {path = "{tmp}/single.bin", dtype = "float64"}
+
+[[jobs]]
+name = "sweep"
+model = "Model3"
+init = [0.018, 0.0, 0.0, 0.0]
+t = [0, 1700]
+t_eval = [0, 600, 1200]
+constants = {k_hz = 0.2}
+solver = {method = "LSODA"}
+sweep = {grid = {fudge = [1.0, 2.0, 3.0]}, chunk_size = 2}
+output = {path = "{tmp}/sweep"}
+"""
+
+
+@requires_toml
+def test_cli_jobs(tmp_path):
+    """
+    Test that a TOML job file with a single run and a sweep writes both outputs, and that the constants of the job
+    are applied
+    :return:
+    """
+    job_file = tmp_path / 'jobs.toml'
+    job_file.write_text(TOML_JOBS.replace('{tmp}', str(tmp_path)))
+
+    assert cli.main([str(job_file), '--jobs', '2']) == 0
+
+    model = Model3()
+    model.const.fudge = 2.0
+    expected = model.run(t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0], t_eval=range(0, 1700, 20), method='LSODA')
+    single = pd.DataFrame(BinarySink.read(str(tmp_path / 'single.bin')))
+    assert np.allclose(single[expected.concentrations.columns], expected.concentrations.values)
+
+    store = ResultStore(str(tmp_path / 'sweep'))
+    assert store.param_names == ['fudge', 'k_hz']
+    assert np.allclose(store.params.values, [[1, 0.2], [2, 0.2], [3, 0.2]])
+    assert len(store.missing()) == 0 and store.concentrations.shape == (3, 4, 3)
+
+
+@requires_toml
+def test_cli_resume(tmp_path):
+    """
+    Test that resumed jobs skip completed outputs and rerun those whose settings changed
+    :return:
+    """
+    job_file = tmp_path / 'jobs.toml'
+    job_file.write_text(TOML_JOBS.replace('{tmp}', str(tmp_path)))
+    jobs = cli.load_jobs(str(job_file))
+    assert cli.main([str(job_file)]) == 0
+
+    assert all(cli.run_job(job, resume=True) == 'skipped' for job in jobs)
+    jobs[0]['constants']['fudge'] = 3.0
+    assert cli.run_job(jobs[0], resume=True) == 'done'
+
+
+def test_cli_yaml(tmp_path):
+    """
+    Test that YAML job files are read and that unknown keys are rejected
+    :return:
+    """
+    pytest.importorskip('yaml')
+    job_file = tmp_path / 'job.yaml'
+    job_file.write_text('model: Model3\nt: [0, 1700]\nt_eval: [0, 1680]\noutput: {path: out.bin}\n')
+    assert cli.load_jobs(str(job_file))[0]['name'] == 'job'
+
+    job_file.write_text('model: Model3\nt: [0, 1700]\nt_evl: [0, 1680]\noutput: {path: out.bin}\n')
+    with pytest.raises(ValueError, match='t_evl'):
+        cli.load_jobs(str(job_file))
@@ -1,3 +1,6 @@
+import copy
+import pytest
+
 from haem_kinetics.components.constants import Constants
 
 
@@ -97,3 +100,48 @@ def test_compute_rate_hb_deg():
     constants.compute_rate_hb_deg()
 
     assert round(constants.k_hb_deg, 2) == 0.04
+
+
+def test_get_set_value():
+    """
+    Test getting and setting constants by name, including entries of the enzyme dictionaries
+    :return:
+    """
+    constants = Constants()
+    constants.set_value('fudge', 1.5)
+    constants.set_value('k_enzymes.hap.kcat', 0.2)
+
+    assert constants.get_value('fudge') == 1.5
+    assert constants.k_enzymes['hap']['kcat'] == 0.2
+    assert constants.get_value('conc_enzymes.plm_1') == constants.conc_enzymes['plm_1']
+    with pytest.raises(KeyError):
+        constants.set_value('k_enzymes.hap.kact', 0.2)
+
+
+def test_derived_constants():
+    """
+    Test that the derived constants are cached, invalidated by changes of base constants and of entries of the enzyme
+    dictionaries (also on copies), exported as a flat vector and kept out of vars()
+    :return:
+    """
+    constants = Constants()
+    derived = constants.derived
+    assert constants.derived is derived
+    assert constants.compute_lipid_seq_constant() == derived['lipid_seq']
+    assert derived['k_hz_eff'] == constants.k_hz * derived['lipid_seq']
+
+    constants.K_partition = 200
+    assert constants.derived['lipid_seq'] == (1 - 0.016) / (1 + 0.016 + 0.016 * 200)
+
+    copied = copy.deepcopy(constants)
+    copied.k_enzymes['hap']['kcat'] = 0.2
+    constants.set_value('conc_enzymes.hap', 1e-4)
+    assert copied.get_value('derived.vmax.hap') == 0.2 * 60 * copied.conc_enzymes['hap']
+    assert constants.get_value('derived.vmax.hap') == 0.1 * 60 * 1e-4
+
+    vector = constants.derived_vector()
+    assert len(vector) == len(constants.derived_names) == 12
+    assert vector[constants.derived_names.index('vmax.hap')] == constants.derived['vmax']['hap']
+    assert '_derived' not in vars(constants)
+    with pytest.raises(KeyError):
+        constants.set_value('derived.lipid_seq', 1.0)
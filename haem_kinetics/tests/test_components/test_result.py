@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from haem_kinetics.components.result import Concentrations
+
+
+def derived(y):
+    return {'total': y[0] + y[1]}
+
+
+def test_concentrations_lazy():
+    """
+    Test that concentrations are converted with a scalar factor and that a DataFrame is only built when asked for
+    :return:
+    """
+    y = np.array([[1.0, 2.0, 3.0], [0.5, 0.5, 0.5]])
+    conc = Concentrations(y=y, species=['a', 'b'], time=np.array([16.0, 17.0, 18.0]), factor=10.0, derived=derived)
+
+    assert conc.columns == ['a', 'b', 'total']
+    assert conc.shape == (3, 3)
+    assert np.allclose(conc.array(['total']), [[15.0, 25.0, 35.0]])
+    assert np.allclose(conc['a'], [10.0, 20.0, 30.0])
+    assert conc._df is None
+
+    df = conc.to_dataframe()
+    assert list(df.columns) == conc.columns and np.all(df.index == conc.time)
+    assert conc.iloc[-1]['b'] == 5.0  # DataFrame attributes are forwarded
+
+    molar = conc.to('M')
+    assert molar.units == 'M'
+    assert np.allclose(molar.values, np.vstack([y, y.sum(axis=0)]).T)
+    assert np.all(y == [[1.0, 2.0, 3.0], [0.5, 0.5, 0.5]])  # The solved array is not modified
+
+    with pytest.raises(ValueError):
+        conc.to('g/L')
@@ -0,0 +1,33 @@
+import subprocess
+import sys
+
+
+def test_model_import_is_lazy():
+    """
+    Test that importing and running a model does not import matplotlib, pandas or numba until they are used
+    :return:
+    """
+    code = ('import sys\n'
+            'from haem_kinetics.models.model3 import Model3\n'
+            'result = Model3().run(t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0], t_eval=range(0, 1700, 20))\n'
+            'result.concentrations.values\n'
+            'print(sorted(name for name in ("matplotlib", "pandas", "numba") if name in sys.modules))\n'
+            'result.concentrations.to_dataframe()\n'
+            'print(sorted(name for name in ("matplotlib", "pandas", "numba") if name in sys.modules))\n')
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+
+    assert output.splitlines() == ['[]', "['pandas']"]
+
+
+def test_analysis_import_is_lazy():
+    """
+    Test that importing the analysis modules does not import pandas or scipy.stats until they are used
+    :return:
+    """
+    code = ('import sys\n'
+            'import haem_kinetics.analysis\n'
+            'from haem_kinetics.analysis import fitting, sensitivity\n'
+            'print(sorted(name for name in ("pandas", "scipy.stats") if name in sys.modules))\n')
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+
+    assert output.splitlines() == ['[]']
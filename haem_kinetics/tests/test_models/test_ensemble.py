@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from haem_kinetics.models.model3 import Model3
+
+
+def test_run_ensemble_matches_run():
+    """
+    Test that each run of an ensemble gives the same concentrations as solving that run on its own
+    :return:
+    """
+    inits = np.array([[0.018, 0.0, 0.0, 0.0],
+                      [0.010, 0.0, 0.0, 0.0],
+                      [0.000, 0.0, 0.0, 0.0]])
+    params = np.array([[2.5, 398],
+                       [1.5, 250],
+                       [3.0, 500]])
+    param_names = ['fudge', 'K_partition']
+    tol = {'rtol': 1e-8, 'atol': 1e-14}
+
+    model = Model3()
+    concentrations = model.run_ensemble(t=[0, 1700], inits=inits, params=params, param_names=param_names,
+                                        t_eval=range(0, 1700, 100), **tol)
+
+    assert concentrations.shape == (3, 4, 17)
+    for init, values, result in zip(inits, params, concentrations):
+        single = Model3()
+        for name, value in zip(param_names, values):
+            single.const.set_value(name, value)
+        single.run(t=[0, 1700], init=list(init), t_eval=range(0, 1700, 100), method=model.solver_info['method'], **tol)
+        assert np.allclose(result, single.concentrations.values.T, rtol=1e-5, atol=1e-6)
+
+
+def test_run_ensemble_shared_init():
+    """
+    Test that a single set of initial values is used for every set of constants
+    :return:
+    """
+    model = Model3()
+    concentrations = model.run_ensemble(t=[0, 1700], inits=[0.018, 0.0, 0.0, 0.0], params=[[0.1], [0.2]],
+                                        param_names=['k_hz'], t_eval=[0, 1680])
+
+    assert concentrations.shape == (2, 4, 2)
+    assert np.allclose(model.time, [16, 44])
+    assert concentrations[1, 3, -1] > concentrations[0, 3, -1]  # More Hz with a faster rate of Hz formation
+
+
+def test_run_ensemble_param_names():
+    """
+    Test that every column of params must be named
+    :return:
+    """
+    with pytest.raises(ValueError):
+        Model3().run_ensemble(t=[0, 1700], inits=[0.018, 0.0, 0.0, 0.0], params=[[0.1, 2.5]], param_names=['k_hz'])
+
+
+def test_run_ensemble_failure():
+    """
+    Test that the runs of an ensemble whose integration fails are NaN with t_eval, and raise without it
+    :return:
+    """
+    model = Model3()
+    rhs = model._rhs
+    model._rhs = lambda t, y, params: rhs(t, y, params) if t < 600 else np.full_like(y, np.inf)
+    kwargs = {'t': [0, 1700], 'inits': [0.018, 0.0, 0.0, 0.0], 'params': [[0.1], [0.2]], 'param_names': ['k_hz'],
+              'method': 'RK45'}
+    concentrations = model.run_ensemble(t_eval=range(0, 1700, 100), **kwargs)
+
+    assert concentrations.shape == (2, 4, 17)
+    assert np.isnan(concentrations).all()
+    assert model.solver_info['n_failed'] == 2 and model.solver_info['status'] < 0
+    assert len(model.time) == 17
+    with pytest.raises(RuntimeError):
+        model.run_ensemble(**kwargs)
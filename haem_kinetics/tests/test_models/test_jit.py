@@ -0,0 +1,104 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+
+from haem_kinetics.models import jit
+from haem_kinetics.models.model3 import Model3
+
+requires_numba = pytest.mark.skipif(not jit.NUMBA_AVAILABLE, reason='numba is not installed')
+
+
+@requires_numba
+def test_jit_rhs_jac():
+    """
+    Test that the compiled right-hand side and Jacobian agree with the numpy versions
+    :return:
+    """
+    model = Model3()
+    p = model._pack_params(const=model.const)
+    y = np.array([0.018, 1e-4, 2e-4, 3e-3])
+    compiled = jit.jit_network(Model3.network)
+
+    assert np.allclose(compiled.rhs(30.0, y, p), model._rhs(30.0, y, p), rtol=1e-12, atol=0)
+    assert np.allclose(compiled.jac(30.0, y, p), model._jac(30.0, y, p), rtol=1e-12, atol=0)
+
+
+@requires_numba
+def test_jit_run():
+    """
+    Test that a run with the compiled functions gives the same solution as a run with numpy
+    :return:
+    """
+    model = Model3()
+    t_eval = np.linspace(0, 1800, 31)
+    expected = model.run(t=(0, 1800), init=[0.018, 0.0, 0.0, 0.0], t_eval=t_eval, method='LSODA')
+    result = model.run(t=(0, 1800), init=[0.018, 0.0, 0.0, 0.0], t_eval=t_eval, method='LSODA', backend='numba')
+
+    assert np.allclose(result.concentrations.values, expected.concentrations.values, rtol=1e-6)
+
+
+@requires_numba
+def test_jit_ensemble():
+    """
+    Test that the compiled ensemble integrator agrees with a tightly solved ensemble from solve_ivp
+    :return:
+    """
+    model = Model3()
+    t_eval = np.linspace(0, 1800, 31)
+    kwargs = dict(t=(0, 1800), inits=[0.018, 0.0, 0.0, 0.0], params=[[1.0], [2.5], [4.0]], param_names=['fudge'],
+                  t_eval=t_eval)
+    expected = model.run_ensemble(method='LSODA', rtol=1e-10, atol=1e-14, **kwargs)
+    result = model.run_ensemble(backend='numba', rtol=1e-6, atol=1e-14, **kwargs)
+
+    assert model.solver_info['n_failed'] == 0
+    assert np.allclose(model.time, 16 + t_eval / 60)
+    assert np.allclose(result, expected, rtol=1e-4, atol=1e-6 * np.abs(expected).max())
+
+    with pytest.raises(ValueError):
+        model.run_ensemble(t=(0, 1800), inits=[0.018, 0.0, 0.0, 0.0], backend='numba')
+
+
+def test_jit_fallback(monkeypatch):
+    """
+    Test that the numba backend falls back to numpy with a warning when numba is not installed
+    :return:
+    """
+    monkeypatch.setattr(jit, 'NUMBA_AVAILABLE', False)
+    model = Model3()
+
+    with pytest.warns(UserWarning, match='numba'):
+        result = model.run(t=(0, 600), init=[0.018, 0.0, 0.0, 0.0], backend='numba')
+    assert result.solution.success
+
+
+@requires_numba
+def test_jit_worker_context():
+    """
+    Test that compiling and running a network leaves the numba threading layer to the user, and that a sweep can
+    still be spread over worker processes after a compiled ensemble ran in the parent process
+    :return:
+    """
+    code = ('import numba\n'
+            'from haem_kinetics.models import jit\n'
+            'from haem_kinetics.models.model3 import Model3\n'
+            'from haem_kinetics.sweep import Sweep\n'
+            'if __name__ == "__main__":\n'
+            '    model = Model3()\n'
+            '    print(jit.worker_context() is None)\n'
+            '    model.run_ensemble(t=(0, 1800), inits=[0.018, 0.0, 0.0, 0.0], params=[[1.0], [2.0]],\n'
+            '                       param_names=["fudge"], t_eval=[0, 900, 1800], backend="numba")\n'
+            '    print(numba.config.THREADING_LAYER)\n'
+            '    print(jit.worker_context() is None, numba.threading_layer() == "workqueue")\n'
+            '    sweep = Sweep.grid(Model3, values={"fudge": [1, 2, 3]}, t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0],\n'
+            '                       t_eval=[0, 1680])\n'
+            '    print(sweep.collect(n_workers=2, chunk_size=1).shape)\n')
+    env = {k: v for k, v in os.environ.items() if k != 'NUMBA_THREADING_LAYER'}
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, env=env,
+                            timeout=300).stdout.splitlines()
+
+    assert output[:2] == ['True', 'default']
+    uses_fork, workqueue = output[2].split()
+    assert uses_fork == workqueue  # Workers are only started by a fork server when the layer is not fork-safe
+    assert output[3] == '(3, 4, 2)'
@@ -0,0 +1,84 @@
+import numpy as np
+
+from haem_kinetics.models.base import KineticsModel
+from haem_kinetics.models.linear import LinearChain
+from haem_kinetics.models.model3 import Model3
+from haem_kinetics.models.network import Forcing, MassAction, ReactionNetwork
+
+
+class Chain(KineticsModel):
+    network = ReactionNetwork(
+        species=['a', 'b', 'c'],
+        reactions=[Forcing(rate=1.0, products=['a']),
+                   MassAction(k=1.0, reactants=['a'], products=['b']),
+                   MassAction(k=1.0, reactants=['b'], products=['c'])])
+
+    def __init__(self):
+        super().__init__(model_name='Chain')
+        self._set_initial_conc(init=[0.0, 0.0, 0.0])
+
+
+def test_linear_chain_run():
+    """
+    Test that Model3 is split into the Hb driver and the Fe(II)PP -> Fe(III)PP -> Hz chain, and that the semi-analytic
+    solution agrees with the integrated model
+    :return:
+    """
+    model = Model3()
+    chain = LinearChain(model)
+    t_eval = np.arange(0, 1700, 20.0)
+    init = [0.018, 0.0, 0.0, 0.0]
+    expected = model.run(t=[0, 1700], init=init, t_eval=t_eval, rtol=1e-10, atol=1e-16).concentrations
+    concentrations = chain.run(t=[0, 1700], t_eval=t_eval, init=init, rtol=1e-10, atol=1e-16)
+
+    assert chain.linear == ['conc_fe2pp', 'conc_fe3pp', 'conc_hz'] and chain.driver == ['conc_hb_dv']
+    assert concentrations.columns == expected.columns
+    assert np.allclose(concentrations.values, expected.values, rtol=1e-4, atol=1e-5)
+
+
+def test_linear_chain_sweep():
+    """
+    Test a sweep of the constants of the linear part against run_ensemble, and a chain with equal rate constants
+    (a defective A) against its analytic solution
+    :return:
+    """
+    model = Model3()
+    params = [[0.05, 398, 0.016], [0.15, 200, 0.016], [0.3, 398, 0.03]]
+    names = ['k_hz', 'K_partition', 'vol_fract_lip']
+    t_eval = np.arange(0, 1700, 20.0)
+    expected = model.run_ensemble(t=[0, 1700], inits=[0.018, 0.0, 0.0, 0.0], params=params, param_names=names,
+                                  t_eval=t_eval, rtol=1e-10, atol=1e-16)
+    concentrations = LinearChain(model).sweep(t=[0, 1700], t_eval=t_eval, inits=[0.018, 0.0, 0.0, 0.0],
+                                              params=params, param_names=names, substeps=16, rtol=1e-10,
+                                              atol=1e-16)
+
+    t = np.linspace(0, 5, 11)
+    chain = Chain()
+    values = LinearChain(chain).run(t=[0, 5], t_eval=t).array() / chain._fgcell_factor()
+
+    assert concentrations.shape == expected.shape
+    assert np.allclose(concentrations, expected, rtol=1e-4, atol=1e-5)
+    assert np.allclose(values[0], 1 - np.exp(-t))
+    assert np.allclose(values[1], 1 - np.exp(-t) - t * np.exp(-t))
+
+
+def test_linear_chain_stiff_driver():
+    """
+    Test a sweep of the fudge factor, which makes the driver (Hb degradation) stiff, against run_ensemble at tight
+    tolerances, with the default tolerances of the driver
+    :return:
+    """
+    model = Model3()
+    params = [[1.0], [2.0], [3.0], [4.0]]
+    t_eval = np.arange(0, 1700, 20.0)
+    expected = model.run_ensemble(t=[0, 1700], inits=[0.018, 0.0, 0.0, 0.0], params=params, param_names=['fudge'],
+                                  t_eval=t_eval, rtol=1e-10, atol=1e-16)
+    concentrations = LinearChain(model).sweep(t=[0, 1700], t_eval=t_eval, inits=[0.018, 0.0, 0.0, 0.0],
+                                              params=params, param_names=['fudge'])
+
+    model.const.set_value('fudge', 4.0)
+    single = LinearChain(model).run(t=[0, 1700], t_eval=t_eval, init=[0.018, 0.0, 0.0, 0.0]).array()
+
+    peak = np.abs(expected).max(axis=2, keepdims=True)
+    assert np.all(np.abs(concentrations - expected) < 1e-2 * peak)
+    assert np.all(np.abs(single - expected[3]) < 1e-2 * peak[3])
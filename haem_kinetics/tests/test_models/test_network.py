@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from haem_kinetics.components.constants import Constants
+from haem_kinetics.models.network import Forcing, MassAction, MichaelisMenten, ReactionNetwork
+
+
+def growth(t):
+    return 1 + 0.01 * t
+
+
+NETWORK = ReactionNetwork(
+    species=['a', 'b', 'c'],
+    reactions=[Forcing(rate='k_hz', products=['a'], profile=growth),
+               MassAction(k=2.0, reactants=['a', 'b'], products=['c']),
+               MichaelisMenten(substrate='c', products=['b'], enzymes=['hap'], scale='fudge', subunits=2)])
+
+
+def test_network_rhs():
+    """
+    Test the right-hand side compiled from a network against the rate laws written out by hand
+    :return:
+    """
+    const = Constants()
+    p = NETWORK.pack(const=const)
+    y = np.array([1e-3, 2e-3, 3e-6])
+
+    vmax = const.k_enzymes['hap']['kcat'] * 60 * const.conc_enzymes['hap'] * const.fudge
+    km = const.k_enzymes['hap']['Km']
+    source = const.k_hz * growth(10.0)
+    binding = 2.0 * y[0] * y[1]
+    degradation = 2 * vmax * (y[2] / 2) / (km + y[2] / 2)
+
+    assert len(p) == NETWORK.n_params == 4
+    assert np.allclose(NETWORK.rhs(10.0, y, p), [source - binding, degradation - binding, binding - degradation])
+
+
+def test_network_jac():
+    """
+    Test that the compiled Jacobian agrees with a complex-step derivative and with the sparsity pattern
+    :return:
+    """
+    p = NETWORK.pack(const=Constants())
+    y = np.array([1e-3, 2e-3, 3e-6])
+
+    expected = np.zeros((3, 3))
+    for j in range(3):
+        y_step = y.astype(complex)
+        y_step[j] += 1e-20j
+        expected[:, j] = NETWORK.rhs(10.0, y_step, p).imag / 1e-20
+
+    assert np.allclose(NETWORK.jac(10.0, y, p), expected)
+    assert np.all(NETWORK.sparsity == [[1, 1, 0], [1, 1, 1], [1, 1, 1]])
+
+
+def test_network_unknown_species():
+    """
+    Test that reactions can only use species of the network
+    :return:
+    """
+    with pytest.raises(ValueError):
+        ReactionNetwork(species=['a'], reactions=[MassAction(k=1.0, reactants=['a'], products=['b'])])
+
+
+def test_network_staticmethod_profile():
+    """
+    Test that a profile defined as a staticmethod in a class body (as in the models) is unwrapped, since staticmethod
+    objects can not be called before Python 3.10
+    :return:
+    """
+    class Model:
+        @staticmethod
+        def _growth(t):
+            return 2 * t
+
+        network = ReactionNetwork(species=['a'], reactions=[Forcing(rate=1.0, products=['a'], profile=_growth)])
+
+    assert not isinstance(Model.network.profiles['profile_0'], staticmethod)
+    assert Model.network.reactions[0].profile(3.0) == 6.0
+    assert np.allclose(Model.network.rhs(3.0, np.array([0.0]), np.array([1.0])), [6.0])
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from haem_kinetics.models.model3 import Model3
+from haem_kinetics.models.network import MassAction, ReactionNetwork
+from haem_kinetics.models.reduced import QuasiSteadyModel
+
+
+def test_reduce_network():
+    """
+    Test that eliminating a fast intermediate routes its formation to the products of its consumers, split by their
+    rate constants, and that species with other consumers can not be eliminated
+    :return:
+    """
+    network = ReactionNetwork(
+        species=['a', 'b', 'c', 'd'],
+        reactions=[MassAction(k=2.0, reactants=['a'], products=['b']),
+                   MassAction(k=300.0, reactants=['b'], products=['c']),
+                   MassAction(k=100.0, reactants=['b'], products=['d'])])
+    reduced = network.reduce(fast=['b'])
+    y = np.array([1.0, 0.0, 0.0])
+
+    assert reduced.species == ['a', 'c', 'd']
+    assert list(reduced.quasi_steady) == ['b']
+    assert np.allclose(reduced.rhs(0.0, y, reduced.pack(const=None)), [-2.0, 1.5, 0.5])
+    with pytest.raises(ValueError):
+        ReactionNetwork(species=['a', 'b'], reactions=[MassAction(k=1.0, reactants=['a', 'b'], products=['b'])]
+                        ).reduce(fast=['a'])
+
+
+def test_quasi_steady_model():
+    """
+    Test that the reduced Model3 is not stiff, conserves haem in its initial values and agrees with the full model,
+    including the quasi-steady Fe(II)PP
+    :return:
+    """
+    model = QuasiSteadyModel(Model3())
+    init = [0.018, 1e-6, 0.0, 0.0]
+    report = model.compare(t=[0, 1700], init=init, t_eval=range(0, 1700, 20))
+
+    assert list(model.initial_values) == ['conc_hb_dv', 'conc_fe3pp', 'conc_hz']
+    assert np.isclose(sum(model.reduce_init(init)), sum(init))
+    assert not report.attrs['reduced']['stiff'] and report.attrs['full']['stiff']
+    assert report.attrs['separation'] > 1e3
+    assert report.loc[['conc_hb_dv', 'conc_fe3pp', 'conc_hz'], 'max_rel_error'].max() < 1e-2
+    assert report.loc['conc_fe2pp', 'max_abs_error'] < 1e-3
+
+
+def test_quasi_steady_model_explicit_cost():
+    """
+    Test that with an explicit solver the reduced model needs orders of magnitude fewer RHS evaluations than the full
+    model, whose stability limits the step size to the lifetime of Fe(II)PP
+    :return:
+    """
+    report = QuasiSteadyModel(Model3()).compare(t=[0, 200], init=[0.018, 0.0, 0.0, 0.0], t_eval=range(0, 200, 20),
+                                                method='RK45')
+
+    assert report.attrs['full']['nfev'] > 100 * report.attrs['reduced']['nfev']
+    assert report.loc[['conc_hb_dv', 'conc_fe3pp', 'conc_hz'], 'max_rel_error'].max() < 1e-2
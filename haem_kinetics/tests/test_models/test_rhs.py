@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from haem_kinetics.models.model1 import Model1
+from haem_kinetics.models.model2 import Model2
+from haem_kinetics.models.model3 import Model3
+from haem_kinetics.models.model4 import Model4
+from haem_kinetics.models.degradation import Degradation
+from haem_kinetics.models.network import MichaelisMenten, ReactionNetwork
+
+
+@pytest.mark.parametrize('model_class', [Model1, Model2, Model3, Model4, Degradation])
+def test_rhs_vectorised(model_class):
+    """
+    Test that the right-hand side gives the same rates when concentrations are passed column-wise (as solve_ivp
+    does with vectorized=True) as when they are passed one state at a time
+    :return:
+    """
+    model = model_class()
+    p = model._pack_params(const=model.const)
+    n_species = len(model.initial_values)
+    y = np.random.default_rng(0).uniform(0, 0.01, size=(n_species, 5))
+
+    dy = model._rhs(100.0, y, p)
+    expected = np.stack([model._rhs(100.0, y[:, i], p) for i in range(y.shape[1])], axis=1)
+
+    assert dy.shape == y.shape
+    assert np.allclose(dy, expected)
+
+
+def test_rhs_haem_balance():
+    """
+    Test that haem is conserved by Model1, i.e. the total rate of change of all haem species is the rate of Hb
+    transport into the DV
+    :return:
+    """
+    model = Model1()
+    p = model._pack_params(const=model.const)
+    dy = model._rhs(0.0, np.array([0.01, 1e-6, 1e-4, 1e-3]), p)
+
+    assert np.isclose(dy.sum(), p[0])
+
+
+def test_hb_removal_zero_km():
+    """
+    Test that an enzyme with a Km of 0 does not degrade Hb when there is no Hb in the DV
+    :return:
+    """
+    model = Model1()
+    model.const.k_enzymes['hap']['Km'] = 0.0
+    network = ReactionNetwork(species=['conc_hb_dv', 'conc_fe2pp'],
+                              reactions=[MichaelisMenten(substrate='conc_hb_dv', products=['conc_fe2pp'],
+                                                         enzymes=['hap'], subunits=4)])
+    p = network.pack(const=model.const)
+
+    assert network.rhs(0.0, np.array([0.0, 0.0]), p)[1] == 0.0
+    assert np.isclose(network.rhs(0.0, np.array([0.01, 0.0]), p)[1], 4 * p[0])
+
+
+@pytest.mark.parametrize('model_class', [Model1, Model2, Model3, Model4, Degradation])
+def test_jac_matches_finite_difference(model_class):
+    """
+    Test that the analytic Jacobian agrees with a complex-step derivative of the right-hand side and that it has
+    no entries outside of the sparsity pattern
+    :return:
+    """
+    model = model_class()
+    p = model._pack_params(const=model.const)
+    n_species = len(model.initial_values)
+    y = np.random.default_rng(1).uniform(1e-4, 0.01, size=n_species)
+
+    jac = model._jac(100.0, y, p)
+    expected = np.zeros((n_species, n_species))
+    for j in range(n_species):
+        y_step = y.astype(complex)
+        y_step[j] += 1e-20j
+        expected[:, j] = model._rhs(100.0, y_step, p).imag / 1e-20
+
+    assert np.allclose(jac, expected)
+    assert not np.any(jac[model.jac_sparsity == 0])
@@ -0,0 +1,197 @@
+import numpy as np
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+from haem_kinetics.models.events import Threshold
+from haem_kinetics.models.model3 import Model3
+from haem_kinetics.models.model4 import Model4
+from haem_kinetics.models.degradation import Degradation
+
+
+def test_run_selects_stiff_method():
+    """
+    Test that the fast oxidation of Fe(II)PP is detected as stiff and that the selection is recorded
+    :return:
+    """
+    model = Model3()
+    model.run(t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0], t_eval=range(0, 1700, 20))
+
+    assert model.solver_info['method'] == model.stiff_method
+    assert model.solver_info['stiff']
+    assert model.solver_info['nfev'] == model.solution.nfev
+    assert model.concentrations.shape == (85, 4)
+
+
+def test_run_selects_nonstiff_method():
+    """
+    Test that a model without a fast decay is integrated with the explicit solver
+    :return:
+    """
+    model = Degradation()
+    model.run(t=[0, 1700], init=[0.018, 0.0])
+
+    assert model.solver_info['method'] == model.nonstiff_method
+    assert not model.solver_info['stiff']
+    assert model.solver_info['n_steps'] == len(model.solution.t) - 1
+    assert list(model.concentrations.columns) == ['conc_hb_dv', 'conc_fe2pp', 'conc_hz', 'conc_hb_dv_obs']
+
+
+def test_run_explicit_method():
+    """
+    Test that a method passed to run is used as is and agrees with the automatically selected one
+    :return:
+    """
+    auto = Model3()
+    auto.run(t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0], t_eval=range(0, 1700, 20))
+    bdf = Model3()
+    bdf.run(t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0], t_eval=range(0, 1700, 20), method='BDF')
+
+    assert bdf.solver_info['method'] == 'BDF'
+    assert not bdf.solver_info['auto']
+    assert np.allclose(auto.concentrations['conc_hz'], bdf.concentrations['conc_hz'], rtol=1e-2, atol=1e-2)
+
+
+def test_run_default_method():
+    """
+    Test that Model4 is solved with BDF unless another method is given, and that the automatically selected solver
+    agrees with it
+    :return:
+    """
+    bdf = Model4()
+    bdf.run(t=[0, 1700], t_eval=range(0, 1700, 20))
+    auto = Model4()
+    auto.run(t=[0, 1700], t_eval=range(0, 1700, 20), method='auto')
+
+    assert bdf.solver_info['method'] == 'BDF' and not bdf.solver_info['auto']
+    assert auto.solver_info['auto']
+    peak = np.abs(bdf.concentrations.values).max(axis=0)
+    assert np.allclose(auto.concentrations.values, bdf.concentrations.values, rtol=1e-2, atol=1e-3 * peak)
+
+
+def test_run_sensitivities():
+    """
+    Test that the forward sensitivities agree with central differences of the concentrations
+    :return:
+    """
+    tol = {'rtol': 1e-9, 'atol': 1e-15, 'method': 'LSODA'}
+    model = Model3()
+    model.run(t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0], t_eval=range(0, 1700, 100),
+              sensitivities=['fudge', 'K_partition'], **tol)
+
+    for name in ['fudge', 'K_partition']:
+        value = model.const.get_value(name)
+        step = 1e-4 * value
+        perturbed = []
+        for sign in [1, -1]:
+            other = Model3()
+            other.const.set_value(name, value + sign * step)
+            other.run(t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0], t_eval=range(0, 1700, 100), **tol)
+            perturbed.append(other.concentrations.values)
+        expected = (perturbed[0] - perturbed[1]) / (2 * step)
+
+        assert model.sensitivities[name].shape == model.concentrations.shape
+        assert np.allclose(model.sensitivities[name].values, expected, rtol=1e-3, atol=1e-4 * np.abs(expected).max())
+
+
+def test_run_is_repeatable():
+    """
+    Test that run leaves the model untouched, so repeated runs of one instance give the same results
+    :return:
+    """
+    model = Model3()
+    conc_hb_rbc = model.const.conc_hb_rbc
+    first = model.run(t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0], t_eval=range(0, 1700, 100))
+    second = model.run(t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0], t_eval=range(0, 1700, 100))
+
+    assert model.const.conc_hb_rbc == conc_hb_rbc
+    assert np.all(first.concentrations.values == second.concentrations.values)
+    assert model.concentrations is second.concentrations
+
+
+def test_run_threads():
+    """
+    Test that concurrent runs of one model instance give the same results as serial runs
+    :return:
+    """
+    model = Model3()
+    inits = [[conc, 0.0, 0.0, 0.0] for conc in [0.005, 0.01, 0.015, 0.02]]
+    expected = [Model3().run(t=[0, 1700], init=init, t_eval=range(0, 1700, 100)) for init in inits]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda init: model.run(t=[0, 1700], init=init, t_eval=range(0, 1700, 100)),
+                                    inits))
+
+    for result, exp in zip(results, expected):
+        assert np.all(result.concentrations.values == exp.concentrations.values)
+
+
+def test_run_profile():
+    """
+    Test that a profiled run records every rhs call and step of the solver, and the time spent on each reaction
+    :return:
+    """
+    model = Model3()
+    result = model.run(t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0], t_eval=range(0, 1700, 20), method='Radau',
+                       profile=True)
+    profile = result.profile
+    steps = profile.steps
+
+    assert model.profile is profile
+    assert profile.summary['rhs_calls'] == result.solution.nfev
+    assert 0 < result.solution.nfev - steps['n_rhs'].sum() <= 2  # Calls before the first step choose its size
+    assert profile.summary['jac_calls'] == result.solution.njev
+    assert np.isclose(steps['t'].iloc[-1], 1700) and np.allclose(np.diff(steps['t']), steps['h'].iloc[1:])
+    assert (steps['h_rejected'].dropna() > steps['h'][steps['h_rejected'].notna()]).all()
+    assert list(profile.terms.index) == [reaction.name for reaction in Model3.network.reactions]
+    assert np.isclose(profile.terms['fraction'].sum(), 1)
+    assert 'Time per term' in profile.report()
+
+    # Profiling does not change the solution
+    expected = model.run(t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0], t_eval=range(0, 1700, 20), method='Radau')
+    assert np.allclose(result.concentrations.values, expected.concentrations.values)
+    assert model.profile is None
+
+
+def test_run_sample():
+    """
+    Test that a run with dense output can be sampled at any time points (in hrs) without integrating again
+    :return:
+    """
+    model = Model3()
+    dense = model.run(t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0], dense_output=True, method='LSODA')
+    gridded = model.run(t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0], t_eval=range(0, 1700, 20), method='LSODA')
+
+    sampled = model.sample(gridded.time, result=dense)
+    assert np.allclose(sampled.values, gridded.concentrations.values, rtol=1e-6, atol=1e-6)
+
+    # Experimental time points, 16 hrs is the start of the integration
+    sampled = model.sample([16, 20, 44], result=dense)
+    assert np.all(sampled.index == [16, 20, 44])
+    assert np.allclose(sampled.values[0], model._molar_to_fgcell(np.array([0.018, 0.0, 0.0, 0.0])))
+
+    with pytest.raises(ValueError):
+        model.sample([15], result=dense)
+    with pytest.raises(ValueError):
+        model.sample([20])  # The latest run has no dense output
+
+
+def test_run_thresholds():
+    """
+    Test that threshold crossings (in fg/cell) are located on the continuous solution and that a terminal threshold
+    stops the run
+    :return:
+    """
+    model = Model3()
+    thresholds = [Threshold('conc_fe3pp', 2.0, direction=1, name='toxic'), Threshold('conc_hz', 50.0, terminal=True)]
+    result = model.run(t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0], t_eval=range(0, 1700, 20), thresholds=thresholds)
+    dense = model.run(t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0], dense_output=True)
+
+    assert list(result.events) == ['toxic', 'conc_hz 50 fg/cell']
+    assert len(result.events['toxic']) == 1 and len(result.events['conc_hz 50 fg/cell']) == 1
+    crossed = model.sample([result.events['toxic'][0], result.events['conc_hz 50 fg/cell'][0]], result=dense)
+    assert np.isclose(crossed['conc_fe3pp'].iloc[0], 2.0, rtol=1e-3)
+    assert np.isclose(crossed['conc_hz'].iloc[1], 50.0, rtol=1e-3)
+    assert result.time[-1] <= result.events['conc_hz 50 fg/cell'][0] < 44
+
+    with pytest.raises(ValueError):
+        model.run(t=[0, 1700], thresholds=[Threshold('conc_hb_dv_obs', 1.0)])
@@ -0,0 +1,52 @@
+import matplotlib.pyplot as plt
+import numpy as np
+
+from haem_kinetics import plotting
+from haem_kinetics.models.model3 import Model3
+
+
+def test_run_plot_reuses_figure(tmp_path):
+    """
+    Test that plots of several runs reuse one figure, only updating the data of its lines, and open no pyplot figures
+    :return:
+    """
+    model = Model3()
+    model.run(t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0], t_eval=range(0, 1700, 20), plot=str(tmp_path / 'a.png'))
+    plotter = plotting.run_plotter()
+    lines = dict(plotter._lines)
+    n_artists = len(plotter.axes[0].get_children())
+
+    model.const.fudge = 4.0
+    result = model.run(t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0], t_eval=range(0, 1700, 20),
+                       plot=str(tmp_path / 'b.png'))
+
+    assert (tmp_path / 'a.png').exists() and (tmp_path / 'b.png').exists()
+    assert plotting.run_plotter() is plotter
+    assert plotter._lines == lines
+    assert len(plotter.axes[0].get_children()) == n_artists
+    assert np.allclose(lines['conc_hz'].get_ydata(), result.concentrations['conc_hz'].values)
+    assert plt.get_fignums() == []
+
+
+def test_plot_ensemble(tmp_path):
+    """
+    Test that the figures of an ensemble are rendered on a process pool and summarised in a grid and a single figure
+    :return:
+    """
+    model = Model3()
+    params = [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    concentrations = model.run_ensemble(t=[0, 1700], inits=[0.018, 0.0, 0.0, 0.0], params=params,
+                                        param_names=['fudge'], t_eval=range(0, 1700, 20))
+    columns = list(model.initial_values)
+    save_files = [str(tmp_path / f'run_{m}.png') for m in range(len(params))]
+
+    n_saved = plotting.plot_runs(save_files, time=model.time, concentrations=concentrations, columns=columns,
+                                 exp_data=model.exp_data, n_workers=2, batch_size=2)
+    plotting.plot_small_multiples(str(tmp_path / 'grid.png'), time=model.time, concentrations=concentrations,
+                                  columns=columns, titles=[f'fudge {p[0]:g}' for p in params], n_cols=3)
+    plotting.plot_ensemble(str(tmp_path / 'summary.png'), time=model.time, concentrations=concentrations,
+                           columns=columns, exp_data=model.exp_data)
+
+    assert n_saved == 5
+    assert all((tmp_path / f'run_{m}.png').exists() for m in range(5))
+    assert (tmp_path / 'grid.png').exists() and (tmp_path / 'summary.png').exists()
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from haem_kinetics.models.model3 import Model3
+from haem_kinetics.sinks import ArrowSink, BinarySink, HDF5Sink, ParquetSink
+from haem_kinetics.sweep import Sweep
+
+
+def test_stream_matches_run(tmp_path):
+    """
+    Test that streaming a run in chunks writes the same concentrations as a run with the same time points
+    :return:
+    """
+    model = Model3()
+    t_eval = np.linspace(0, 1700, 1001)
+    expected = model.run(t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0], t_eval=t_eval, method='LSODA')
+
+    with BinarySink(str(tmp_path / 'run.bin'), dtype='float64') as sink:
+        solver_info = model.stream(t=[0, 1700], sink=sink, t_eval=t_eval, init=[0.018, 0.0, 0.0, 0.0],
+                                   chunk_size=64, method='LSODA')
+    records = pd.DataFrame(BinarySink.read(str(tmp_path / 'run.bin')))
+
+    assert solver_info['status'] == 0
+    assert solver_info['n_points'] == 1001
+    assert list(records.columns) == ['run', 'time'] + expected.concentrations.columns
+    assert np.allclose(records['time'], expected.time)
+    assert np.allclose(records[expected.concentrations.columns], expected.concentrations.values, rtol=1e-10)
+
+
+def test_stream_float32(tmp_path):
+    """
+    Test that the compact binary sink stores the concentrations as float32
+    :return:
+    """
+    model = Model3()
+    with BinarySink(str(tmp_path / 'run.bin')) as sink:
+        model.stream(t=[0, 1700], sink=sink, t_eval=range(0, 1700, 10), init=[0.018, 0.0, 0.0, 0.0])
+    records = BinarySink.read(str(tmp_path / 'run.bin'))
+
+    assert len(records) == 170
+    assert records.dtype['conc_hz'] == np.float32
+    assert (tmp_path / 'run.bin').stat().st_size == 170 * (4 + 8 + 4 * 4)
+
+
+@pytest.mark.parametrize('sink_class', [ParquetSink, ArrowSink, HDF5Sink])
+def test_sink_formats(tmp_path, sink_class):
+    """
+    Test that each sink writes chunks of several runs that read back as one table
+    :return:
+    """
+    pytest.importorskip('h5py' if sink_class is HDF5Sink else 'pyarrow')
+    path = str(tmp_path / 'runs')
+    values = np.arange(12, dtype=float).reshape(6, 2)
+
+    with sink_class(path, dtype='float32') as sink:
+        sink.write(time=[16, 17, 18], values=values[:3], species=['a', 'b'], run=0)
+        sink.write(time=[16, 17, 18], values=values[3:], species=['a', 'b'], run=1)
+        with pytest.raises(ValueError):
+            sink.write(time=[16], values=values[:1], species=['b', 'a'], run=2)
+
+    if sink_class is ParquetSink:
+        df = pd.read_parquet(path)
+    elif sink_class is ArrowSink:
+        df = pd.read_feather(path)
+    else:
+        df = HDF5Sink.read(path)
+
+    assert list(df.columns) == ['run', 'time', 'a', 'b']
+    assert list(df['run']) == [0, 0, 0, 1, 1, 1]
+    assert df['a'].dtype == np.float32
+    assert np.array_equal(df[['a', 'b']].values, values)
+
+
+def test_sweep_write(tmp_path):
+    """
+    Test that a sweep written to a sink holds the same results as the collected sweep
+    :return:
+    """
+    sweep = Sweep.grid(Model3, values={'fudge': [1, 2, 3]}, t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0],
+                       t_eval=range(0, 1700, 100), method='LSODA')
+    with BinarySink(str(tmp_path / 'sweep.bin'), dtype='float64') as sink:
+        n_runs = sweep.write(sink, n_workers=2, chunk_size=2)
+    records = pd.DataFrame(BinarySink.read(str(tmp_path / 'sweep.bin'))).sort_values(['run', 'time'])
+    expected = sweep.collect(n_workers=2, chunk_size=2)
+
+    assert n_runs == 3
+    assert np.allclose(records.iloc[:, 2:].values.reshape(3, 17, 4), expected.transpose(0, 2, 1))
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from haem_kinetics.components.experimental_data import ExperimentalData
+from haem_kinetics.models.model3 import Model3
+from haem_kinetics.store import ResultStore
+from haem_kinetics.sweep import Sweep
+
+
+def _sweep() -> Sweep:
+    return Sweep.grid(Model3, values={'fudge': [1, 2, 3], 'k_hz': [0.1, 0.2]}, t=[0, 1900],
+                      init=[0.018, 0.0, 0.0, 0.0], t_eval=range(0, 1901, 100), method='LSODA')
+
+
+def test_sweep_store(tmp_path):
+    """
+    Test that a sweep stored on disk reads back the collected results, and that slices are memory mapped views
+    :return:
+    """
+    sweep = _sweep()
+    store = sweep.store(str(tmp_path / 'store'), n_workers=2, chunk_size=4)
+    expected = sweep.collect(n_workers=2, chunk_size=4)
+
+    store = ResultStore(str(tmp_path / 'store'))
+    hz = store.array('conc_hz', runs=slice(1, 4))
+
+    assert len(store.missing()) == 0
+    assert np.allclose(store.concentrations, expected)
+    assert np.allclose(hz, expected[1:4, 3])
+    assert isinstance(hz, np.memmap) and not hz.flags.owndata
+    assert np.allclose(store.params.values, sweep.design)
+    assert np.allclose(store.inits.values, sweep.inits)
+    assert store.constants(5).fudge == 3 and store.constants(5).k_hz == 0.2
+    assert np.allclose(store.run(2)['conc_hz'].values, expected[2, 3])
+
+
+def test_store_resume(tmp_path):
+    """
+    Test that storing a sweep again only solves the runs that are missing
+    :return:
+    """
+    sweep = _sweep()
+    store = ResultStore.create(str(tmp_path / 'store'), model=Model3(), time=sweep.time, design=sweep.design,
+                               param_names=sweep.param_names, inits=sweep.inits)
+    store.write([0, 1], np.full((2, 4, 20), -1.0))
+
+    store = sweep.store(str(tmp_path / 'store'), n_workers=2, chunk_size=4)
+
+    assert len(store.missing()) == 0
+    assert np.all(store.concentrations[:2] == -1)
+    assert np.all(store.concentrations[2:] >= 0)
+
+    with pytest.raises(ValueError):
+        Sweep.grid(Model3, values={'fudge': [1, 2]}, t=[0, 1900], init=[0.018, 0.0, 0.0, 0.0],
+                   t_eval=range(0, 1901, 100)).store(str(tmp_path / 'store'))
+
+
+def test_store_compare(tmp_path):
+    """
+    Test that runs are interpolated at the measured time points when compared to experimental data
+    :return:
+    """
+    sweep = _sweep()
+    store = sweep.store(str(tmp_path / 'store'), n_workers=2, chunk_size=4)
+    exp_data = ExperimentalData()
+    exp_data.no_drug_nf54()
+    times = exp_data.data.index.values.astype(float)
+
+    diff = store.compare(exp_data, species_map={'Hz': 'conc_hz'})
+    expected = np.interp(times, store.time, store.concentrations[4, 3]) - exp_data.data['Hz'].values
+
+    assert diff.shape == (6, 1, len(times))
+    assert np.allclose(diff[4, 0], expected)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from haem_kinetics.models.model3 import Model3
+from haem_kinetics.sweep import Sweep
+
+
+def test_grid_design():
+    """
+    Test that a grid sweep covers every combination of values
+    :return:
+    """
+    sweep = Sweep.grid(Model3, values={'fudge': [1, 2, 3], 'k_hz': [0.1, 0.2]}, t=[0, 1700],
+                       init=[0.018, 0.0, 0.0, 0.0], t_eval=[0, 1680])
+
+    assert sweep.design.shape == (6, 2)
+    assert sweep.param_names == ['fudge', 'k_hz']
+    assert {tuple(row) for row in sweep.design} == {(f, k) for f in [1, 2, 3] for k in [0.1, 0.2]}
+
+
+def test_latin_hypercube_design():
+    """
+    Test that a latin hypercube sweep stays within the bounds and has one sample per stratum of each constant
+    :return:
+    """
+    sweep = Sweep.latin_hypercube(Model3, bounds={'fudge': (1, 4), 'K_partition': (200, 600)}, n_samples=10,
+                                  t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0], seed=0, t_eval=[0, 1680])
+    strata = np.floor((sweep.design - [1, 200]) / ([3, 400]) * 10)
+
+    assert sweep.design.shape == (10, 2)
+    assert np.all(np.sort(strata, axis=0) == np.arange(10)[:, np.newaxis])
+
+
+def test_sweep_matches_ensemble():
+    """
+    Test that solving a sweep on a process pool gives the same results as a single ensemble
+    :return:
+    """
+    sweep = Sweep.grid(Model3, values={'fudge': [1, 2, 3], 'k_hz': [0.1, 0.2]}, t=[0, 1700],
+                       init=[0.018, 0.0, 0.0, 0.0], t_eval=range(0, 1700, 100), method='LSODA')
+    results = sweep.collect(n_workers=2, chunk_size=4)
+
+    expected = Model3().run_ensemble(t=[0, 1700], inits=[0.018, 0.0, 0.0, 0.0], params=sweep.design[:4],
+                                     param_names=sweep.param_names, t_eval=range(0, 1700, 100), method='LSODA')
+
+    assert results.shape == (6, 4, 17)
+    assert np.allclose(results[:4], expected)
+
+
+def test_sweep_requires_t_eval():
+    """
+    Test that sweeps must share their time points
+    :return:
+    """
+    with pytest.raises(ValueError):
+        Sweep.grid(Model3, values={'fudge': [1, 2]}, t=[0, 1700], init=[0.018, 0.0, 0.0, 0.0])
@@ -10,6 +10,24 @@ app_requirements = [
 
 dev_requirements = [
     'pytest>=7.2',
+    'pytest-benchmark>=4.0',
+]
+
+# Compiled right-hand sides and ensemble integrator (haem_kinetics.models.jit)
+jit_requirements = [
+    'numba>=0.57',
+]
+
+# Streaming output to Parquet, Arrow IPC and HDF5 (haem_kinetics.sinks)
+io_requirements = [
+    'h5py>=3.8',
+    'pyarrow>=11.0',
+]
+
+# Job files of the haem-kinetics command (haem_kinetics.cli)
+cli_requirements = [
+    'pyyaml>=6.0',
+    'tomli>=2.0; python_version < "3.11"',
 ]
 
 setup(name='haem_kinetics',
@@ -20,4 +38,6 @@ setup(name='haem_kinetics',
       license='MIT',
       packages=find_packages(),
       install_requires=app_requirements,
-      extras_require={'dev': dev_requirements})
+      extras_require={'dev': dev_requirements, 'jit': jit_requirements, 'io': io_requirements,
+                      'cli': cli_requirements},
+      entry_points={'console_scripts': ['haem-kinetics=haem_kinetics.cli:main']})